@@ -11,6 +11,8 @@ from bs4 import BeautifulSoup
 from dataclasses import dataclass, asdict
 from typing import Optional, List
 
+from cfst_extractor.agent.tables import normalize_label
+
 
 @dataclass
 class CFSTSpecimen:
@@ -171,6 +173,10 @@ def extract_schneider_1998(content_list_path: str) -> List[CFSTSpecimen]:
     # 表头: Shape | D/t | Py | Pu | Pu/Py | ...
     if len(tables) >= 2:
         tbl2 = parse_html_table(tables[1].get('table_body', ''))
+        # 规范化试件编号 → 试件，O(1) 查找 (容忍大小写、脚注标记及 O/0、l/1 等 OCR 混淆)
+        by_label = {}
+        for spec in specimens:
+            by_label.setdefault(normalize_label(spec.specimen_id), spec)
 
         for row in tbl2[3:]:
             if not row or not row[0]:
@@ -181,19 +187,19 @@ def extract_schneider_1998(content_list_path: str) -> List[CFSTSpecimen]:
                 continue
 
             # 查找对应试件
-            for spec in specimens:
-                if spec.specimen_id == shape_id:
-                    vals = {}
-                    for i, cell in enumerate(row[1:], start=1):
-                        nums = parse_numbers(cell)
-                        if nums:
-                            vals[i] = nums[0]
-
-                    # Py (col 2), Pu (col 3), Pu/Py (col 4)
-                    spec.Ny = vals.get(2)
-                    spec.Nu = vals.get(3)
-                    spec.Nu_Ny_ratio = vals.get(4)
-                    break
+            spec = by_label.get(normalize_label(shape_id))
+            if spec is None:
+                continue
+            vals = {}
+            for i, cell in enumerate(row[1:], start=1):
+                nums = parse_numbers(cell)
+                if nums:
+                    vals[i] = nums[0]
+
+            # Py (col 2), Pu (col 3), Pu/Py (col 4)
+            spec.Ny = vals.get(2)
+            spec.Nu = vals.get(3)
+            spec.Nu_Ny_ratio = vals.get(4)
 
     return specimens
 
@@ -1,20 +1,29 @@
 """Core AI Agent for CFST Data Extraction."""
 
+import hashlib
 import json
 import os
+from contextlib import ExitStack
+from contextvars import ContextVar
 from pathlib import Path
 
 import httpx
 import yaml
 from pydantic_ai import Agent, RunContext
+from pydantic_ai.messages import ModelMessage
 
-from cfst_extractor.agent.models import PaperExtraction
+from cfst_extractor.agent.deps import PaperDeps
+from cfst_extractor.agent.hedging import current_run_stats
+from cfst_extractor.agent.history import prune_history
+from cfst_extractor.agent.models import PaperExtraction, SpecimenRepair
 from cfst_extractor.agent.tools import (
     execute_python_calc,
     inspect_image,
+    join_specimen_tables,
     list_directory_files,
     read_markdown,
 )
+from cfst_extractor.tracing import span
 
 # 读取 System Prompt
 _PROMPT_PATH = Path(__file__).resolve().parents[4] / "config" / "System_Prompt.md"
@@ -24,6 +33,22 @@ else:
     print(f"WARNING: 找不到 Prompt 文件 {_PROMPT_PATH}")
     SYSTEM_PROMPT = "你是一个专门从钢管混凝土（CFST）科学论文中提取试验数据的专家。"
 
+# 固定的提取工作流说明：跨论文、跨轮次保持逐字节一致，便于服务端前缀缓存命中。
+# 论文相关的可变内容 (目录名) 只能追加在它之后。
+WORKFLOW_PROMPT = (
+    "目标：请从当前分配给你的文献解析目录中提取出结构化的 CFST 试验数据，"
+    "严格遵循我们在 System Prompt 中定义的 JSON 格式进行输出。\n"
+    "操作指南与校验机制（请严格按以下核心工作流按顺序执行）：\n"
+    "1. 【基础阅读】首要步骤：调用 `read_markdown` 读取文献的 Markdown 正文文本，以获取全局信息。\n"
+    "2. 【加载方式判定】关键校验：必须从提取到的图片列表中定位【加载装置示意图】，并强制调用 `inspect_image` 工具查阅该原图。通过原图事实直接评判加载方式是否为偏心加载，且是否为上下等端距离加载（或非等端距离加载）。这一步不可跳过。\n"
+    "3. 【表格错位排查（强制防坑）】数据提取：基于 Markdown 文本中的表格，仔细对比每一行的物理意义，你必须意识到 MinerU 会把原本分为多行的试件标识（如 C1、C2）强行合并到一个单元格（例如 `C1 C2` 或者 `S5 R1`），这会导致右侧所有的数据列发生严重的行错位和单格多值！\n"
+    "   - **若表格清晰且试件标识行列一一对应**：直接从文本提取数据，无需查阅表格原图。\n"
+    "   - **⚠️ 若存在任何异常（尤其是试件名字/Shape列发生合并如 `C1 C2`、数据区出现空格隔开的多个数值如 `76.6 152.3`）**：这代表表格已被严重破坏！绝对禁止运用个人逻辑对数据进行切割分配！你**必须立刻**在图片列表中找到该表格的原图，并调用 `inspect_image` 查看。\n"
+    "   - **若同一试件的属性分散在多张表中**（如几何与材料在一张表、承载力 N_u 在另一张表）：调用 `join_specimen_tables` 按试件编号一次性合并各表的行，不要在脑中逐行对照；返回记录带有 `merged_label` 时仍须按上一条查阅表格原图。\n"
+    "4. 【运算工具使用】任何单位换算、几何截面计算需强制使用 `execute_python_calc` 工具。\n"
+    "5. 【综合得出结果】最后，结合上述 Markdown 正文、加载装置查阅结果以及任何可能修正过的表格数据，整理得出结论并输出规范的 JSON 数据。\n"
+)
+
 # ---------------------------------------------------------------------------
 # 配置加载: YAML 文件 → 环境变量覆盖 → 代码默认值
 # ---------------------------------------------------------------------------
@@ -37,10 +62,30 @@ _PLATFORM_PRESETS: dict[str, dict[str, bool]] = {
     "custom":      {"flatten_defs": False, "fix_tool_choice": False, "fix_anyof": False, "xhigh": False},
 }
 
+# 可选的提示缓存提示 (默认关闭，需在 agent.patches 中手动开启):
+#   cache_control    → 在 system 消息与固定工作流文本上标注 {"type": "ephemeral"} 缓存断点
+#                      (DashScope 显式缓存 / Anthropic 兼容代理)
+#   prompt_cache_key → 附加固定的 prompt_cache_key，帮助 OpenAI 将请求路由到同一缓存
+_OPTIONAL_PATCHES: dict[str, bool] = {"cache_control": False, "prompt_cache_key": False}
+
 _DEFAULTS = {
     "api": {"api_key": "", "base_url": ""},
     "model": {"name": "google-gla:gemini-2.5-pro"},
-    "agent": {"retries": 3, "platform": "openai"},
+    "agent": {
+        "retries": 3,
+        "platform": "openai",
+        "compact_markdown": False,
+        # 时间与回合预算 (None 表示不限制)
+        "budgets": {"request_timeout": None, "paper_timeout": None, "max_turns": None, "repair_max_turns": 3},
+        # 对冲请求: 单次请求耗时超过近期 percentile 分位数时向 model (默认同主模型) 再发一份
+        "hedge": {"enabled": False, "percentile": 0.95, "min_samples": 10, "model": None},
+        # 单篇论文的工具调用预算: 工具名 → 最多执行次数，total 限制全部工具调用 (含重复调用)
+        "tool_budgets": {"inspect_image": None, "execute_python_calc": None, "total": None},
+        # 多模型并行提取: models 中的模型与主模型同时运行，任意两份结果在容差内一致即返回
+        "consensus": {"models": [], "rel_tol": 0.02, "abs_tol": 0.5},
+        # 对话历史裁剪: 最近 keep_turns 轮之前的图片与超过 max_tool_chars 字符的工具输出替换为摘要/引用
+        "history": {"prune": True, "max_tool_chars": 4000, "keep_turns": 3},
+    },
 }
 
 
@@ -54,6 +99,8 @@ def _load_settings() -> dict:
         for section in ("api", "model", "agent"):
             if section in file_cfg:
                 cfg[section] = {**cfg[section], **file_cfg[section]}
+        for key in ("budgets", "hedge", "tool_budgets", "consensus", "history"):
+            cfg["agent"][key] = {**_DEFAULTS["agent"][key], **(cfg["agent"].get(key) or {})}
     else:
         print(f"WARNING: 配置文件不存在 {_SETTINGS_PATH}，使用内置默认值")
     return cfg
@@ -62,7 +109,7 @@ def _load_settings() -> dict:
 def _resolve_patches(agent_cfg: dict) -> dict[str, bool]:
     """从 platform 预设 + 手动 patches 覆盖解析最终的补丁开关。"""
     platform = agent_cfg.get("platform", "openai")
-    base = _PLATFORM_PRESETS.get(platform, _PLATFORM_PRESETS["custom"]).copy()
+    base = {**_OPTIONAL_PATCHES, **_PLATFORM_PRESETS.get(platform, _PLATFORM_PRESETS["custom"])}
     # agent.patches 中的手动配置覆盖预设
     manual = agent_cfg.get("patches", {})
     if manual:
@@ -70,6 +117,13 @@ def _resolve_patches(agent_cfg: dict) -> dict[str, bool]:
     return base
 
 
+def platform_patches(platform: str) -> dict[str, bool]:
+    """以当前配置为基础、换用另一平台预设时的补丁开关 (可选的缓存提示保持不变)。"""
+    if platform not in _PLATFORM_PRESETS:
+        raise ValueError(f"unknown platform {platform!r} (expected one of {sorted(_PLATFORM_PRESETS)})")
+    return {**_patches, **_PLATFORM_PRESETS[platform]}
+
+
 _settings = _load_settings()
 _patches = _resolve_patches(_settings["agent"])
 
@@ -78,6 +132,12 @@ _api_key = os.environ.get("OPENAI_API_KEY") or _settings["api"].get("api_key", "
 _base_url = os.environ.get("OPENAI_BASE_URL") or _settings["api"].get("base_url", "")
 _model_name = os.environ.get("CFST_MODEL") or _settings["model"]["name"]
 _retries = int(os.environ.get("CFST_RETRIES", _settings["agent"]["retries"]))
+_compact_markdown = bool(_settings["agent"].get("compact_markdown", False))
+_budgets = _settings["agent"]["budgets"]
+_hedge = _settings["agent"]["hedge"]
+_tool_budgets = _settings["agent"]["tool_budgets"]
+_consensus = _settings["agent"]["consensus"]
+_history = _settings["agent"]["history"]
 
 # 仅在有值时设置环境变量 (供 pydantic-ai 的 OpenAI provider 读取)
 if _api_key:
@@ -90,119 +150,301 @@ if _base_url:
 # ---------------------------------------------------------------------------
 original_send = httpx.AsyncClient.send
 
+# 在当前任务范围内覆盖补丁开关 / 启用响应缓存 (benchmark 在同一进程中并行对比多种配置)
+patch_override: ContextVar[dict[str, bool] | None] = ContextVar("patch_override", default=None)
+response_cache_dir: ContextVar[Path | None] = ContextVar("response_cache_dir", default=None)
+
+# (补丁开关, 原始 tools JSON) → 补丁后的 tools：每轮请求的 schema 相同，只需改写一次，
+# 也保证了改写结果在各轮之间逐字节一致
+_rewritten_tools: dict[tuple, list] = {}
+
+_CACHE_BREAKPOINT = {"type": "ephemeral"}
+
+
+def _mark_cache_breakpoints(messages: list[dict]) -> None:
+    """在 system 消息与固定工作流文本片段上标注缓存断点。"""
+    for message in messages:
+        content = message.get("content")
+        if message.get("role") == "system" and isinstance(content, str):
+            message["content"] = [{"type": "text", "text": content, "cache_control": _CACHE_BREAKPOINT}]
+        elif message.get("role") == "user" and isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("text") == WORKFLOW_PROMPT:
+                    part["cache_control"] = _CACHE_BREAKPOINT
+                    return
+
+
+def _rewrite_body(body: dict) -> bool:
+    """按当前补丁开关原地改写一个 chat/completions 请求体，返回是否发生了修改。"""
+    modified = False
+    patches = patch_override.get() or _patches
+
+    # 只有启用了 schema 补丁时 tools 才会被改写；否则保持 SDK 原样序列化的请求体
+    rewrite_tools = "tools" in body and (patches["flatten_defs"] or patches["fix_anyof"])
+    tools_key = (
+        (patches["flatten_defs"], patches["fix_anyof"], json.dumps(body["tools"])) if rewrite_tools else None
+    )
+    cached_tools = _rewritten_tools.get(tools_key) if tools_key else None
+    tools_modified = False
+
+    # 补丁 1: 注入 xhigh (思考强调) 参数
+    if patches["xhigh"]:
+        body["xhigh"] = True
+        modified = True
+
+    # 补丁 2: thinking mode 兼容 — tool_choice=required → auto
+    if patches["fix_tool_choice"]:
+        tc = body.get("tool_choice")
+        if tc == "required" or (isinstance(tc, dict) and tc.get("type") == "required"):
+            body["tool_choice"] = "auto"
+            modified = True
+
+    if cached_tools is not None:
+        body["tools"] = cached_tools
+        tools_modified = True
+
+    # 补丁 3: 展平 $defs/$ref 嵌套引用
+    if patches["flatten_defs"] and "tools" in body and cached_tools is None:
+        def resolve_refs(node, root_defs):
+            if isinstance(node, dict):
+                if "$ref" in node:
+                    ref_key = node["$ref"].split("/")[-1]
+                    if ref_key in root_defs:
+                        resolved = root_defs[ref_key].copy()
+                        return resolve_refs(resolved, root_defs)
+                return {k: resolve_refs(v, root_defs) for k, v in node.items()}
+            elif isinstance(node, list):
+                return [resolve_refs(x, root_defs) for x in node]
+            return node
+
+        for tool in body.get("tools", []):
+            params = tool.get("function", {}).get("parameters", {})
+            if "$defs" in params:
+                defs = params.pop("$defs")
+                tool["function"]["parameters"] = resolve_refs(params, defs)
+                tools_modified = True
+
+    # 补丁 4: 将 anyOf 简化为单一 type (部分平台不支持)
+    if patches["fix_anyof"] and "tools" in body and cached_tools is None:
+        def fix_anyof(node):
+            if isinstance(node, dict):
+                if "anyOf" in node:
+                    types = []
+                    for item in node["anyOf"]:
+                        if isinstance(item, dict) and "type" in item:
+                            types.append(item["type"])
+                    if types:
+                        if "null" in types:
+                            types.remove("null")
+                        if len(types) >= 1:
+                            node["type"] = types[0]
+                    del node["anyOf"]
+                for k, v in node.items():
+                    fix_anyof(v)
+            elif isinstance(node, list):
+                for x in node:
+                    fix_anyof(x)
+
+        for tool in body.get("tools", []):
+            fix_anyof(tool.get("function", {}).get("parameters", {}))
+        tools_modified = True
+
+    if tools_modified:
+        modified = True
+        if cached_tools is None:
+            _rewritten_tools[tools_key] = body["tools"]
+
+    # 补丁 5/6: 可选的提示缓存提示
+    if patches["cache_control"] and "messages" in body:
+        _mark_cache_breakpoints(body["messages"])
+        modified = True
+    if patches["prompt_cache_key"]:
+        body["prompt_cache_key"] = "cfst-extractor"
+        modified = True
+
+    return modified
+
 
 async def _patched_send(self, request: httpx.Request, **kwargs):
     if request.url.path.endswith("/chat/completions"):
         content = request.content
+        stats = current_run_stats.get()
         if b'"$defs"' in content or b'"model"' in content:
-            body = json.loads(content)
-            modified = False
-
-            # 补丁 1: 注入 xhigh (思考强调) 参数
-            if _patches["xhigh"]:
-                body["xhigh"] = True
-                modified = True
-
-            # 补丁 2: thinking mode 兼容 — tool_choice=required → auto
-            if _patches["fix_tool_choice"]:
-                tc = body.get("tool_choice")
-                if tc == "required" or (isinstance(tc, dict) and tc.get("type") == "required"):
-                    body["tool_choice"] = "auto"
-                    modified = True
-
-            # 补丁 3: 展平 $defs/$ref 嵌套引用
-            if _patches["flatten_defs"] and "tools" in body:
-                def resolve_refs(node, root_defs):
-                    if isinstance(node, dict):
-                        if "$ref" in node:
-                            ref_key = node["$ref"].split("/")[-1]
-                            if ref_key in root_defs:
-                                resolved = root_defs[ref_key].copy()
-                                return resolve_refs(resolved, root_defs)
-                        return {k: resolve_refs(v, root_defs) for k, v in node.items()}
-                    elif isinstance(node, list):
-                        return [resolve_refs(x, root_defs) for x in node]
-                    return node
-
-                for tool in body.get("tools", []):
-                    params = tool.get("function", {}).get("parameters", {})
-                    if "$defs" in params:
-                        defs = params.pop("$defs")
-                        tool["function"]["parameters"] = resolve_refs(params, defs)
-                        modified = True
-
-            # 补丁 4: 将 anyOf 简化为单一 type (部分平台不支持)
-            if _patches["fix_anyof"] and "tools" in body:
-                def fix_anyof(node):
-                    if isinstance(node, dict):
-                        if "anyOf" in node:
-                            types = []
-                            for item in node["anyOf"]:
-                                if isinstance(item, dict) and "type" in item:
-                                    types.append(item["type"])
-                            if types:
-                                if "null" in types:
-                                    types.remove("null")
-                                if len(types) >= 1:
-                                    node["type"] = types[0]
-                            del node["anyOf"]
-                        for k, v in node.items():
-                            fix_anyof(v)
-                    elif isinstance(node, list):
-                        for x in node:
-                            fix_anyof(x)
-
-                for tool in body.get("tools", []):
-                    fix_anyof(tool.get("function", {}).get("parameters", {}))
-                modified = True
-
-            if modified:
-                new_content = json.dumps(body).encode("utf-8")
-                headers = dict(request.headers)
-                headers["content-length"] = str(len(new_content))
-                request = httpx.Request(
-                    method=request.method,
-                    url=request.url,
-                    headers=headers,
-                    content=new_content,
-                )
+            with span("rewrite_body", "rewrite", bytes=len(content)):
+                body = json.loads(content)
+                if _rewrite_body(body):
+                    new_content = json.dumps(body).encode("utf-8")
+                    headers = dict(request.headers)
+                    headers["content-length"] = str(len(new_content))
+                    request = httpx.Request(
+                        method=request.method,
+                        url=request.url,
+                        headers=headers,
+                        content=new_content,
+                    )
+        if stats is not None:
+            # 每轮请求体字节数：裁剪历史后应保持平稳而不是逐轮增长
+            stats.setdefault("request_bytes", []).append(len(request.content))
+
+        if kwargs.get("stream"):
+            return await _streamed_send(self, request, **kwargs)
+        cache_dir = response_cache_dir.get()
+        with span("chat/completions", "model", bytes=len(request.content)):
+            if cache_dir is not None:
+                return await _cached_send(self, request, cache_dir, **kwargs)
+            return await original_send(self, request, **kwargs)
 
     return await original_send(self, request, **kwargs)
 
 
+async def _streamed_send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+    """流式请求在响应头到达时就返回：model span 延续到调用方读完并关闭响应体为止。"""
+    model_span = ExitStack()
+    model_span.enter_context(span("chat/completions", "model", bytes=len(request.content), stream=True))
+    try:
+        response = await original_send(self, request, **kwargs)
+    except BaseException:
+        model_span.close()
+        raise
+
+    aclose = response.aclose
+
+    async def _aclose() -> None:
+        try:
+            await aclose()
+        finally:
+            model_span.close()
+
+    response.aclose = _aclose
+    return response
+
+
+async def _cached_send(self, request: httpx.Request, cache_dir: Path, **kwargs) -> httpx.Response:
+    """按 (URL, 改写后的请求体) 缓存成功的非流式响应：请求逐字节相同时直接返回磁盘上的响应。"""
+    from cfst_extractor.output import atomic_write_bytes
+
+    key = hashlib.sha256(str(request.url).encode("utf-8") + b"\n" + request.content).hexdigest()
+    path = cache_dir / f"{key}.json"
+    if path.exists():
+        stats = current_run_stats.get()
+        if stats is not None:
+            stats["cached_responses"] = stats.get("cached_responses", 0) + 1
+        return httpx.Response(
+            200, headers={"content-type": "application/json"}, content=path.read_bytes(), request=request
+        )
+
+    response = await original_send(self, request, **kwargs)
+    if response.status_code == 200:
+        await response.aread()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(path, response.content)
+    return response
+
+
 httpx.AsyncClient.send = _patched_send
 # ---------------------------------------------------------------------------
 
+def _prune_history(ctx: RunContext[PaperDeps], messages: list[ModelMessage]) -> list[ModelMessage]:
+    """每轮请求前裁剪较早轮次的图片与长工具输出 (见 history.py)。"""
+    return prune_history(
+        messages,
+        max_chars=int(_history.get("max_tool_chars", 4000)),
+        keep_turns=int(_history.get("keep_turns", 3)),
+        stats=ctx.deps.stats,
+    )
+
+
+_history_processors = [_prune_history] if _history.get("prune") else []
+
 # 初始化 Pydantic AI Agent
 cfst_agent = Agent(
     _model_name,
     output_type=PaperExtraction,
+    deps_type=PaperDeps,
     instructions=SYSTEM_PROMPT,
     retries=_retries,
+    history_processors=_history_processors,
 )
 
-# 注册 Dependency Type 为 Path (paper_dir)
+# 注册 Dependency Type 为 PaperDeps (paper_dir + 本次运行统计)
+# 所有工具都经由 governor 执行：预算检查、重复调用记忆化与耗时统计
 @cfst_agent.tool
-def tool_list_directory_files(ctx: RunContext[Path]) -> list[str]:
+def tool_list_directory_files(ctx: RunContext[PaperDeps]) -> list[str]:
     """列出当前论文解析目录中的所有可用文件列表。"""
-    return list_directory_files(ctx.deps)
+    return ctx.deps.governor.call(
+        "list_directory_files", {}, lambda: list_directory_files(ctx.deps.paper_dir)
+    )
 
 @cfst_agent.tool
-def tool_read_markdown(ctx: RunContext[Path]) -> str:
+def tool_read_markdown(ctx: RunContext[PaperDeps]) -> str:
     """一次性读取论文解析出的 Markdown 正文内容。"""
-    return read_markdown(ctx.deps)
+    return ctx.deps.governor.call(
+        "read_markdown",
+        {},
+        lambda: read_markdown(ctx.deps.paper_dir, compact=_compact_markdown, stats=ctx.deps.stats),
+    )
+
+@cfst_agent.tool
+def tool_join_specimen_tables(ctx: RunContext[PaperDeps], table_numbers: list[int]) -> list[dict]:
+    """
+    按试件编号合并多张表格的行 (容忍大小写、连字符、脚注标记及 O/0、l/1 等 OCR 混淆)。
+    参数 table_numbers: 需要合并的表格序号 (按在 Markdown 中出现的顺序，从 1 开始)；传空列表表示合并全部表格。
+    """
+    return ctx.deps.governor.call(
+        "join_specimen_tables",
+        {"table_numbers": sorted(table_numbers)},
+        lambda: join_specimen_tables(ctx.deps.paper_dir, table_numbers),
+    )
 
 @cfst_agent.tool
-def tool_execute_python_calc(ctx: RunContext[Path], expression: str) -> float:
+def tool_execute_python_calc(ctx: RunContext[PaperDeps], expression: str) -> float:
     """
     一个 Python 计算器。当你需要进行单位转换或尺寸计算时，传入有效的单行 Python 算术表达式。
     """
-    return execute_python_calc(expression)
+    return ctx.deps.governor.call(
+        "execute_python_calc", {"expression": expression}, lambda: execute_python_calc(expression)
+    )
 
 @cfst_agent.tool
-def tool_inspect_image(ctx: RunContext[Path], image_path: str, reason: str) -> bytes:
+def tool_inspect_image(ctx: RunContext[PaperDeps], image_path: str, reason: str) -> bytes:
     """
     视觉读取工具。传入相对于论文目录的图片路径（如 'images/table_2.jpg'）。
     参数 reason: 必须用一句话说明你为什么要查看这张图片（例如：发现表格行错位、正文未交代加载方式等）。
     """
-    return inspect_image(ctx.deps, image_path, reason)
+    # reason 不参与重复判定：同一张图换个理由再看一次仍视为重复调用
+    return ctx.deps.governor.call(
+        "inspect_image",
+        {"image_path": image_path},
+        lambda: inspect_image(ctx.deps.paper_dir, image_path, reason),
+    )
+
+
+# 定向修复 Agent：输入中已附上相关表格文本与原图，只保留计算与查图工具
+repair_agent = Agent(
+    _model_name,
+    output_type=SpecimenRepair,
+    deps_type=PaperDeps,
+    instructions=SYSTEM_PROMPT,
+    retries=_retries,
+    history_processors=_history_processors,
+    tools=[tool_execute_python_calc, tool_inspect_image],
+)
+
+
+def build_agent(instructions: str) -> Agent:
+    """以另一版本的 system prompt 构造提取 Agent (工具与 cfst_agent 相同)，用于对比提示词版本。"""
+    return Agent(
+        _model_name,
+        output_type=PaperExtraction,
+        deps_type=PaperDeps,
+        instructions=instructions,
+        retries=_retries,
+        history_processors=_history_processors,
+        tools=[
+            tool_list_directory_files,
+            tool_read_markdown,
+            tool_join_specimen_tables,
+            tool_execute_python_calc,
+            tool_inspect_image,
+        ],
+    )
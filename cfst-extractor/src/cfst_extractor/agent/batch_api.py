@@ -0,0 +1,381 @@
+"""OpenAI 兼容 `/batches` 异步批处理模式。
+
+同步模式下每篇论文独占一个 Agent 多轮对话循环；批处理模式则把提取过程改写为"轮次"：
+每一轮把所有尚未完成论文的下一次请求打包为一个 JSONL 文件提交到 `/batches`，
+轮询直至批次完成后在本地执行工具调用，再统一推进所有对话。以延迟换取更高的单位成本吞吐。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import typer
+from pydantic import ValidationError
+
+from cfst_extractor.agent.agent import (
+    SYSTEM_PROMPT,
+    _compact_markdown,
+    _model_name,
+    _rewrite_body,
+    _tool_budgets,
+)
+from cfst_extractor.agent.extractor import build_prompt, failed_extraction, usage_stats
+from cfst_extractor.agent.governor import ToolBudgetExceeded, ToolGovernor
+from cfst_extractor.agent.models import PaperExtraction
+from cfst_extractor.agent.tools import (
+    evidence_offsets,
+    execute_python_calc,
+    image_media_type,
+    inspect_image,
+    join_specimen_tables,
+    list_directory_files,
+    read_markdown,
+)
+
+_ENDPOINT = "/v1/chat/completions"
+_FINAL_TOOL = "final_result"
+_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _function(name: str, description: str, properties: dict | None = None) -> dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": properties or {},
+                "required": list(properties or {}),
+            },
+        },
+    }
+
+
+# 与 agent.py 中注册的工具一一对应，最终结果通过 final_result 工具提交
+TOOLS: list[dict] = [
+    _function("tool_list_directory_files", "列出当前论文解析目录中的所有可用文件列表。"),
+    _function("tool_read_markdown", "一次性读取论文解析出的 Markdown 正文内容。"),
+    _function(
+        "tool_join_specimen_tables",
+        "按试件编号合并多张表格的行 (容忍大小写、连字符、脚注标记及 O/0、l/1 等 OCR 混淆)。"
+        "参数 table_numbers: 需要合并的表格序号 (按在 Markdown 中出现的顺序，从 1 开始)；传空列表表示合并全部表格。",
+        {"table_numbers": {"type": "array", "items": {"type": "integer"}}},
+    ),
+    _function(
+        "tool_execute_python_calc",
+        "一个 Python 计算器。当你需要进行单位转换或尺寸计算时，传入有效的单行 Python 算术表达式。",
+        {"expression": {"type": "string"}},
+    ),
+    _function(
+        "tool_inspect_image",
+        "视觉读取工具。传入相对于论文目录的图片路径（如 'images/table_2.jpg'）。"
+        "参数 reason: 必须用一句话说明你为什么要查看这张图片。",
+        {"image_path": {"type": "string"}, "reason": {"type": "string"}},
+    ),
+    {
+        "type": "function",
+        "function": {
+            "name": _FINAL_TOOL,
+            "description": "提交最终的结构化提取结果。",
+            "parameters": PaperExtraction.model_json_schema(),
+        },
+    },
+]
+
+
+class BatchAPIClient:
+    """`/files` + `/batches` 端点的最小异步客户端。"""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str = "",
+        client: httpx.AsyncClient | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = client or httpx.AsyncClient(timeout=60.0)
+        self._headers = headers
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        resp = await self._client.request(
+            method, f"{self.base_url}{path}", headers=self._headers, **kwargs
+        )
+        resp.raise_for_status()
+        return resp
+
+    async def submit(self, lines: list[dict]) -> str:
+        """上传 JSONL 请求文件并创建批次，返回 batch id。"""
+        payload = "\n".join(json.dumps(line, ensure_ascii=False) for line in lines)
+        upload = await self._request(
+            "POST",
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", payload.encode("utf-8"), "application/jsonl")},
+        )
+        batch = await self._request(
+            "POST",
+            "/batches",
+            json={
+                "input_file_id": upload.json()["id"],
+                "endpoint": _ENDPOINT,
+                "completion_window": "24h",
+            },
+        )
+        return batch.json()["id"]
+
+    async def wait(self, batch_id: str, poll_interval: float) -> dict:
+        """轮询批次直至进入终止状态。"""
+        while True:
+            batch = (await self._request("GET", f"/batches/{batch_id}")).json()
+            if batch.get("status") in _TERMINAL_STATES:
+                return batch
+            await asyncio.sleep(poll_interval)
+
+    async def results(self, batch: dict) -> dict[str, dict]:
+        """下载输出文件与错误文件，按 custom_id 索引。"""
+        out: dict[str, dict] = {}
+        for key in ("output_file_id", "error_file_id"):
+            file_id = batch.get(key)
+            if not file_id:
+                continue
+            text = (await self._request("GET", f"/files/{file_id}/content")).text
+            for raw in text.splitlines():
+                if raw.strip():
+                    line = json.loads(raw)
+                    out[line["custom_id"]] = line
+        return out
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+@dataclass
+class _Conversation:
+    """单篇论文在批处理模式下的对话状态。"""
+
+    custom_id: str
+    paper_dir: Path
+    messages: list[dict] = field(default_factory=list)
+    turns: int = 0
+    retries: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    stats: dict = field(default_factory=dict)
+    governor: ToolGovernor = field(default_factory=lambda: ToolGovernor(budgets=dict(_tool_budgets)))
+    result: PaperExtraction | None = None
+
+
+class BatchRunner:
+    """以轮次方式推进多篇论文的提取对话。"""
+
+    def __init__(
+        self,
+        client: BatchAPIClient,
+        model: str | None = None,
+        poll_interval: float = 30.0,
+        max_turns: int = 20,
+        retries: int = 3,
+    ):
+        self.client = client
+        self.model = model
+        # pydantic-ai 的 "provider:model" 标识符 → API 侧的裸模型名
+        self.api_model = (model or _model_name).split(":", 1)[-1]
+        self.poll_interval = poll_interval
+        self.max_turns = max_turns
+        self.retries = retries
+        self.run_stats: dict[str, dict] = {}
+
+    def _body(self, conv: _Conversation) -> dict:
+        body = {
+            "model": self.api_model,
+            "messages": conv.messages,
+            "tools": json.loads(json.dumps(TOOLS)),
+            "tool_choice": "required",
+        }
+        _rewrite_body(body)
+        return body
+
+    async def run(self, paper_dirs: list[Path]) -> list[tuple[str, PaperExtraction]]:
+        convs = [
+            _Conversation(
+                custom_id=f"paper-{i}",
+                paper_dir=d,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": [{"type": "text", "text": t} for t in build_prompt(d.name)]},
+                ],
+            )
+            for i, d in enumerate(paper_dirs)
+        ]
+
+        round_no = 0
+        while pending := [c for c in convs if c.result is None]:
+            round_no += 1
+            lines = [
+                {"custom_id": c.custom_id, "method": "POST", "url": _ENDPOINT, "body": self._body(c)}
+                for c in pending
+            ]
+            batch_id = await self.client.submit(lines)
+            typer.secho(f"› Round {round_no}: submitted {len(lines)} requests as {batch_id}", dim=True)
+            batch = await self.client.wait(batch_id, self.poll_interval)
+            # failed / expired / cancelled 的批次仍可能带有部分输出：有响应的对话照常推进，
+            # 其余对话标记为失败，不影响其他论文
+            status = batch.get("status")
+            missing = "missing response" if status == "completed" else f"batch {batch_id} ended with status {status}"
+            if status != "completed":
+                typer.secho(f"› Round {round_no}: {missing}", fg=typer.colors.YELLOW)
+            responses = await self.client.results(batch)
+            for c in pending:
+                self._advance(c, responses.get(c.custom_id), missing)
+
+        for c in convs:
+            self.run_stats[c.paper_dir.name] = {
+                **c.stats,
+                "tools": c.governor.profile(),
+                **usage_stats(c.input_tokens, c.cached_tokens, c.output_tokens, c.turns),
+            }
+        return [(c.paper_dir.name, c.result) for c in convs]
+
+    def _fail(self, conv: _Conversation, reason: str) -> None:
+        # 与同步模式一致：失败的论文在 batch_summary.json 中记为 error (预算类状态保持不变)
+        conv.stats.setdefault("status", "error")
+        conv.stats.setdefault("error", reason)
+        conv.result = failed_extraction(f"Extraction Failed: {reason}", self.model)
+
+    def _advance(self, conv: _Conversation, line: dict | None, missing: str = "missing response") -> None:
+        """处理一条批处理响应，并把对话推进到下一次请求之前。"""
+        conv.turns += 1
+        response = (line or {}).get("response") or {}
+        body = response.get("body")
+        if not line or line.get("error") or response.get("status_code", 200) >= 400 or not isinstance(body, dict):
+            error = (line or {}).get("error") or body or missing
+            self._fail(conv, f"batch request error: {error}")
+            return
+
+        usage = body.get("usage") or {}
+        conv.input_tokens += usage.get("prompt_tokens", 0)
+        conv.cached_tokens += (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        conv.output_tokens += usage.get("completion_tokens", 0)
+
+        choices = body.get("choices") or [{}]
+        message = choices[0].get("message") if isinstance(choices[0], dict) else None
+        if not isinstance(message, dict):
+            self._fail(conv, f"batch response without message: {body.get('error') or body}")
+            return
+        conv.messages.append({k: v for k, v in message.items() if v is not None})
+        tool_calls = message.get("tool_calls") or []
+
+        if not tool_calls:
+            self._retry(conv, None, f"请调用 `{_FINAL_TOOL}` 工具提交最终结果。")
+        images = []
+        for call in tool_calls:
+            image = self._handle_call(conv, call)
+            if conv.result is not None:
+                return
+            if image is not None:
+                images.append(image)
+
+        # 工具消息必须紧跟在 assistant 消息之后，图片统一放在其后的 user 消息中
+        if images:
+            conv.messages.append({
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{image_media_type(img, path)};base64,"
+                            + base64.b64encode(img).decode("ascii")
+                        },
+                    }
+                    for img, path in images
+                ],
+            })
+
+        if conv.result is None and conv.turns >= self.max_turns:
+            self._fail(conv, f"exceeded {self.max_turns} turns")
+
+    def _retry(self, conv: _Conversation, call_id: str | None, feedback: str) -> None:
+        conv.retries += 1
+        if conv.retries > self.retries:
+            self._fail(conv, f"exceeded max retries: {feedback}")
+        elif call_id:
+            conv.messages.append({"role": "tool", "tool_call_id": call_id, "content": feedback})
+        else:
+            conv.messages.append({"role": "user", "content": feedback})
+
+    def _handle_call(self, conv: _Conversation, call: dict) -> tuple[bytes, str] | None:
+        """执行一次工具调用；inspect_image 的 (图片字节, 路径) 作为返回值交给调用方附加。"""
+        name = call["function"]["name"]
+        call_id = call["id"]
+        try:
+            args = json.loads(call["function"].get("arguments") or "{}")
+        except json.JSONDecodeError as e:
+            self._retry(conv, call_id, f"参数不是合法 JSON: {e}")
+            return None
+
+        if name == _FINAL_TOOL:
+            try:
+                extraction = PaperExtraction.model_validate(args)
+            except ValidationError as e:
+                self._retry(conv, call_id, f"输出校验失败，请修正后重新提交:\n{e}")
+                return None
+            extraction.extraction_model = self.model or "default"
+            extraction.extraction_time = datetime.now().isoformat()
+            if "markdown_tokens" in conv.stats:
+                conv.stats["evidence_offsets"] = evidence_offsets(conv.paper_dir, extraction)
+            conv.result = extraction
+            return None
+
+        image: tuple[bytes, str] | None = None
+        gov = conv.governor
+        try:
+            if name == "tool_list_directory_files":
+                files = gov.call("list_directory_files", {}, lambda: list_directory_files(conv.paper_dir))
+                content = json.dumps(files, ensure_ascii=False)
+            elif name == "tool_read_markdown":
+                content = gov.call(
+                    "read_markdown",
+                    {},
+                    lambda: read_markdown(conv.paper_dir, compact=_compact_markdown, stats=conv.stats),
+                )
+            elif name == "tool_join_specimen_tables":
+                numbers = args.get("table_numbers") or []
+                records = gov.call(
+                    "join_specimen_tables",
+                    {"table_numbers": sorted(numbers)},
+                    lambda: join_specimen_tables(conv.paper_dir, numbers),
+                )
+                content = json.dumps(records, ensure_ascii=False)
+            elif name == "tool_execute_python_calc":
+                expr = args["expression"]
+                content = str(gov.call("execute_python_calc", {"expression": expr}, lambda: execute_python_calc(expr)))
+            elif name == "tool_inspect_image":
+                path = args["image_path"]
+                data = gov.call(
+                    "inspect_image",
+                    {"image_path": path},
+                    lambda: inspect_image(conv.paper_dir, path, args.get("reason", "")),
+                )
+                image = (data, path)
+                content = f"图片 {path} 已附在下一条消息中。"
+            else:
+                content = f"未知工具: {name}"
+        except ToolBudgetExceeded as e:
+            conv.stats["status"] = "tool_budget_exceeded"
+            conv.result = failed_extraction(f"Extraction Stopped: {e}", self.model)
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # 工具错误 (文件缺失、表达式非法、参数缺失等) 作为文本反馈给模型，由模型决定如何继续
+            content = f"工具调用出错: {e}"
+
+        conv.messages.append({"role": "tool", "tool_call_id": call_id, "content": content})
+        return image
@@ -0,0 +1,319 @@
+"""MinerU Markdown 压缩：在发送给模型之前去掉不影响提取的冗余内容。
+
+处理步骤 (逐行/逐表格进行，每个输出片段都记录其在原文中的偏移，可反查 source_evidence)：
+1. 删除标题恰为参考文献 (References / 7. 参考文献) 或致谢 (Acknowledgements / 致谢) 的章节，
+   章节内含表格时整体保留；
+2. 删除重复出现的页眉页脚以及纯页码行：同一短行出现 3 次及以上 (数字视为相同)，且紧邻页码行
+   或形如期刊页眉 (卷期页码、DOI、版权行等) 时只保留第一次出现；公式块 ($$ … $$) 与表格行不参与；
+3. 将 HTML `<table>` 改写为紧凑的 `|` 分隔网格，并展开 rowspan/colspan；
+4. 化简行内 LaTeX (如 `$\\mathrm { M P a }$` → `MPa`)，统一 `N/mm2` 等单位写法为 MPa；
+5. 规范空白：去掉行尾空格、合并连续空行。
+"""
+
+from __future__ import annotations
+
+import bisect
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+from bs4 import BeautifulSoup
+
+TABLE_RE = re.compile(
+    r"(?:<html>\s*<body>\s*)?<table.*?</table>(?:\s*</body>\s*</html>)?", re.IGNORECASE | re.DOTALL
+)
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+(.*)$")
+_DROP_SECTION_RE = re.compile(
+    r"^(?:\d+(?:\.\d+)*\.?\s*)?(?:references?|bibliography|acknowledge?ments?|参考文献|致谢)\s*[:：]?\s*$",
+    re.IGNORECASE,
+)
+_PAGE_NUMBER_RE = re.compile(r"^\s*(?:page\s*)?[-–—]?\s*\d{1,4}\s*[-–—]?\s*$", re.IGNORECASE)
+# 期刊页眉页脚：卷(期)页码、DOI、ISSN、版权声明、网址等
+_RUNNING_TITLE_RE = re.compile(
+    r"\b(?:vol|volume|pp|doi|issn)\b\.?|journal|proceedings|©|copyright|https?://|\b(?:19|20)\d{2}\b.*\d+\s*\(\d+\)",
+    re.IGNORECASE,
+)
+_INLINE_MATH_RE = re.compile(r"\$\$(.+?)\$\$|\$(.+?)\$", re.DOTALL)
+_STRESS_UNIT_RE = re.compile(r"N\s*/\s*mm\s*(?:\^?\s*\{?2\}?|²)(?![\d])")
+_CJK_RE = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+# 行内 LaTeX 命令 → Unicode；格式命令 (\mathrm 等) 直接去掉
+_LATEX_SYMBOLS = {
+    r"\times": "×", r"\cdot": "·", r"\circ": "°", r"\prime": "′", r"\pm": "±",
+    r"\le": "≤", r"\leq": "≤", r"\ge": "≥", r"\geq": "≥", r"\approx": "≈",
+    r"\alpha": "α", r"\beta": "β", r"\gamma": "γ", r"\delta": "δ", r"\Delta": "Δ",
+    r"\varepsilon": "ε", r"\epsilon": "ε", r"\eta": "η", r"\lambda": "λ", r"\mu": "μ",
+    r"\nu": "ν", r"\xi": "ξ", r"\pi": "π", r"\rho": "ρ", r"\sigma": "σ", r"\tau": "τ",
+    r"\phi": "φ", r"\varphi": "φ", r"\psi": "ψ", r"\omega": "ω", r"\theta": "θ",
+    r"\%": "%",
+}
+_LATEX_FORMAT_RE = re.compile(r"\\(?:mathrm|mathbf|mathit|mathsf|boldsymbol|text|textrm|operatorname|left|right)\b")
+_LATEX_COMMAND_RE = re.compile(r"\\[A-Za-z]+|\\%")
+
+_HEADER_REPEAT_MIN = 3
+_HEADER_MAX_LEN = 100
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：中日韩字符按 1 个计，其余按每 4 个字符 1 个计。"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@dataclass
+class CompactMarkdown:
+    """压缩后的 Markdown 及其到原文的偏移映射。"""
+
+    text: str
+    # (out_start, out_end, src_start, src_end)，按 out_start 升序
+    segments: list[tuple[int, int, int, int]] = field(default_factory=list)
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    def _segment_at(self, pos: int) -> tuple[int, int, int, int]:
+        i = bisect.bisect_right([seg[0] for seg in self.segments], pos) - 1
+        return self.segments[max(i, 0)]
+
+    def source_span(self, start: int, end: int) -> tuple[int, int]:
+        """把压缩文本中的 [start, end) 映射回原文偏移。
+
+        原样保留的行逐字符精确映射；被改写的片段 (表格、公式等) 映射到整个原始片段。
+        """
+        if not self.segments:
+            return (0, 0)
+        first = self._segment_at(start)
+        last = self._segment_at(max(end - 1, start))
+
+        def _offset(seg: tuple[int, int, int, int], pos: int) -> int:
+            return seg[2] + min(max(pos - seg[0], 0), seg[1] - seg[0])
+
+        lo = _offset(first, start) if first[1] - first[0] == first[3] - first[2] else first[2]
+        hi = _offset(last, end) if last[1] - last[0] == last[3] - last[2] else last[3]
+        return (lo, max(hi, lo))
+
+    def locate(self, snippet: str) -> tuple[int, int] | None:
+        """在压缩文本中查找 snippet (如 source_evidence 引用的表格行)，返回其原文偏移。"""
+        pos = self.text.find(snippet)
+        if pos < 0:
+            return None
+        return self.source_span(pos, pos + len(snippet))
+
+    def evidence_offsets(self, evidence: list[tuple[str, str]]) -> dict[str, tuple[int, int]]:
+        """把 (试件编号, source_evidence) 映射回原文偏移。
+
+        evidence 原文出现在压缩文本中时按其定位，否则退而定位以该编号开头的表格行；都找不到的试件不出现在结果中。
+        """
+        offsets: dict[str, tuple[int, int]] = {}
+        for label, text in evidence:
+            span = self.locate(text.strip()) if text and text.strip() else None
+            if span is None and label:
+                row = re.search(rf"(?m)^{re.escape(label)}\|.*$", self.text)
+                span = self.source_span(row.start(), row.end()) if row else None
+            if span is not None:
+                offsets[label] = span
+        return offsets
+
+
+def _simplify_math(match: re.Match) -> str:
+    body = match.group(1) if match.group(1) is not None else match.group(2)
+    body = _LATEX_FORMAT_RE.sub("", body)
+    body = _LATEX_COMMAND_RE.sub(lambda m: _LATEX_SYMBOLS.get(m.group(0), m.group(0)), body)
+    body = re.sub(r"\s+", "", body).replace("{", "").replace("}", "")
+    return body or match.group(0)
+
+
+def _normalize_inline(line: str) -> str:
+    line = _INLINE_MATH_RE.sub(_simplify_math, line)
+    line = _STRESS_UNIT_RE.sub("MPa", line)
+    return re.sub(r"[ \t]+", " ", line).rstrip()
+
+
+def html_table_to_grid(html: str) -> list[list[str]]:
+    """解析 HTML 表格为二维网格，rowspan/colspan 合并单元格按原值展开填充。"""
+    soup = BeautifulSoup(html, "html.parser")
+    grid: list[list[str]] = []
+    pending: dict[tuple[int, int], str] = {}
+    for r, tr in enumerate(soup.find_all("tr")):
+        row: list[str] = []
+        c = 0
+        cells = tr.find_all(["td", "th"])
+        i = 0
+        while i < len(cells) or (r, c) in pending:
+            if (r, c) in pending:
+                row.append(pending.pop((r, c)))
+                c += 1
+                continue
+            cell = cells[i]
+            i += 1
+            text = _normalize_inline(cell.get_text(" ", strip=True)).replace("|", "/")
+            rowspan = int(cell.get("rowspan", 1) or 1)
+            colspan = int(cell.get("colspan", 1) or 1)
+            for dc in range(colspan):
+                row.append(text)
+                for dr in range(1, rowspan):
+                    pending[(r + dr, c + dc)] = text
+            c += colspan
+        grid.append(row)
+    return grid
+
+
+def render_grid(grid: list[list[str]]) -> str:
+    """把网格渲染为每行一条、单元格以 | 分隔的紧凑文本 (跳过全空行)。"""
+    return "\n".join("|".join(row) for row in grid if any(cell for cell in row))
+
+
+def split_units(source: str) -> list[tuple[int, int, str]]:
+    """切分为 (start, end, kind) 单元：kind 为 'table' 或 'line' (不含换行符)。"""
+    units: list[tuple[int, int, str]] = []
+    pos = 0
+    for m in TABLE_RE.finditer(source):
+        units.extend(_line_units(source, pos, m.start()))
+        units.append((m.start(), m.end(), "table"))
+        pos = m.end()
+    units.extend(_line_units(source, pos, len(source)))
+    return units
+
+
+def _line_units(source: str, start: int, end: int) -> list[tuple[int, int, str]]:
+    units = []
+    pos = start
+    while pos < end:
+        nl = source.find("\n", pos, end)
+        line_end = end if nl < 0 else nl
+        units.append((pos, line_end, "line"))
+        pos = line_end + 1
+        if nl < 0:
+            break
+    return units
+
+
+def _header_key(line: str) -> str:
+    return re.sub(r"\d+", "#", line.strip().lower())
+
+
+def _math_lines(source: str, units: list[tuple[int, int, str]]) -> set[int]:
+    """位于 $$ … $$ 公式块内 (含定界符所在行) 的行单元下标。"""
+    inside: set[int] = set()
+    in_math = False
+    for i, (start, end, kind) in enumerate(units):
+        if kind != "line":
+            continue
+        delimiters = source[start:end].count("$$")
+        if in_math or delimiters:
+            inside.add(i)
+        if delimiters % 2:
+            in_math = not in_math
+    return inside
+
+
+def _next_to_page_break(source: str, units: list[tuple[int, int, str]], i: int, step: int) -> bool:
+    """第 i 个单元沿 step 方向的下一个非空单元是否为页码行。"""
+    j = i + step
+    while 0 <= j < len(units):
+        start, end, kind = units[j]
+        raw = source[start:end]
+        if kind == "line" and not raw.strip():
+            j += step
+            continue
+        return kind == "line" and bool(_PAGE_NUMBER_RE.match(raw))
+    return False
+
+
+def _running_lines(source: str, units: list[tuple[int, int, str]], math: set[int]) -> set[int]:
+    """判定为页眉页脚的行单元下标：重复出现的短行，且紧邻页码行或形如期刊页眉。"""
+    candidates = [
+        i
+        for i, (start, end, kind) in enumerate(units)
+        if kind == "line"
+        and i not in math
+        and 0 < len(source[start:end].strip()) <= _HEADER_MAX_LEN
+        and not _HEADING_RE.match(source[start:end])
+        and not source[start:end].lstrip().startswith("|")
+    ]
+    counts = Counter(_header_key(source[units[i][0]:units[i][1]]) for i in candidates)
+    running: set[int] = set()
+    for i in candidates:
+        start, end, _ = units[i]
+        raw = source[start:end]
+        if counts[_header_key(raw)] < _HEADER_REPEAT_MIN:
+            continue
+        if (
+            _RUNNING_TITLE_RE.search(raw)
+            or _next_to_page_break(source, units, i, -1)
+            or _next_to_page_break(source, units, i, 1)
+        ):
+            running.add(i)
+    return running
+
+
+def _dropped_lines(source: str, units: list[tuple[int, int, str]]) -> set[int]:
+    """参考文献/致谢章节 (直到下一个标题) 的单元下标；含表格的章节整体保留，以免误删试件数据。"""
+    dropped: set[int] = set()
+    section: list[int] | None = None
+    has_table = False
+    for i, (start, end, kind) in enumerate(units):
+        heading = _HEADING_RE.match(source[start:end]) if kind == "line" else None
+        if heading:
+            if section is not None and not has_table:
+                dropped.update(section)
+            section = [i] if _DROP_SECTION_RE.match(heading.group(1).strip()) else None
+            has_table = False
+        elif section is not None:
+            section.append(i)
+            has_table = has_table or kind == "table"
+    if section is not None and not has_table:
+        dropped.update(section)
+    return dropped
+
+
+def compact_markdown(source: str) -> CompactMarkdown:
+    """按模块说明的步骤压缩 MinerU Markdown。"""
+    units = split_units(source)
+    math = _math_lines(source, units)
+    running = _running_lines(source, units, math)
+    dropped = _dropped_lines(source, units)
+    seen_headers: set[str] = set()
+
+    pieces: list[str] = []
+    segments: list[tuple[int, int, int, int]] = []
+    out_len = 0
+    blank_pending = False
+
+    for i, (start, end, kind) in enumerate(units):
+        raw = source[start:end]
+        if i in dropped:
+            continue
+        if kind == "table":
+            text = render_grid(html_table_to_grid(raw))
+        else:
+            if not raw.strip():
+                blank_pending = bool(pieces)
+                continue
+            if i not in math and _PAGE_NUMBER_RE.match(raw):
+                continue
+            if i in running:
+                key = _header_key(raw)
+                if key in seen_headers:
+                    continue
+                seen_headers.add(key)
+            text = _normalize_inline(raw)
+            if text == raw.rstrip():
+                # 原样保留的行：按字符精确映射 (不含被去掉的行尾空白)
+                end = start + len(text)
+
+        if not text:
+            continue
+        sep = ("\n\n" if blank_pending else "\n") if pieces else ""
+        blank_pending = False
+        pieces.append(sep + text)
+        out_start = out_len + len(sep)
+        out_len = out_start + len(text)
+        segments.append((out_start, out_len, start, end))
+
+    text = "".join(pieces) + ("\n" if pieces else "")
+    return CompactMarkdown(
+        text=text,
+        segments=segments,
+        tokens_before=estimate_tokens(source),
+        tokens_after=estimate_tokens(text),
+    )
@@ -0,0 +1,68 @@
+"""多模型结果的逐试件比对。
+
+难以提取的论文过去需要人工换一个模型重跑再对比。Extractor 的 consensus 模式让多个模型并行提取
+同一论文，每完成一个就与已完成的结果逐试件比对：两份结果在容差内一致即返回并取消其余运行，
+不一致之处记入运行统计供人工复核。
+"""
+
+from __future__ import annotations
+
+import math
+
+from cfst_extractor.agent.models import GROUPS, NUMERIC_FIELDS, PaperExtraction, SpecimenBase
+from cfst_extractor.agent.tables import normalize_label
+
+
+def _index(extraction: PaperExtraction) -> dict[tuple[str, str], SpecimenBase]:
+    # 不同截面分组中的同名试件 (如 Group_A 与 Group_B 各有一个 S1) 是不同的试件
+    return {
+        (group, normalize_label(s.specimen_label)): s
+        for group in GROUPS
+        for s in getattr(extraction, group)
+    }
+
+
+def _pair(ia: dict, ib: dict) -> tuple[list[tuple], list[tuple], list[tuple]]:
+    """按 (分组, 编号) 配对；剩余试件再按编号跨分组配对 (分组判定不一致)。返回 (配对, 仅 a, 仅 b)。"""
+    pairs = [(key, key) for key in ia if key in ib]
+    rest_b: dict[str, list[tuple]] = {}
+    for key in ib:
+        if key not in ia:
+            rest_b.setdefault(key[1], []).append(key)
+    only_a = []
+    for key in ia:
+        if key in ib:
+            continue
+        if rest_b.get(key[1]):
+            pairs.append((key, rest_b[key[1]].pop(0)))
+        else:
+            only_a.append(key)
+    only_b = [key for keys in rest_b.values() for key in keys]
+    return pairs, only_a, only_b
+
+
+def compare_extractions(
+    a: PaperExtraction, b: PaperExtraction, rel_tol: float = 0.02, abs_tol: float = 0.5
+) -> list[dict]:
+    """逐试件比较两份提取结果，返回不一致项 (空列表表示在容差内一致)。
+
+    试件按 (分组, 规范化编号) 配对，只在一侧出现的编号再跨分组配对并报告分组不一致；
+    数值字段满足 math.isclose(rel_tol, abs_tol) 即视为一致。
+    """
+    diffs: list[dict] = []
+    if a.is_valid != b.is_valid:
+        diffs.append({"field": "is_valid", "a": a.is_valid, "b": b.is_valid})
+
+    ia, ib = _index(a), _index(b)
+    pairs, only_a, only_b = _pair(ia, ib)
+    for ka, kb in sorted(pairs, key=lambda p: (p[0][1], p[0][0])):
+        sa, sb = ia[ka], ib[kb]
+        if ka[0] != kb[0]:
+            diffs.append({"specimen": sa.specimen_label, "field": "group", "a": ka[0], "b": kb[0]})
+        for f in NUMERIC_FIELDS:
+            va, vb = getattr(sa, f), getattr(sb, f)
+            if not math.isclose(va, vb, rel_tol=rel_tol, abs_tol=abs_tol):
+                diffs.append({"specimen": sa.specimen_label, "field": f, "a": va, "b": vb})
+    diffs += [{"specimen": ia[key].specimen_label, "issue": "only_in_a"} for key in only_a]
+    diffs += [{"specimen": ib[key].specimen_label, "issue": "only_in_b"} for key in only_b]
+    return diffs
@@ -0,0 +1,16 @@
+"""Dependencies injected into agent tools for a single extraction run."""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from cfst_extractor.agent.governor import ToolGovernor
+
+
+@dataclass
+class PaperDeps:
+    """单次提取运行注入给工具的依赖：论文目录、工具调用管理器 + 本次运行过程中由工具记录的统计。"""
+
+    paper_dir: Path
+    stats: dict[str, Any] = field(default_factory=dict)
+    governor: ToolGovernor = field(default_factory=ToolGovernor)
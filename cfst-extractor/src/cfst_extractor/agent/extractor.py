@@ -1,80 +1,451 @@
 """Extractor wrapper to run the CFST Agent."""
 
+import asyncio
+from collections.abc import Callable
 from datetime import datetime
 from pathlib import Path
 
-from cfst_extractor.agent.agent import cfst_agent
-from cfst_extractor.agent.models import PaperExtraction
+import httpx
+from pydantic import ValidationError
+from pydantic_ai.exceptions import AgentRunError, UnexpectedModelBehavior, UsageLimitExceeded
+from pydantic_ai.messages import ModelResponse
+from pydantic_ai.usage import UsageLimits
+
+from cfst_extractor.agent.agent import (
+    WORKFLOW_PROMPT,
+    _budgets,
+    _consensus,
+    _hedge,
+    _tool_budgets,
+    cfst_agent,
+    repair_agent,
+)
+from cfst_extractor.agent.deps import PaperDeps
+from cfst_extractor.agent.governor import ToolBudgetExceeded, ToolGovernor, merge_profiles
+from cfst_extractor.agent.hedging import HedgedModel, current_run_stats
+from cfst_extractor.agent.models import PaperExtraction, RefInfo, SpecimenBase
+from cfst_extractor.agent.tools import evidence_offsets, image_media_type
+
+# 单篇论文运行中可预期的失败 (模型/API 错误、网络错误、文件读取与校验错误)：记为失败结果，其余异常照常抛出
+_RUN_ERRORS = (AgentRunError, httpx.HTTPError, OSError, ValueError)
+
+
+def build_prompt(paper_id: str) -> list[str]:
+    """构造单篇论文的提取任务提示词：静态工作流在前，论文目录在后。"""
+    return [WORKFLOW_PROMPT, f"当前文献目录：{paper_id}\n"]
+
+
+def failed_extraction(reason: str, model: str | None = None) -> PaperExtraction:
+    """构造一个表示提取失败的空结果。"""
+    return PaperExtraction(
+        is_valid=False,
+        reason=reason,
+        ref_info=RefInfo(title="", authors=[], journal="", year=0),
+        Group_A=[],
+        Group_B=[],
+        Group_C=[],
+        extraction_model=model or "default",
+        extraction_time=datetime.now().isoformat(),
+    )
+
+
+def usage_stats(input_tokens: int, cached_tokens: int, output_tokens: int, requests: int) -> dict:
+    """统一的 token 用量记录 (同步 Agent 与批处理 API 模式共用)。"""
+    return {
+        "requests": requests,
+        "input_tokens": input_tokens,
+        "cached_input_tokens": cached_tokens,
+        "uncached_input_tokens": input_tokens - cached_tokens,
+        "output_tokens": output_tokens,
+    }
 
 
 class Extractor:
     """封装 Agent 调用以提供简洁的接口。"""
     
-    def __init__(self, model: str | None = None):
+    def __init__(
+        self,
+        model: str | None = None,
+        paper_timeout: float | None = None,
+        max_turns: int | None = None,
+        consensus_models: list[str] | None = None,
+        agent=None,
+        stream: bool = False,
+    ):
         """
         初始化提取器。
         
         Args:
             model: 如果提供，将覆盖默认的 'google-gla:gemini-2.5-pro' 模型。
                   支持通过 model_settings 设置。
+            paper_timeout: 单篇论文的总时间预算 (秒)，默认取 settings 中 agent.budgets.paper_timeout。
+            max_turns: 单篇论文最多的模型请求次数，默认取 agent.budgets.max_turns。
+            consensus_models: 与主模型并行提取同一论文的其他模型，默认取 agent.consensus.models；
+                  为空时只运行主模型。
+            agent: 使用的提取 Agent，默认为 cfst_agent (benchmark 用 build_agent 换用其他提示词版本)。
+            stream: 流式接收结构化输出，试件到达即逐个校验；整体校验失败时只补请求缺失/无效的尾部。
         """
         self.model = model
+        self.agent = agent or cfst_agent
+        self.stream = stream
+        self.paper_timeout = paper_timeout or _budgets.get("paper_timeout")
+        self.max_turns = max_turns or _budgets.get("max_turns")
+        self.consensus_models = list(consensus_models or _consensus.get("models") or [])
+        self.rel_tol = float(_consensus.get("rel_tol", 0.02))
+        self.abs_tol = float(_consensus.get("abs_tol", 0.5))
+        # 每篇论文的运行统计 (token 用量等)，按论文目录名索引，供 CLI 汇总
+        self.run_stats: dict[str, dict] = {}
+
+        if stream and _hedge.get("enabled"):
+            import typer
+
+            typer.secho("› Hedging does not apply to streamed requests; only request_timeout is enforced", dim=True)
+
+        self._run_model = self._wrap(self.model)
+        self._consensus_run_models = [self._wrap(m) for m in self.consensus_models]
+
+    def _wrap(self, model: str | None):
+        """配置了单次请求超时或对冲时，用 HedgedModel 包装实际模型 (各论文共享延迟统计)。"""
+        if not (_budgets.get("request_timeout") or _hedge.get("enabled")):
+            return model
+        return HedgedModel(
+            model or self.agent.model,
+            hedge_model=_hedge.get("model"),
+            request_timeout=_budgets.get("request_timeout"),
+            hedge=bool(_hedge.get("enabled")),
+            percentile=float(_hedge.get("percentile", 0.95)),
+            min_samples=int(_hedge.get("min_samples", 10)),
+        )
+
+    @staticmethod
+    def _run_kwargs(deps: PaperDeps, max_turns: int | None, run_model) -> dict:
+        run_kwargs = {"deps": deps}
+        if run_model:
+            run_kwargs["model"] = run_model
+        if max_turns:
+            run_kwargs["usage_limits"] = UsageLimits(request_limit=max_turns)
+        return run_kwargs
+
+    def _record_usage(self, deps: PaperDeps, usage) -> None:
+        """把一次运行的 token 用量累加到 deps.stats (流式提取的补尾会话与主会话合计)。"""
+        import typer
+
+        stats = usage_stats(
+            usage.input_tokens, usage.cache_read_tokens, usage.output_tokens, usage.requests
+        )
+        for key, value in stats.items():
+            deps.stats[key] = deps.stats.get(key, 0) + value
+        typer.secho(
+            f"› Tokens: input {stats['input_tokens']} "
+            f"(cached {stats['cached_input_tokens']}, uncached {stats['uncached_input_tokens']}), "
+            f"output {stats['output_tokens']}",
+            dim=True,
+        )
+        sizes = deps.stats.get("request_bytes")
+        if sizes:
+            typer.secho(
+                f"› Request bytes per turn: first {sizes[0]}, max {max(sizes)}, last {sizes[-1]} "
+                f"({deps.stats.get('pruned_parts', 0)} history parts pruned)",
+                dim=True,
+            )
+
+    async def _run_agent(
+        self, agent, prompt, deps: PaperDeps, max_turns: int | None, run_model=None, message_history=None
+    ):
+        """在论文总时间预算内运行 agent，把 token 用量记入 deps.stats，返回结构化输出。"""
+        current_run_stats.set(deps.stats)
+        run = agent.run(
+            prompt, message_history=message_history, **self._run_kwargs(deps, max_turns, run_model)
+        )
+        if self.paper_timeout:
+            result = await asyncio.wait_for(run, self.paper_timeout)
+        else:
+            result = await run
 
-    async def extract(self, paper_dir: Path) -> PaperExtraction:
+        self._record_usage(deps, result.usage())
+        return result.output
+
+    async def _run_stream(
+        self,
+        prompt,
+        deps: PaperDeps,
+        run_model=None,
+        on_specimen: Callable[[str, SpecimenBase], None] | None = None,
+    ) -> PaperExtraction:
+        """
+        流式运行提取：输出工具参数每到达一个完整试件即按 SpecimenBase 校验并回调 on_specimen。
+        整体校验失败或输出被截断时，带着已有对话历史发起一次简短的补尾会话，只请求缺失或无效的试件。
+        """
+        import typer
+
+        from cfst_extractor.agent.repair import apply_repair
+        from cfst_extractor.agent.streaming import SpecimenStream, output_args
+
+        current_run_stats.set(deps.stats)
+        tracker = SpecimenStream(on_specimen)
+
+        async def _stream():
+            async with self.agent.run_stream(prompt, **self._run_kwargs(deps, self.max_turns, run_model)) as result:
+                async for response, last in result.stream_responses():
+                    args = output_args(response)
+                    if args is not None:
+                        tracker.feed(args, final=last)
+                try:
+                    output = await result.get_output()
+                except (ValidationError, UnexpectedModelBehavior) as e:
+                    typer.secho(f"› Streamed output failed validation: {e}", dim=True)
+                    output = None
+                return output, result.usage(), result.all_messages()
+
+        try:
+            if self.paper_timeout:
+                output, usage, messages = await asyncio.wait_for(_stream(), self.paper_timeout)
+            else:
+                output, usage, messages = await _stream()
+        finally:
+            deps.stats["stream"] = tracker.stats()
+        self._record_usage(deps, usage)
+        typer.secho(
+            f"› Streamed {tracker.count} valid specimens "
+            f"(first after {tracker.first_specimen_s}s, {len(tracker.invalid)} invalid)",
+            dim=True,
+        )
+        if output is not None:
+            return output
+
+        # 补尾：去掉未通过校验的最终响应，保留此前的工具调用与结果作为上下文
+        while messages and isinstance(messages[-1], ModelResponse):
+            messages = messages[:-1]
+        deps.stats["stream"]["tail_retry"] = True
+        tail = await self._run_agent(
+            repair_agent, tracker.tail_prompt(), deps, _budgets.get("repair_max_turns"), run_model,
+            message_history=messages,
+        )
+        partial = tracker.assemble()
+        deps.stats["stream"]["header_errors"] = tracker.header_errors
+        return apply_repair(partial, tail, [item["label"] for item in tracker.invalid if item["label"]])
+
+    async def extract(
+        self, paper_dir: Path, on_specimen: Callable[[str, SpecimenBase], None] | None = None
+    ) -> PaperExtraction:
         """
         从单篇论文（MinerU 解析目录）提取数据。
         Agent 会自主调用工具获取所需信息。
         
         Args:
             paper_dir: 包含解析结果 (MD和Images) 的目录路径。
-            
+            on_specimen: 流式模式下每个试件通过校验时的回调 (分组, 试件)，用于增量写出部分结果。
+
         Returns:
             符合 PaperExtraction schema 的结构化数据。
         """
-        paper_id = paper_dir.name
-        prompt = (
-            f"目标：请从当前分配给你的文献解析目录中提取出结构化的 CFST 试验数据，"
-            f"严格遵循我们在 System Prompt 中定义的 JSON 格式进行输出。\n"
-            f"操作指南与校验机制（请严格按以下核心工作流按顺序执行）：\n"
-            f"1. 【基础阅读】首要步骤：调用 `read_markdown` 读取文献的 Markdown 正文文本，以获取全局信息。\n"
-            f"2. 【加载方式判定】关键校验：必须从提取到的图片列表中定位【加载装置示意图】，并强制调用 `inspect_image` 工具查阅该原图。通过原图事实直接评判加载方式是否为偏心加载，且是否为上下等端距离加载（或非等端距离加载）。这一步不可跳过。\n"
-            f"3. 【表格错位排查（强制防坑）】数据提取：基于 Markdown 文本中的表格，仔细对比每一行的物理意义，你必须意识到 MinerU 会把原本分为多行的试件标识（如 C1、C2）强行合并到一个单元格（例如 `C1 C2` 或者 `S5 R1`），这会导致右侧所有的数据列发生严重的行错位和单格多值！\n"
-            f"   - **若表格清晰且试件标识行列一一对应**：直接从文本提取数据，无需查阅表格原图。\n"
-            f"   - **⚠️ 若存在任何异常（尤其是试件名字/Shape列发生合并如 `C1 C2`、数据区出现空格隔开的多个数值如 `76.6 152.3`）**：这代表表格已被严重破坏！绝对禁止运用个人逻辑对数据进行切割分配！你**必须立刻**在图片列表中找到该表格的原图，并调用 `inspect_image` 查看。\n"
-            f"4. 【运算工具使用】任何单位换算、几何截面计算需强制使用 `execute_python_calc` 工具。\n"
-            f"5. 【综合得出结果】最后，结合上述 Markdown 正文、加载装置查阅结果以及任何可能修正过的表格数据，整理得出结论并输出规范的 JSON 数据。\n"
-            f"当前文献目录：{paper_id}\n"
-        )
-        
+        if self.consensus_models:
+            return await self._extract_consensus(paper_dir)
+
+        deps = PaperDeps(paper_dir=paper_dir, governor=ToolGovernor(budgets=dict(_tool_budgets)))
+        self.run_stats[paper_dir.name] = deps.stats
+        return await self._extract_once(deps, self._run_model, self.model, on_specimen)
+
+    async def _extract_once(
+        self, deps: PaperDeps, run_model, model: str | None, on_specimen=None
+    ) -> PaperExtraction:
+        """用指定模型完整运行一次提取，失败时返回空结果并在 deps.stats 中记录状态。"""
+        prompt = build_prompt(deps.paper_dir.name)
         try:
-            # 运行 Agent，将 paper_dir 作为依赖注入给工具
+            # 运行 Agent，将 paper_dir (连同本次运行的统计) 作为依赖注入给工具
             # 因为我们在 tools.py 的具体工具实现中增加了 typer.secho，所以此处不需要特殊 stream 处理也会有原生日志输出
             import typer
             
-            if self.model:
-                typer.secho("› Initializing inference core...", dim=True)
-                result = await cfst_agent.run(prompt, deps=paper_dir, model=self.model)
+            typer.secho("› Initializing inference core...", dim=True)
+            if self.stream:
+                extraction = await self._run_stream(prompt, deps, run_model, on_specimen)
             else:
-                typer.secho("› Initializing inference core...", dim=True)
-                result = await cfst_agent.run(prompt, deps=paper_dir)
-                
-            extraction = result.output
+                extraction = await self._run_agent(self.agent, prompt, deps, self.max_turns, run_model)
             
             # 后期补全部分系统元数据
-            extraction.extraction_model = self.model or "default"
+            extraction.extraction_model = model or "default"
             extraction.extraction_time = datetime.now().isoformat()
+            if "markdown_tokens" in deps.stats:
+                # 模型读到的是压缩后的 Markdown：记录各试件 source_evidence 在原文中的位置
+                deps.stats["evidence_offsets"] = evidence_offsets(deps.paper_dir, extraction)
             
             return extraction
             
-        except Exception as e:
-            from cfst_extractor.agent.models import RefInfo
-            return PaperExtraction(
-                is_valid=False,
-                reason=f"Extraction Failed: {str(e)}",
-                ref_info=RefInfo(title="", authors=[], journal="", year=0),
-                Group_A=[],
-                Group_B=[],
-                Group_C=[],
-                extraction_model=self.model or "default",
-                extraction_time=datetime.now().isoformat(),
+        except TimeoutError as e:
+            # 论文总预算 (wait_for) 或单次请求预算 (RequestTimeout) 用尽
+            deps.stats["status"] = "timeout"
+            reason = str(e) or f"paper budget of {self.paper_timeout}s exceeded"
+            return failed_extraction(f"Extraction Timed Out: {reason}", model)
+
+        except UsageLimitExceeded as e:
+            deps.stats["status"] = "turn_budget_exceeded"
+            return failed_extraction(f"Extraction Failed: {e!s}", model)
+
+        except ToolBudgetExceeded as e:
+            deps.stats["status"] = "tool_budget_exceeded"
+            return failed_extraction(f"Extraction Stopped: {e!s}", model)
+
+        except _RUN_ERRORS as e:
+            deps.stats["status"] = "error"
+            return failed_extraction(f"Extraction Failed: {e!s}", model)
+
+        finally:
+            deps.stats["tools"] = deps.governor.profile()
+
+    async def _extract_consensus(self, paper_dir: Path) -> PaperExtraction:
+        """
+        主模型与 consensus_models 并行提取同一论文 (共享工具结果缓存：Markdown、图片只读取一次)。
+        每完成一份结果就与已完成的结果逐试件比对，任意两份在容差内一致即取消其余运行并返回。
+        全部完成仍无一致时返回按模型顺序最靠前的成功结果，不一致项记入 run_stats 供复核。
+        """
+        import typer
+
+        from cfst_extractor.agent.consensus import compare_extractions
+
+        models = [self.model, *self.consensus_models]
+        run_models = [self._run_model, *self._consensus_run_models]
+        labels = [m or "default" for m in models]
+        labels = [f"{label}#{i}" if labels.count(label) > 1 else label for i, label in enumerate(labels)]
+
+        shared: dict = {}
+        runs = [
+            PaperDeps(paper_dir=paper_dir, governor=ToolGovernor(budgets=dict(_tool_budgets), shared=shared))
+            for _ in models
+        ]
+        consensus: dict = {"models": labels, "agreed": None, "comparisons": [], "cancelled": []}
+        stats: dict = {"consensus": consensus, "runs": dict(zip(labels, (d.stats for d in runs)))}
+        self.run_stats[paper_dir.name] = stats
+
+        tasks = {
+            asyncio.create_task(self._extract_once(deps, run_model, model)): i
+            for i, (deps, run_model, model) in enumerate(zip(runs, run_models, models))
+        }
+        results: dict[int, PaperExtraction] = {}
+        succeeded: list[int] = []
+        pending = set(tasks)
+        try:
+            while pending and consensus["agreed"] is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.get):
+                    i = tasks[task]
+                    results[i] = task.result()
+                    if "status" in runs[i].stats:
+                        # 失败的运行不参与比对
+                        continue
+                    for j in succeeded:
+                        diffs = compare_extractions(results[j], results[i], self.rel_tol, self.abs_tol)
+                        consensus["comparisons"].append({
+                            "models": [labels[j], labels[i]],
+                            "n_diffs": len(diffs),
+                            "diffs": diffs[:50],
+                        })
+                        if not diffs and consensus["agreed"] is None:
+                            consensus["agreed"] = [labels[j], labels[i]]
+                    succeeded.append(i)
+        finally:
+            for task in pending:
+                task.cancel()
+                consensus["cancelled"].append(labels[tasks[task]])
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        for key in ("requests", "input_tokens", "cached_input_tokens", "uncached_input_tokens", "output_tokens"):
+            stats[key] = sum(d.stats.get(key, 0) for d in runs)
+        stats["tools"] = merge_profiles([d.stats["tools"] for d in runs if d.stats.get("tools")])
+
+        if consensus["agreed"] is not None:
+            chosen = labels.index(consensus["agreed"][0])
+            result = results[chosen]
+            result.extraction_model = "consensus:" + ",".join(consensus["agreed"])
+            typer.secho(f"› Consensus reached: {' = '.join(consensus['agreed'])}", dim=True)
+            return result
+
+        if succeeded:
+            chosen = min(succeeded)
+            typer.secho(f"› No consensus among {labels}; keeping {labels[chosen]}", dim=True)
+        else:
+            chosen = 0
+            stats["status"] = runs[0].stats.get("status", "error")
+        return results[chosen]
+
+    async def repair(
+        self,
+        paper_dir: Path,
+        extraction: PaperExtraction,
+        flagged: dict[str, list[str]],
+        table_numbers: list[int] | None = None,
+    ) -> PaperExtraction:
+        """
+        只对被标记的试件 / 表格运行一次简短的修复会话，并把修正结果写回提取结果。
+
+        Args:
+            paper_dir: 论文的 MinerU 解析目录。
+            extraction: 已有的提取结果。
+            flagged: 试件编号 → 标记原因 (人工指定时原因可为空列表)。
+            table_numbers: 需要整表重新核对的表格序号 (按在 Markdown 中出现的顺序，从 1 开始)。
+
+        Returns:
+            修补后的 PaperExtraction 副本；修复失败时原样返回 extraction，失败原因记入 run_stats。
+        """
+        import typer
+        from pydantic_ai import BinaryContent
+
+        from cfst_extractor.agent.repair import (
+            REPAIR_PROMPT,
+            apply_repair,
+            build_repair_prompt,
+            locate_tables,
+        )
+        from cfst_extractor.agent.tools import inspect_image
+
+        deps = PaperDeps(paper_dir=paper_dir, governor=ToolGovernor(budgets=dict(_tool_budgets)))
+        self.run_stats[paper_dir.name] = deps.stats
+
+        tables = locate_tables(paper_dir, list(flagged), table_numbers)
+        flagged = dict(flagged)
+        for table in tables:
+            if table.number in (table_numbers or []):
+                for label in table.labels():
+                    flagged.setdefault(label, [f"表格 {table.number} 被整表标记"])
+        deps.stats["repair"] = {"specimens": sorted(flagged), "tables": [t.number for t in tables]}
+        typer.secho(
+            f"› Repairing {len(flagged)} specimens using tables {[t.number for t in tables]}", dim=True
+        )
+
+        prompt: list = [REPAIR_PROMPT, build_repair_prompt(paper_dir.name, extraction, flagged, tables)]
+        try:
+            for table in tables:
+                if table.image_path:
+                    # 经由 governor 读取：模型再次请求同一张图时直接复用
+                    image = deps.governor.call(
+                        "inspect_image",
+                        {"image_path": table.image_path},
+                        lambda path=table.image_path: inspect_image(paper_dir, path, "修复会话预先附上的表格原图"),
+                    )
+                    prompt.append(BinaryContent(data=image, media_type=image_media_type(image, table.image_path)))
+
+            repair = await self._run_agent(
+                repair_agent, prompt, deps, _budgets.get("repair_max_turns"), self._run_model
             )
+        except TimeoutError as e:
+            deps.stats["status"] = "timeout"
+            deps.stats["error"] = str(e) or f"paper budget of {self.paper_timeout}s exceeded"
+            return extraction
+        except UsageLimitExceeded as e:
+            deps.stats["status"] = "turn_budget_exceeded"
+            deps.stats["error"] = str(e)
+            return extraction
+        except ToolBudgetExceeded as e:
+            deps.stats["status"] = "tool_budget_exceeded"
+            deps.stats["error"] = str(e)
+            return extraction
+        except _RUN_ERRORS as e:
+            deps.stats["status"] = "repair_failed"
+            deps.stats["error"] = str(e)
+            return extraction
+        finally:
+            deps.stats["tools"] = deps.governor.profile()
+
+        patched = apply_repair(extraction, repair, list(flagged))
+        patched.extraction_time = datetime.now().isoformat()
+        deps.stats["repair"]["notes"] = repair.notes
+        return patched
@@ -0,0 +1,138 @@
+"""工具调用预算、重复调用记忆化与逐工具性能统计。
+
+每次工具调用都意味着一次完整的模型往返。模型偶尔会反复调用 list_directory_files，
+或对同一张图片多次 inspect_image；ToolGovernor 在单篇论文范围内：
+- 对参数完全相同的重复调用直接返回先前结果 (不再执行工具)；
+- 按工具及总次数执行预算，超出时抛出 ToolBudgetExceeded 提前终止该论文，而不是消耗重试；
+- 记录每个工具的耗时与返回大小直方图。
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import typer
+
+from cfst_extractor.tracing import span
+
+# 耗时直方图的桶上界 (毫秒)
+_LATENCY_BUCKETS_MS: list[tuple[float, str]] = [
+    (10, "<10ms"),
+    (100, "<100ms"),
+    (1000, "<1s"),
+    (10000, "<10s"),
+    (float("inf"), ">=10s"),
+]
+
+
+class ToolBudgetExceeded(RuntimeError):
+    """单篇论文的工具调用次数超出预算。"""
+
+
+def _result_size(result: Any) -> int:
+    if isinstance(result, (bytes, str)):
+        return len(result)
+    return len(json.dumps(result, ensure_ascii=False, default=str))
+
+
+def _bucket(ms: float) -> str:
+    return next(label for bound, label in _LATENCY_BUCKETS_MS if ms < bound)
+
+
+@dataclass
+class ToolGovernor:
+    """单篇论文范围内的工具调用管理器。
+
+    budgets: 工具名 (不含 tool_ 前缀) → 最多真实执行次数；键 "total" 限制全部工具调用次数
+             (包括被记忆化的重复调用)。值为 None 表示不限制。
+    shared:  可选的跨运行结果缓存 (如多模型并行提取同一论文时共享 Markdown 与图片)；
+             命中时计入本运行的调用次数与预算，但不再执行工具。
+    """
+
+    budgets: dict[str, int | None] = field(default_factory=dict)
+    shared: dict | None = None
+    calls: Counter = field(default_factory=Counter)
+    duplicates: Counter = field(default_factory=Counter)
+    shared_hits: Counter = field(default_factory=Counter)
+    latencies_ms: dict[str, list[float]] = field(default_factory=dict)
+    sizes: dict[str, list[int]] = field(default_factory=dict)
+    _memo: dict[tuple[str, str], Any] = field(default_factory=dict)
+
+    def _check(self, name: str, limit_key: str, used: int) -> None:
+        limit = self.budgets.get(limit_key)
+        if limit is not None and used >= limit:
+            raise ToolBudgetExceeded(
+                f"tool budget exceeded: {limit_key}={limit} (while calling {name})"
+            )
+
+    def call(self, name: str, args: dict, fn: Callable[[], Any]) -> Any:
+        """执行 (或复用) 一次工具调用。"""
+        total = sum(self.calls.values()) + sum(self.duplicates.values())
+        self._check(name, "total", total)
+
+        key = (name, json.dumps(args, sort_keys=True, ensure_ascii=False, default=str))
+        if key in self._memo:
+            self.duplicates[name] += 1
+            typer.secho(f"› Duplicate {name} call, returning memoized result", dim=True)
+            return self._memo[key]
+
+        self._check(name, name, self.calls[name])
+        if self.shared is not None and key in self.shared:
+            self.calls[name] += 1
+            self.shared_hits[name] += 1
+            self._memo[key] = self.shared[key]
+            return self._memo[key]
+
+        started = time.perf_counter()
+        with span(name, "tool"):
+            result = fn()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.calls[name] += 1
+        self.latencies_ms.setdefault(name, []).append(elapsed_ms)
+        self.sizes.setdefault(name, []).append(_result_size(result))
+        self._memo[key] = result
+        if self.shared is not None:
+            self.shared[key] = result
+        return result
+
+    def profile(self) -> dict[str, dict]:
+        """逐工具汇总：调用/重复次数、耗时分位数、返回字节数与耗时直方图。"""
+        out: dict[str, dict] = {}
+        for name in sorted(set(self.calls) | set(self.duplicates)):
+            lat = sorted(self.latencies_ms.get(name, []))
+            hist = Counter(_bucket(ms) for ms in lat)
+            out[name] = {
+                "calls": self.calls[name],
+                "duplicates": self.duplicates[name],
+                "shared_hits": self.shared_hits[name],
+                "p50_ms": round(lat[len(lat) // 2], 1) if lat else None,
+                "p95_ms": round(lat[min(int(0.95 * len(lat)), len(lat) - 1)], 1) if lat else None,
+                "max_ms": round(lat[-1], 1) if lat else None,
+                "bytes": sum(self.sizes.get(name, [])),
+                "histogram": {label: hist[label] for _, label in _LATENCY_BUCKETS_MS if hist[label]},
+            }
+        return out
+
+
+def merge_profiles(profiles: list[dict[str, dict]]) -> dict[str, dict]:
+    """合并多篇论文的工具统计 (用于 batch 汇总；分位数无法合并，只合并计数与直方图)。"""
+    merged: dict[str, dict] = {}
+    for profile in profiles:
+        for name, p in profile.items():
+            m = merged.setdefault(
+                name, {"calls": 0, "duplicates": 0, "shared_hits": 0, "bytes": 0, "histogram": Counter()}
+            )
+            m["calls"] += p["calls"]
+            m["duplicates"] += p["duplicates"]
+            m["shared_hits"] += p.get("shared_hits", 0)
+            m["bytes"] += p["bytes"]
+            m["histogram"].update(p["histogram"])
+    for m in merged.values():
+        m["histogram"] = {label: m["histogram"][label] for _, label in _LATENCY_BUCKETS_MS if m["histogram"][label]}
+    return merged
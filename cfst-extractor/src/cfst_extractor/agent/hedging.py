@@ -0,0 +1,118 @@
+"""单次模型请求的超时与对冲 (hedged request)。
+
+一个卡住的模型回合可能把 batch 的 worker 占住很多分钟。HedgedModel 包装实际模型：
+- 每次请求有独立的超时上限 (request_timeout)；
+- 当一次请求的耗时超过近期请求延迟的某个分位数 (如 p95) 时，再向备用模型 (默认同一模型)
+  发送一份相同的请求，取先返回的结果并取消另一份。
+流式请求 (Extractor 的 stream 模式) 的响应体由调用方逐块消费，无法同时竞速两份：
+只施加 request_timeout (覆盖建立连接到流结束的全过程)，不做对冲。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from pydantic_ai.models import Model, infer_model
+from pydantic_ai.models.wrapper import WrapperModel
+
+# 当前论文的运行统计 (由 Extractor 在每次提取开始时设置)，用于按论文记录对冲次数
+current_run_stats: ContextVar[dict | None] = ContextVar("current_run_stats", default=None)
+
+
+class RequestTimeout(TimeoutError):
+    """单次模型请求超过 request_timeout。"""
+
+
+class LatencyTracker:
+    """记录最近若干次成功请求的耗时，用于计算对冲触发阈值。"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> float | None:
+        if len(self._samples) < max(min_samples, 1):
+            return None
+        ordered = sorted(self._samples)
+        idx = min(int(q * len(ordered)), len(ordered) - 1)
+        return ordered[idx]
+
+
+class HedgedModel(WrapperModel):
+    """为被包装模型的每次请求加上超时，并在慢请求上发送对冲请求。"""
+
+    def __init__(
+        self,
+        wrapped: Model | str,
+        hedge_model: Model | str | None = None,
+        request_timeout: float | None = None,
+        hedge: bool = False,
+        percentile: float = 0.95,
+        min_samples: int = 10,
+        tracker: LatencyTracker | None = None,
+    ):
+        super().__init__(wrapped)
+        self.hedge_model = infer_model(hedge_model) if hedge_model else self.wrapped
+        self.request_timeout = request_timeout
+        self.hedge = hedge
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.tracker = tracker or LatencyTracker()
+
+    def _remaining(self, started: float) -> float | None:
+        if self.request_timeout is None:
+            return None
+        return max(self.request_timeout - (time.perf_counter() - started), 0.0)
+
+    async def request(self, *args, **kwargs):
+        started = time.perf_counter()
+        primary = asyncio.create_task(self.wrapped.request(*args, **kwargs))
+        tasks = {primary}
+        try:
+            threshold = self.tracker.percentile(self.percentile, self.min_samples) if self.hedge else None
+            if threshold is not None:
+                limit = self._remaining(started)
+                done, _ = await asyncio.wait(tasks, timeout=threshold if limit is None else min(threshold, limit))
+                if not done and (limit is None or limit > threshold):
+                    tasks.add(asyncio.create_task(self.hedge_model.request(*args, **kwargs)))
+                    stats = current_run_stats.get()
+                    if stats is not None:
+                        stats["hedged_requests"] = stats.get("hedged_requests", 0) + 1
+
+            while True:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=self._remaining(started), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise RequestTimeout(f"model request exceeded {self.request_timeout}s")
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        self.tracker.record(time.perf_counter() - started)
+                        return task.result()
+                    if not tasks:
+                        raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @asynccontextmanager
+    async def request_stream(self, *args, **kwargs) -> AsyncIterator:
+        if self.request_timeout is None:
+            async with self.wrapped.request_stream(*args, **kwargs) as stream:
+                yield stream
+            return
+        try:
+            # 超时覆盖调用方消费流的整个过程 (同一任务内执行 with 块)
+            async with asyncio.timeout(self.request_timeout):
+                async with self.wrapped.request_stream(*args, **kwargs) as stream:
+                    yield stream
+        except TimeoutError as e:
+            raise RequestTimeout(f"streamed model request exceeded {self.request_timeout}s") from e
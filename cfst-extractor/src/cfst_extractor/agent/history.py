@@ -0,0 +1,153 @@
+"""对话历史裁剪：模型已经处理过的图片与大段工具输出不再随后续每一轮请求重复发送。
+
+Agent 的每一轮请求都携带完整的对话历史：inspect_image 返回的图片、read_markdown 返回的全文在模型
+读过之后仍会被逐轮重发、重复计费，请求体随轮数线性增长。prune_history 作为 pydantic-ai 的 history
+processor 在每轮请求前运行，按滑动窗口裁剪：最近 keep_turns 轮的工具返回原样保留 (模型可能正在据此
+提取)，更早的工具返回一律替换，请求体大小因此有上界。首条用户消息 (任务与修复会话附上的表格原图)
+不属于工具返回，不裁剪。替换规则：
+- 图片 → 一行引用 (路径与大小)，需要时可重新调用 inspect_image；
+- read_markdown 全文 → 摘要：只保留表格行、表题以及含数值与单位 (MPa、mm、kN …) 的句子；
+- 其他超过 max_chars 的工具输出 → 截断并注明原长度。
+join_specimen_tables 与 execute_python_calc 的结果就是提取所依据的数据，原样保留。
+替换是确定性的：一条消息移出窗口后在之后各轮中逐字节一致；每轮只有新移出窗口的那条消息发生变化。
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import replace
+from functools import lru_cache
+
+from pydantic_ai.messages import (
+    BinaryContent,
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from cfst_extractor.agent.compaction import html_table_to_grid, render_grid, split_units
+
+PRUNED_MARK = "[已裁剪]"
+
+# 结果本身就是提取依据 (合并后的试件行、计算结果)，不裁剪
+_KEEP_TOOLS = {"tool_join_specimen_tables", "tool_execute_python_calc"}
+_CAPTION_RE = re.compile(r"^\s*(?:#+\s*)?(?:table|tab\.|表)\s*\d", re.IGNORECASE)
+_DATA_RE = re.compile(r"\d\s*(?:MPa|GPa|kN|mm|N/mm)", re.IGNORECASE)
+_SENTENCE_RE = re.compile(r"(?<=[.;])\s+|(?<=[。；])")
+
+
+@lru_cache(maxsize=32)
+def markdown_digest(text: str) -> str:
+    """论文全文的摘要：表格 (| 网格)、表题与含数值单位的句子，按原文顺序。"""
+    kept: list[str] = []
+    for start, end, kind in split_units(text):
+        raw = text[start:end]
+        if kind == "table":
+            kept.append(render_grid(html_table_to_grid(raw)))
+        elif _CAPTION_RE.match(raw) or raw.count("|") >= 2:
+            kept.append(raw.strip())
+        else:
+            kept.extend(s.strip() for s in _SENTENCE_RE.split(raw) if _DATA_RE.search(s))
+    body = "\n".join(k for k in kept if k)
+    return (
+        f"{PRUNED_MARK} read_markdown 原文 {len(text)} 字符，以下仅保留表格、表题与含数值单位的句子；"
+        f"需要全文时请再次调用 read_markdown。\n{body}"
+    )
+
+
+def _size(content) -> int:
+    if isinstance(content, bytes):
+        return len(content)
+    if isinstance(content, BinaryContent):
+        return len(content.data)
+    if isinstance(content, str):
+        return len(content)
+    return len(json.dumps(content, ensure_ascii=False, default=str))
+
+
+def _image_ref(name: str, size: int) -> str:
+    return f"{PRUNED_MARK} 图片 {name} ({size // 1024}KB) 已查看，已从上下文移除；需要时请重新调用 inspect_image。"
+
+
+def _is_pruned(content) -> bool:
+    return isinstance(content, str) and content.startswith(PRUNED_MARK)
+
+
+def _prune_part(part, calls: dict[str, ToolCallPart], max_chars: int):
+    """返回替换后的消息片段 (无需替换时返回原对象)。"""
+    if isinstance(part, ToolReturnPart):
+        content = part.content
+        if part.tool_name in _KEEP_TOOLS or _is_pruned(content):
+            return part
+        if isinstance(content, (bytes, BinaryContent)):
+            call = calls.get(part.tool_call_id)
+            name = call.args_as_dict().get("image_path", part.tool_name) if call else part.tool_name
+            return replace(part, content=_image_ref(name, _size(content)))
+        if _size(content) <= max_chars:
+            return part
+        if part.tool_name == "tool_read_markdown" and isinstance(content, str):
+            return replace(part, content=markdown_digest(content))
+        text = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False, default=str)
+        return replace(
+            part,
+            content=f"{PRUNED_MARK} 输出共 {len(text)} 字符，仅保留前 {max_chars} 字符；"
+            f"需要时请重新调用该工具。\n{text[:max_chars]}",
+        )
+
+    if isinstance(part, UserPromptPart) and not isinstance(part.content, str):
+        # 工具返回的 BinaryContent 会被 pydantic-ai 移入紧随其后的用户消息
+        items = [
+            _image_ref(item.identifier, len(item.data)) if isinstance(item, BinaryContent) and item.is_image else item
+            for item in part.content
+        ]
+        if any(a is not b for a, b in zip(items, part.content, strict=True)):
+            return replace(part, content=items)
+    return part
+
+
+def _pruned_count(part) -> int:
+    if isinstance(part, ToolReturnPart):
+        return int(_is_pruned(part.content))
+    if isinstance(part, UserPromptPart) and not isinstance(part.content, str):
+        return sum(1 for item in part.content if _is_pruned(item))
+    return 0
+
+
+def prune_history(
+    messages: list[ModelMessage], max_chars: int = 4000, keep_turns: int = 3, stats: dict | None = None
+) -> list[ModelMessage]:
+    """裁剪最近 keep_turns 轮之前的工具返回中的图片与长输出，返回新的消息列表 (不修改原列表)。
+
+    stats 不为 None 时记录当前历史中已被替换的片段数 (pruned_parts)。
+    """
+    turns = [
+        i
+        for i, m in enumerate(messages)
+        if isinstance(m, ModelRequest) and any(isinstance(p, ToolReturnPart) for p in m.parts)
+    ]
+    old = set(turns[: max(len(turns) - keep_turns, 0)])
+    calls = {
+        p.tool_call_id: p
+        for m in messages
+        if isinstance(m, ModelResponse)
+        for p in m.parts
+        if isinstance(p, ToolCallPart)
+    }
+
+    out: list[ModelMessage] = []
+    pruned = 0
+    for i, message in enumerate(messages):
+        if i in old:
+            parts = [_prune_part(p, calls, max_chars) for p in message.parts]
+            pruned += sum(_pruned_count(p) for p in parts)
+            if any(a is not b for a, b in zip(parts, message.parts, strict=True)):
+                message = replace(message, parts=parts)
+        out.append(message)
+
+    if stats is not None:
+        stats["pruned_parts"] = pruned
+    return out
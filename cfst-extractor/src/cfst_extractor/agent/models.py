@@ -2,6 +2,10 @@ from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
+# 截面分组 (即 PaperExtraction / SpecimenRepair 的分组字段名) 与试件的数值字段
+GROUPS = ("Group_A", "Group_B", "Group_C")
+NUMERIC_FIELDS = ("fc_value", "fy", "r_ratio", "b", "h", "t", "r0", "L", "e1", "e2", "n_exp")
+
 
 class SpecimenBase(BaseModel):
     """提取的单一试件标准格式"""
@@ -45,3 +49,11 @@ class PaperExtraction(BaseModel):
     # 元数据，不对外输出给验证集使用，但供内部调试
     extraction_model: str = Field(default="unknown", description="提取模型")
     extraction_time: str = Field(default="", description="提取时间")
+
+class SpecimenRepair(BaseModel):
+    """定向修复结果：只包含被标记试件 (或被标记表格中全部试件) 的修正记录"""
+    Group_A: List[SpecimenBase] = Field(default_factory=list, description="修正后的方形/矩形截面试件")
+    Group_B: List[SpecimenBase] = Field(default_factory=list, description="修正后的圆形截面试件")
+    Group_C: List[SpecimenBase] = Field(default_factory=list, description="修正后的圆端形/椭圆形截面试件")
+    removed_labels: List[str] = Field(default_factory=list, description="核对原文后确认不存在、应删除的试件编号")
+    notes: str = Field(default="", description="修正说明")
@@ -0,0 +1,214 @@
+"""定向修复：只对未通过校验的试件 (或整张表格) 重新提取，并把结果写回原 PaperExtraction。
+
+整篇重跑 Extractor.extract 需要完整的阅读、装置图判定与逐表提取。而一篇论文里往往只有少数
+试件出错，例如 Group_B 中 b != h，或 n_exp 与截面名义承载力相差一个数量级。修复会话只拿到
+相关表格的文本与原图，加上当前的错误记录，通常一两轮即可给出修正结果。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass
+from pathlib import Path
+
+from cfst_extractor.agent.models import GROUPS, PaperExtraction, SpecimenBase, SpecimenRepair
+from cfst_extractor.agent.tables import join_tables, normalize_label
+
+# n_exp / 名义承载力 (As·fy + Ac·fc) 的合理范围：偏压、长柱可远低于 1，套箍效应一般不超过 3
+N_EXP_RATIO_RANGE = (0.1, 3.0)
+FC_RANGE = (5.0, 200.0)
+FY_RANGE = (100.0, 1500.0)
+
+# 固定的修复说明：跨论文保持逐字节一致 (便于前缀缓存)，论文相关内容追加在它之后
+REPAIR_PROMPT = (
+    "目标：下列试件记录在自动校验中被标记为可疑，请只针对这些试件 (或被标记表格中的全部试件) 重新核对并给出修正后的记录。\n"
+    "操作指南：\n"
+    "1. 下方已附上相关表格的 Markdown 文本；若附有表格原图，以原图为准核对每一行 (MinerU 可能把多个试件合并到一个单元格造成错位)。\n"
+    "2. 字段含义、单位与分组规则与 System Prompt 完全一致；任何单位换算或几何计算须调用 `execute_python_calc`。\n"
+    "3. 只输出被标记的试件，按截面形状放入 Group_A / Group_B / Group_C；确认原文中不存在的试件编号写入 removed_labels。\n"
+    "4. 未被标记的试件不要输出，它们会保持原样。\n"
+)
+
+
+@dataclass
+class TableContext:
+    """修复会话所需的一张表格：序号 (按在 Markdown 中出现的顺序，从 1 开始)、HTML 文本与原图路径。"""
+
+    number: int
+    html: str
+    grid: list[list[str]]
+    image_path: str | None = None
+
+    def labels(self) -> list[str]:
+        """表格中的全部试件编号 (合并单元格如 `C1 C2` 拆分为多个编号)。"""
+        out: list[str] = []
+        for record in join_tables([self.grid]):
+            out.extend(record["label"].split() if record.get("merged_label") else [record["label"]])
+        return out
+
+
+def shape_areas(b, h, t) -> dict[str, tuple]:
+    """各分组截面的 (钢管面积 As, 核心混凝土面积 Ac)，单位 mm²。
+
+    只用算术运算，b/h/t 既可以是 float，也可以是 NumPy 数组 (SpecimenTable 的向量化计算)。
+    """
+    bi, hi = b - 2 * t, h - 2 * t
+    outer = {
+        "Group_A": (b * h, bi * hi),
+        "Group_B": (math.pi * b * b / 4, math.pi * bi * bi / 4),
+        # 圆端形：长轴 b、短轴 h，两端为直径 h 的半圆
+        "Group_C": ((b - h) * h + math.pi * h * h / 4, (bi - hi) * hi + math.pi * hi * hi / 4),
+    }
+    return {group: (gross - core, core) for group, (gross, core) in outer.items()}
+
+
+def _areas(group: str, b: float, h: float, t: float) -> tuple[float, float]:
+    """钢管与核心混凝土截面面积 (mm²)；未知分组按矩形计算。"""
+    areas = shape_areas(b, h, t)
+    return areas.get(group, areas["Group_A"])
+
+
+def check_specimen(group: str, s: SpecimenBase) -> list[str]:
+    """对单个试件做几何与承载力合理性检查，返回不通过的原因 (空列表表示通过)。"""
+    reasons: list[str] = []
+    if min(s.b, s.h, s.t, s.L) <= 0:
+        return ["b/h/t/L 必须为正数"]
+    if group == "Group_B" and not math.isclose(s.b, s.h, rel_tol=1e-3):
+        reasons.append(f"圆形截面 b ({s.b}) != h ({s.h})")
+    if group == "Group_C" and s.b < s.h:
+        reasons.append(f"圆端形截面长轴 b ({s.b}) < 短轴 h ({s.h})")
+    if group in ("Group_B", "Group_C") and not math.isclose(s.r0, s.h / 2, rel_tol=1e-2):
+        reasons.append(f"r0 ({s.r0}) 应为 h/2 ({s.h / 2})")
+    if s.t >= min(s.b, s.h) / 2:
+        reasons.append(f"壁厚 t ({s.t}) 不小于截面半宽")
+    if not FC_RANGE[0] <= s.fc_value <= FC_RANGE[1]:
+        reasons.append(f"fc_value ({s.fc_value} MPa) 超出合理范围 {FC_RANGE}")
+    if not FY_RANGE[0] <= s.fy <= FY_RANGE[1]:
+        reasons.append(f"fy ({s.fy} MPa) 超出合理范围 {FY_RANGE}")
+
+    if s.n_exp <= 0:
+        reasons.append(f"n_exp ({s.n_exp}) 必须为正数")
+    elif not reasons:
+        steel, core = _areas(group, s.b, s.h, s.t)
+        nominal = (steel * s.fy + core * s.fc_value) / 1000
+        ratio = s.n_exp / nominal
+        if not N_EXP_RATIO_RANGE[0] <= ratio <= N_EXP_RATIO_RANGE[1]:
+            reasons.append(f"n_exp ({s.n_exp} kN) 与名义承载力 {nominal:.0f} kN 之比 {ratio:.2f} 不合理")
+    return reasons
+
+
+def check_extraction(extraction: PaperExtraction) -> dict[str, list[str]]:
+    """检查整篇提取结果，返回 试件编号 → 不通过原因。"""
+    flagged: dict[str, list[str]] = {}
+    for group in GROUPS:
+        for s in getattr(extraction, group):
+            reasons = check_specimen(group, s)
+            if reasons:
+                flagged.setdefault(s.specimen_label, []).extend(reasons)
+    return flagged
+
+
+def _content_list_images(paper_dir: Path) -> list[str | None]:
+    """按出现顺序返回 MinerU content_list.json 中各表格原图的路径 (相对于论文目录)。"""
+    for path in sorted(paper_dir.rglob("*content_list.json")):
+        try:
+            items = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        images = []
+        for item in items:
+            if item.get("type") == "table":
+                img = item.get("img_path")
+                images.append(str((path.parent / img).relative_to(paper_dir)) if img else None)
+        return images
+    return []
+
+
+def locate_tables(
+    paper_dir: Path, labels: list[str], table_numbers: list[int] | None = None
+) -> list[TableContext]:
+    """选出被标记的表格，以及包含被标记试件编号的表格。"""
+    from cfst_extractor.agent.compaction import TABLE_RE, html_table_to_grid
+    from cfst_extractor.agent.tools import find_main_markdown
+
+    main_md = find_main_markdown(paper_dir)
+    if main_md is None:
+        return []
+    content = main_md.read_text(encoding="utf-8", errors="ignore")
+    htmls = [m.group(0) for m in TABLE_RE.finditer(content)]
+    images = _content_list_images(paper_dir)
+    # content_list 与 Markdown 的表格数量不一致时无法可靠对应，不附原图
+    if len(images) != len(htmls):
+        images = [None] * len(htmls)
+
+    wanted = set(table_numbers or [])
+    keys = {normalize_label(label) for label in labels}
+    selected: list[TableContext] = []
+    for number, (html, image) in enumerate(zip(htmls, images), start=1):
+        table = TableContext(number=number, html=html, grid=html_table_to_grid(html), image_path=image)
+        if number in wanted or keys & {normalize_label(label) for label in table.labels()}:
+            selected.append(table)
+    return selected
+
+
+def build_repair_prompt(
+    paper_id: str,
+    extraction: PaperExtraction,
+    flagged: dict[str, list[str]],
+    tables: list[TableContext],
+) -> str:
+    """修复会话的可变部分：被标记试件、当前记录与相关表格文本。"""
+    keys = {normalize_label(label) for label in flagged}
+    current = [
+        {"group": group, **s.model_dump()}
+        for group in GROUPS
+        for s in getattr(extraction, group)
+        if normalize_label(s.specimen_label) in keys
+    ]
+    lines = [f"当前文献目录：{paper_id}", "", "被标记的试件及原因："]
+    lines += [f"- {label}: {'；'.join(reasons) or '人工标记'}" for label, reasons in flagged.items()]
+    lines += ["", "当前记录：", json.dumps(current, ensure_ascii=False, indent=1), ""]
+    for table in tables:
+        image = f" (原图: {table.image_path})" if table.image_path else ""
+        lines += [f"表格 {table.number}{image}：", table.html, ""]
+    return "\n".join(lines)
+
+
+def apply_repair(
+    extraction: PaperExtraction, repair: SpecimenRepair, labels: list[str]
+) -> PaperExtraction:
+    """把修复结果写回原提取结果的副本。
+
+    被标记试件若出现在修复结果中则原位替换 (分组变化时移到新分组末尾)；被列入 removed_labels
+    则删除；两者都不是时保留原记录。修复结果中原文尚无的新试件追加到对应分组末尾；
+    未被标记的已有试件即使出现在修复结果或 removed_labels 中也保持原样。
+    """
+    targets = {normalize_label(label) for label in labels}
+    existing = {normalize_label(s.specimen_label) for group in GROUPS for s in getattr(extraction, group)}
+    removed = {normalize_label(label) for label in repair.removed_labels} & targets
+    repaired = {
+        group: {
+            key: s
+            for s in getattr(repair, group)
+            if (key := normalize_label(s.specimen_label)) in targets or key not in existing
+        }
+        for group in GROUPS
+    }
+    returned = {key for specimens in repaired.values() for key in specimens}
+
+    patched = extraction.model_copy(deep=True)
+    for group in GROUPS:
+        pending = dict(repaired[group])
+        out: list[SpecimenBase] = []
+        for s in getattr(patched, group):
+            key = normalize_label(s.specimen_label)
+            if key not in targets:
+                out.append(s)
+            elif key in pending:
+                out.append(pending.pop(key))
+            elif key not in returned and key not in removed:
+                out.append(s)
+        out.extend(pending.values())
+        setattr(patched, group, out)
+    return patched
@@ -0,0 +1,144 @@
+"""流式结构化输出的逐试件校验。
+
+大论文 (50+ 试件) 的 PaperExtraction 要等整段 JSON 生成完毕才校验，末尾一个字段出错就要整段重新生成。
+流式模式下 Extractor 用 pydantic-ai 的 run_stream 接收输出工具参数的增量 JSON，SpecimenStream
+在每个试件对象完整到达时立即按 SpecimenBase 校验并回调 (CLI 据此增量写出部分结果)。
+整体校验失败或输出被截断时，只把已接收的试件编号与校验错误告诉模型，请它补充缺失或无效的尾部，
+而不是重新生成全部输出。
+"""
+
+from __future__ import annotations
+
+import bisect
+import time
+from collections.abc import Callable
+
+from pydantic import ValidationError
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_core import from_json
+
+from cfst_extractor.agent.models import GROUPS, PaperExtraction, RefInfo, SpecimenBase
+
+# pydantic-ai 结构化输出工具的默认名称
+OUTPUT_TOOL_PREFIX = "final_result"
+
+TAIL_PROMPT = (
+    "你上一次输出的 JSON 未通过校验或在中途被截断。下面列出了已经成功接收的试件与校验失败的试件。\n"
+    "请只输出缺失 (包括被截断的尾部) 或校验失败的试件，放入对应分组；不要重复输出已接收的试件。"
+    "若所有试件都已接收且没有错误，返回空列表。"
+)
+
+
+def output_args(response: ModelResponse) -> dict | None:
+    """从 (可能不完整的) 模型响应中取出输出工具的参数，按部分 JSON 宽松解析。"""
+    for part in response.parts:
+        if isinstance(part, ToolCallPart) and part.tool_name.startswith(OUTPUT_TOOL_PREFIX):
+            if isinstance(part.args, dict):
+                return part.args
+            if part.args:
+                data = from_json(part.args, allow_partial=True)
+                return data if isinstance(data, dict) else None
+    return None
+
+
+class SpecimenStream:
+    """跟踪流式输出中各分组已完整到达的试件，逐个校验。"""
+
+    def __init__(self, on_specimen: Callable[[str, SpecimenBase], None] | None = None):
+        self.on_specimen = on_specimen
+        self.valid: dict[str, list[SpecimenBase]] = {g: [] for g in GROUPS}
+        # 校验失败的试件：{"group", "index", "label", "errors"}
+        self.invalid: list[dict] = []
+        self.header: dict = {}
+        # 文档信息 (ref_info) 的校验错误，由 assemble 记录
+        self.header_errors: list[str] = []
+        self.started = time.perf_counter()
+        self.first_specimen_s: float | None = None
+        self._seen = {g: 0 for g in GROUPS}
+        # valid 中各试件在所属分组中的下标 (保持原顺序插入)；未通过校验的试件内容 (变化后重新校验)
+        self._indices: dict[str, list[int]] = {g: [] for g in GROUPS}
+        self._rejected: dict[tuple[str, int], object] = {}
+
+    def feed(self, data: dict, final: bool = False) -> None:
+        """处理一次增量解析结果。final=False 时 JSON 中最后出现的分组的末尾对象可能仍在生成，暂不校验。"""
+        self.header = {k: v for k, v in data.items() if k not in GROUPS}
+        # 按 JSON 中的键顺序：模型不一定按 Group_A/B/C 的顺序输出
+        present = [g for g in data if g in GROUPS and isinstance(data[g], list)]
+        for group in present:
+            items = data[group]
+            complete = len(items) if final or group != present[-1] else len(items) - 1
+            for key, item in list(self._rejected.items()):
+                if key[0] == group and key[1] < complete and items[key[1]] != item:
+                    # 先前校验失败的试件内容有变化 (例如此前被误判为已完整)：撤销错误并重新校验
+                    del self._rejected[key]
+                    self.invalid = [i for i in self.invalid if (i["group"], i["index"]) != key]
+                    self._check(group, key[1], items[key[1]])
+            for index in range(self._seen[group], complete):
+                self._check(group, index, items[index])
+            self._seen[group] = max(self._seen[group], complete)
+
+    @staticmethod
+    def _errors(e: ValidationError) -> list[str]:
+        return [f"{'.'.join(str(x) for x in err['loc'])}: {err['msg']}" for err in e.errors()]
+
+    def _check(self, group: str, index: int, item) -> None:
+        try:
+            specimen = SpecimenBase.model_validate(item)
+        except ValidationError as e:
+            label = item.get("specimen_label", "") if isinstance(item, dict) else ""
+            errors = self._errors(e)
+            self.invalid.append({"group": group, "index": index, "label": label, "errors": errors})
+            self._rejected[(group, index)] = item
+            return
+        if self.first_specimen_s is None:
+            self.first_specimen_s = round(time.perf_counter() - self.started, 2)
+        pos = bisect.bisect(self._indices[group], index)
+        self._indices[group].insert(pos, index)
+        self.valid[group].insert(pos, specimen)
+        if self.on_specimen is not None:
+            self.on_specimen(group, specimen)
+
+    @property
+    def count(self) -> int:
+        return sum(len(v) for v in self.valid.values())
+
+    def assemble(self) -> PaperExtraction:
+        """由已通过校验的试件与文档信息组成部分结果。
+
+        文档信息未通过校验时不静默补空：错误记入 header_errors (stats 中同名字段) 并写入 reason，
+        ref_info 留空以便复核。
+        """
+        reason = str(self.header.get("reason", ""))
+        try:
+            ref_info = RefInfo.model_validate(self.header.get("ref_info"))
+            self.header_errors = []
+        except ValidationError as e:
+            self.header_errors = self._errors(e)
+            ref_info = RefInfo(title="", authors=[], journal="", year=0)
+            reason = f"{reason} [ref_info 校验失败: {'; '.join(self.header_errors)}]".strip()
+        return PaperExtraction(
+            is_valid=bool(self.header.get("is_valid", True)),
+            reason=reason,
+            ref_info=ref_info,
+            **self.valid,
+        )
+
+    def tail_prompt(self) -> str:
+        lines = [TAIL_PROMPT, "", "已接收的试件："]
+        for group in GROUPS:
+            labels = [s.specimen_label for s in self.valid[group]]
+            lines.append(f"- {group} ({len(labels)}): {', '.join(labels) or '无'}")
+        if self.invalid:
+            lines.append("校验失败的试件 (请修正后重新输出)：")
+            for item in self.invalid:
+                label = item["label"] or f"{item['group']}[{item['index']}]"
+                lines.append(f"- {label} ({item['group']}): {'; '.join(item['errors'])}")
+        return "\n".join(lines)
+
+    def stats(self) -> dict:
+        return {
+            "specimens": self.count,
+            "invalid": [{k: item[k] for k in ("group", "index", "label")} for item in self.invalid],
+            "header_errors": self.header_errors,
+            "first_specimen_s": self.first_specimen_s,
+        }
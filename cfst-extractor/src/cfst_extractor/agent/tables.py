@@ -0,0 +1,144 @@
+"""按试件编号合并多张表格的行 (hash join)。
+
+CFST 论文常把同一试件的属性分散在多张表中：几何与材料在表 1，承载力 N_u 在表 2。
+这里先把试件编号规范化为连接键 (容忍大小写、空白、连字符、脚注标记及 O/0、l/1 等 OCR 混淆)，
+再对每张表建立 键 → 行 的索引，一次遍历完成合并，取代逐行扫描整张表的 O(n·m) 对照。
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+
+_LABEL_HEADER_RE = re.compile(r"specimen|label|shape|designation|试件|编号|构件|^no\.?$|^id$", re.IGNORECASE)
+_DASHES_RE = re.compile(r"[‐-―−_~]")
+_FOOTNOTE_RE = re.compile(r"[*†‡§¶#]+$|\^\{?[a-z*]\}?$")
+_PAREN_SUFFIX_RE = re.compile(r"\([^)]*\)$")
+_NUMBER_RE = re.compile(r"[-+]?\d+(?:\.\d+)?")
+
+
+def _fix_ocr_confusions(label: str) -> str:
+    """在数字上下文中把 O/o → 0、I/l/| → 1；小写 l 紧跟大写字母或连字符时也视为 1。"""
+    chars = list(label)
+    for i, ch in enumerate(chars):
+        prev = chars[i - 1] if i > 0 else ""
+        nxt = chars[i + 1] if i + 1 < len(chars) else ""
+        near_digit = prev.isdigit() or nxt.isdigit()
+        if ch in "Oo" and near_digit:
+            chars[i] = "0"
+        elif (ch in "I|" and near_digit) or (ch == "l" and (near_digit or prev.isupper() or prev == "-")):
+            chars[i] = "1"
+    return "".join(chars)
+
+
+def normalize_label(label: str) -> str:
+    """把试件编号规范化为连接键，如 'SC–l*' → 'SC-1'，'c 1O' → 'C10'。"""
+    s = unicodedata.normalize("NFKC", label).strip()
+    s = _FOOTNOTE_RE.sub("", s)
+    s = _DASHES_RE.sub("-", s)
+    s = re.sub(r"\s+", "", s)
+    s = _fix_ocr_confusions(s)
+    return s.upper().strip("-.")
+
+
+def label_keys(label: str) -> list[str]:
+    """由精确到宽松的候选连接键：完整键 → 去掉括号后缀 → 去掉数字后的单个字母后缀。"""
+    key = normalize_label(label)
+    keys = [key]
+    stripped = _PAREN_SUFFIX_RE.sub("", key)
+    if stripped and stripped not in keys:
+        keys.append(stripped)
+    m = re.match(r"^(.*\d)[A-Z]$", stripped)
+    if m and m.group(1) not in keys:
+        keys.append(m.group(1))
+    return keys
+
+
+def _is_label(cell: str) -> bool:
+    return bool(cell.strip()) and len(cell) <= 40 and any(ch.isdigit() for ch in normalize_label(cell))
+
+
+def _split_header(grid: list[list[str]]) -> tuple[list[str], list[list[str]]]:
+    """识别表头行 (直到第一行以数值单元格为主为止)，合并为逐列列名。"""
+    n_header = 0
+    for row in grid:
+        numeric = sum(1 for cell in row if _NUMBER_RE.fullmatch(cell.strip().replace(",", "")))
+        if numeric >= max(1, len(row) // 3):
+            break
+        n_header += 1
+    if n_header == len(grid):
+        n_header = min(1, len(grid))
+
+    width = max((len(r) for r in grid), default=0)
+    headers = []
+    for c in range(width):
+        parts: list[str] = []
+        for row in grid[:n_header]:
+            cell = row[c].strip() if c < len(row) else ""
+            if cell and cell not in parts:
+                parts.append(cell)
+        headers.append(" ".join(parts) or f"col{c + 1}")
+    return headers, grid[n_header:]
+
+
+def _label_column(headers: list[str]) -> int:
+    for c, h in enumerate(headers):
+        if _LABEL_HEADER_RE.search(h):
+            return c
+    return 0
+
+
+def join_tables(tables: list[list[list[str]]], names: list[str] | None = None) -> list[dict]:
+    """按规范化试件编号对多张表做全外连接，返回逐试件的合并记录。
+
+    每条记录形如::
+
+        {"label": "C1", "key": "C1", "tables": ["T1", "T2"],
+         "fields": {"T1.D (mm)": "100", "T2.Nu (kN)": "1000"}}
+
+    试件编号单元格包含多个编号 (如 MinerU 把 `C1 C2` 合并到一格) 时记录会带上
+    "merged_label": True，提示该行数据已错位，需要查看表格原图。
+    """
+    names = names or [f"T{i + 1}" for i in range(len(tables))]
+    records: list[dict] = []
+    # 精确键 → 记录；放宽后的键 → 候选记录。放宽匹配只用于跨表连接，且只接受唯一候选，
+    # 避免把同一张表中的 C1 / C1a / C1b 合并为一个试件
+    exact: dict[str, dict] = {}
+    relaxed: dict[str, list[dict]] = {}
+
+    def _lookup(keys: list[str], table: str) -> dict | None:
+        if keys[0] in exact:
+            return exact[keys[0]]
+        for k in keys[1:]:
+            if k in exact and table not in exact[k]["tables"]:
+                return exact[k]
+        candidates = [r for r in relaxed.get(keys[0], []) if table not in r["tables"]]
+        return candidates[0] if len(candidates) == 1 else None
+
+    for name, grid in zip(names, tables):
+        if not grid:
+            continue
+        headers, rows = _split_header(grid)
+        label_col = _label_column(headers)
+        for row in rows:
+            if label_col >= len(row) or not _is_label(row[label_col]):
+                continue
+            label = row[label_col].strip()
+            keys = label_keys(label)
+            record = _lookup(keys, name)
+            if record is None:
+                record = {"label": label, "key": keys[0], "tables": [], "fields": {}}
+                records.append(record)
+            exact.setdefault(keys[0], record)
+            for k in keys[1:]:
+                if record not in relaxed.setdefault(k, []):
+                    relaxed[k].append(record)
+
+            if name not in record["tables"]:
+                record["tables"].append(name)
+            if len(label.split()) > 1:
+                record["merged_label"] = True
+            for c, cell in enumerate(row):
+                if c != label_col and cell.strip():
+                    record["fields"][f"{name}.{headers[c]}"] = cell.strip()
+    return records
@@ -22,28 +22,95 @@ def list_directory_files(paper_dir: Path) -> list[str]:
     return sorted(files)
 
 
-def read_markdown(paper_dir: Path) -> str:
-    """
-    一次性读取论文解析出的 Markdown 正文内容。
-    """
+def find_main_markdown(paper_dir: Path) -> Path | None:
+    """定位论文解析目录中的主 Markdown 文件，找不到时返回 None。"""
     md_files = list(paper_dir.glob("**/*.md"))
     if not md_files:
-        return f"未在 {paper_dir} 中找到任何 Markdown 文件"
-    
+        return None
+
     # 假设第一个或者 `auto` 目录下的就是主文件，如果是 MinerU 的输出，通常在同一级
     main_md = md_files[0]
     for md in md_files:
         if "auto" in str(md):
             main_md = md
             break
+    return main_md
+
+
+def read_markdown(paper_dir: Path, compact: bool = False, stats: dict | None = None) -> str:
+    """
+    一次性读取论文解析出的 Markdown 正文内容。
+    compact=True 时先经过 compaction 压缩，压缩前后的 token 估计写入 stats["markdown_tokens"]。
+    """
+    main_md = find_main_markdown(paper_dir)
+    if main_md is None:
+        return f"未在 {paper_dir} 中找到任何 Markdown 文件"
             
     typer.secho(f"› Tool read_markdown called with main_md='{main_md.name}'", dim=True)
     try:
         content = main_md.read_text(encoding="utf-8")
-        return content
     except Exception as e:
         return f"读取 {main_md.name} 时出错: {e}"
 
+    if compact:
+        from cfst_extractor.agent.compaction import compact_markdown
+
+        compacted = compact_markdown(content)
+        typer.secho(
+            f"› Markdown compacted: ~{compacted.tokens_before} -> ~{compacted.tokens_after} tokens",
+            dim=True,
+        )
+        if stats is not None:
+            stats["markdown_tokens"] = {
+                "before": compacted.tokens_before,
+                "after": compacted.tokens_after,
+            }
+        return compacted.text
+    return content
+
+
+def evidence_offsets(paper_dir: Path, extraction) -> dict[str, list[int]]:
+    """把提取结果中各试件的 source_evidence 映射回原始 Markdown 的偏移 {试件编号: [start, end]}。
+
+    read_markdown 开启压缩时模型引用的是压缩后的文本，这里用同样的压缩结果反查原文位置。
+    """
+    from cfst_extractor.agent.compaction import compact_markdown
+
+    main_md = find_main_markdown(paper_dir)
+    if main_md is None:
+        return {}
+    compacted = compact_markdown(main_md.read_text(encoding="utf-8"))
+    specimens = [*extraction.Group_A, *extraction.Group_B, *extraction.Group_C]
+    offsets = compacted.evidence_offsets([(s.specimen_label, s.source_evidence) for s in specimens])
+    return {label: list(span) for label, span in offsets.items()}
+
+
+def load_tables(paper_dir: Path) -> list[list[list[str]]]:
+    """按出现顺序解析主 Markdown 中的全部 HTML 表格为二维网格 (第 i 个元素对应第 i+1 张表)。"""
+    from cfst_extractor.agent.compaction import TABLE_RE, html_table_to_grid
+
+    main_md = find_main_markdown(paper_dir)
+    if main_md is None:
+        return []
+    content = main_md.read_text(encoding="utf-8", errors="ignore")
+    return [html_table_to_grid(m.group(0)) for m in TABLE_RE.finditer(content)]
+
+
+def join_specimen_tables(paper_dir: Path, table_numbers: list[int] | None = None) -> list[dict]:
+    """
+    按规范化试件编号合并多张表格中的同一试件行，返回逐试件的合并记录。
+    table_numbers: 参与合并的表格序号 (按在 Markdown 中出现的顺序，从 1 开始)；为空时合并全部表格。
+    """
+    from cfst_extractor.agent.tables import join_tables
+
+    typer.secho(f"› Tool join_specimen_tables called with table_numbers={table_numbers}", dim=True)
+    tables = load_tables(paper_dir)
+    numbers = table_numbers or list(range(1, len(tables) + 1))
+    missing = [n for n in numbers if not 1 <= n <= len(tables)]
+    if missing:
+        raise ValueError(f"表格序号 {missing} 不存在，Markdown 中共有 {len(tables)} 张表格")
+    return join_tables([tables[n - 1] for n in numbers], names=[f"Table{n}" for n in numbers])
+
 
 def execute_python_calc(expression: str) -> float:
     """
@@ -91,6 +158,22 @@ def execute_python_calc(expression: str) -> float:
         raise ValueError(f"计算表达式 '{expression}' 时出错: {e}")
 
 
+_IMAGE_MAGIC = ((b"\xff\xd8\xff", "image/jpeg"), (b"\x89PNG", "image/png"), (b"GIF8", "image/gif"))
+
+
+def image_media_type(data: bytes, image_path: str) -> str:
+    """inspect_image 返回数据的 MIME 类型：压缩成功时为 JPEG，否则是原图 (按文件头或扩展名判断)。"""
+    for magic, media_type in _IMAGE_MAGIC:
+        if data.startswith(magic):
+            return media_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    import mimetypes
+
+    guessed, _ = mimetypes.guess_type(image_path)
+    return guessed if guessed and guessed.startswith("image/") else "image/jpeg"
+
+
 def inspect_image(paper_dir: Path, image_path: str, reason: str) -> bytes:
     """
     视觉读取工具。
@@ -0,0 +1,233 @@
+"""提取配置的回归基准：模型 × 平台预设 × 提示词版本，在金标准论文上对比准确率、token、工具调用与耗时。
+
+testdata/jsondata 下的金标准 (A[1-1].json …) 与 testdata/pdfs 经 MinerU 解析后的目录 ([A1-1] …)
+按编号配对。网格中的每个单元 (cell) 对每篇金标准论文运行一次完整提取，所有 (cell, 论文) 任务
+共享同一个并发上限。模型响应按改写后的请求体缓存在磁盘上：未改动的单元重跑时不再调用模型，
+改动提示词或预设只会重发受影响的请求 (命中次数记为 cached_responses，此时耗时不代表真实延迟)。
+
+各单元的论文交错并发运行，单元自身没有独立的墙钟耗时：表格中的 total_paper_seconds 为该单元
+各论文耗时之和 (max_seconds 为最慢的一篇)，整个网格的墙钟耗时在运行结束时打印。
+
+准确率以金标准为基准逐试件比对 (compare_extractions，容差默认与 consensus 相同)：
+    accuracy       → 分组与全部数值字段均在容差内的金标准试件比例
+    recall         → 提取到 (编号匹配) 的金标准试件比例
+    precision      → 提取结果中能在金标准中找到的试件比例
+    field_accuracy → 匹配试件的数值字段在容差内的比例
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import itertools
+import json
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from cfst_extractor.agent.consensus import compare_extractions
+from cfst_extractor.agent.models import GROUPS, NUMERIC_FIELDS, PaperExtraction
+from cfst_extractor.output import OutputWriter, atomic_write_bytes
+
+GOLD_DIR = Path(__file__).resolve().parents[3] / "testdata" / "jsondata"
+RUNS_FILE = "benchmark_runs.jsonl"
+TABLE_FILE = "benchmark.csv"
+
+COLUMNS = (
+    "cell", "model", "platform", "prompt", "papers", "failed",
+    "accuracy", "recall", "precision", "field_accuracy",
+    "input_tokens", "cached_input_tokens", "output_tokens", "requests",
+    "tool_calls", "cached_responses", "total_paper_seconds", "max_seconds",
+)
+_USAGE = ("input_tokens", "cached_input_tokens", "output_tokens", "requests", "tool_calls", "cached_responses")
+_SUMMED = ("gold_specimens", "extracted_specimens", "matched", "exact", "field_errors", *_USAGE)
+
+# 金标准文件名 A[1-12] ↔ 解析目录名 [A1-12] ...
+_GOLD_RE = re.compile(r"^([A-Za-z]+)\[(\d+-\d+)\]$")
+_PAPER_RE = re.compile(r"^\[([A-Za-z]+\d+-\d+)\]")
+
+
+@dataclass(frozen=True)
+class Cell:
+    """网格中的一个配置：None 表示沿用 settings 中的模型/平台与 config/System_Prompt.md。"""
+
+    model: str | None = None
+    platform: str | None = None
+    prompt: Path | None = None
+
+    @property
+    def name(self) -> str:
+        prompt = self.prompt.stem if self.prompt else "System_Prompt"
+        return f"{self.model or 'default'}@{self.platform or 'settings'}@{prompt}"
+
+    @property
+    def dirname(self) -> str:
+        return re.sub(r"[^\w.@+-]+", "_", self.name)
+
+
+def build_grid(models: list[str], platforms: list[str], prompts: list[Path]) -> list[Cell]:
+    """三个维度的笛卡尔积，空维度取默认配置。"""
+    return [
+        Cell(model, platform, prompt)
+        for model, platform, prompt in itertools.product(models or [None], platforms or [None], prompts or [None])
+    ]
+
+
+def match_gold(gold_dir: Path, paper_dirs: list[Path]) -> list[tuple[Path, Path]]:
+    """按编号把金标准 JSON 与解析目录配对，返回 [(paper_dir, gold_path)]；没有解析目录的金标准被跳过。"""
+    papers: dict[str, Path] = {}
+    for d in paper_dirs:
+        m = _PAPER_RE.match(d.name)
+        papers.setdefault(m.group(1).upper() if m else d.name, d)
+
+    pairs = []
+    for gold in sorted(gold_dir.glob("*.json")):
+        m = _GOLD_RE.match(gold.stem)
+        key = f"{m.group(1)}{m.group(2)}".upper() if m else gold.stem
+        if key in papers:
+            pairs.append((papers[key], gold))
+    return pairs
+
+
+def load_gold(path: Path) -> PaperExtraction:
+    # 人工整理的金标准中 reason 等字段含未转义的换行符，需要宽松解析
+    return PaperExtraction.model_validate(json.loads(path.read_text(encoding="utf-8"), strict=False))
+
+
+def score_extraction(
+    result: PaperExtraction, gold: PaperExtraction, rel_tol: float = 0.02, abs_tol: float = 0.5
+) -> dict:
+    """以金标准为基准比对一份提取结果，返回可跨论文累加的计数。"""
+    diffs = compare_extractions(gold, result, rel_tol, abs_tol)
+    missed = sum(1 for d in diffs if d.get("issue") == "only_in_a")
+    wrong = {d["specimen"] for d in diffs if "specimen" in d and "field" in d}
+    n_gold = sum(len(getattr(gold, g)) for g in GROUPS)
+    n_result = sum(len(getattr(result, g)) for g in GROUPS)
+    return {
+        "gold_specimens": n_gold,
+        "extracted_specimens": n_result,
+        "matched": n_gold - missed,
+        "exact": n_gold - missed - len(wrong),
+        "field_errors": sum(1 for d in diffs if d.get("field") in NUMERIC_FIELDS),
+        "is_valid_ok": not any(d.get("field") == "is_valid" for d in diffs),
+    }
+
+
+def summarize_cell(cell: Cell, runs: list[dict]) -> dict:
+    """把一个单元的逐论文记录汇总为表格的一行 (比例按试件数加权)。"""
+    totals = {key: sum(r.get(key, 0) for r in runs) for key in _SUMMED}
+
+    def ratio(num: float, den: float) -> float | None:
+        return round(num / den, 4) if den else None
+
+    return {
+        "cell": cell.name,
+        "model": cell.model or "default",
+        "platform": cell.platform or "settings",
+        "prompt": cell.prompt.stem if cell.prompt else "System_Prompt",
+        "papers": len(runs),
+        "failed": sum(1 for r in runs if r["status"] != "ok"),
+        "accuracy": ratio(totals["exact"], totals["gold_specimens"]),
+        "recall": ratio(totals["matched"], totals["gold_specimens"]),
+        "precision": ratio(totals["matched"], totals["extracted_specimens"]),
+        "field_accuracy": (
+            ratio(totals["matched"] * len(NUMERIC_FIELDS) - totals["field_errors"],
+                  totals["matched"] * len(NUMERIC_FIELDS))
+        ),
+        **{key: totals[key] for key in _USAGE},
+        "total_paper_seconds": round(sum(r["seconds"] for r in runs), 2),
+        "max_seconds": round(max((r["seconds"] for r in runs), default=0.0), 2),
+    }
+
+
+def best_cell(rows: list[dict], min_accuracy: float) -> dict | None:
+    """达到准确率要求且没有失败论文的单元中论文耗时合计最短的一个。"""
+    eligible = [
+        r for r in rows if r["failed"] == 0 and r["accuracy"] is not None and r["accuracy"] >= min_accuracy
+    ]
+    return min(eligible, key=lambda r: r["total_paper_seconds"], default=None)
+
+
+def table_csv(rows: list[dict]) -> bytes:
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=COLUMNS, lineterminator="\n")
+    w.writeheader()
+    w.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def table_markdown(rows: list[dict]) -> str:
+    cols = ("cell", "accuracy", "recall", "precision", "field_accuracy",
+            "input_tokens", "output_tokens", "tool_calls", "total_paper_seconds", "failed")
+    lines = ["| " + " | ".join(cols) + " |", "|" + "---|" * len(cols)]
+    for r in rows:
+        lines.append("| " + " | ".join("-" if r[c] is None else str(r[c]) for c in cols) + " |")
+    return "\n".join(lines)
+
+
+async def run_benchmark(
+    cells: list[Cell],
+    pairs: list[tuple[Path, Path]],
+    out_dir: Path,
+    workers: int = 4,
+    cache_dir: Path | None = None,
+    rel_tol: float = 0.02,
+    abs_tol: float = 0.5,
+) -> list[dict]:
+    """运行整个网格，逐论文记录追加到 benchmark_runs.jsonl，返回按单元汇总的表格行 (同时写出 benchmark.csv)。"""
+    import typer
+
+    from cfst_extractor.agent.agent import (
+        build_agent,
+        patch_override,
+        platform_patches,
+        response_cache_dir,
+    )
+    from cfst_extractor.agent.extractor import Extractor
+
+    writer = OutputWriter(out_dir, fmt="compact")
+    atomic_write_bytes(out_dir / RUNS_FILE, b"")
+    golds = {gold: load_gold(gold) for _, gold in pairs}
+
+    agents = {p: build_agent(p.read_text(encoding="utf-8")) for p in {c.prompt for c in cells} if p}
+    extractors = {c: Extractor(model=c.model, agent=agents.get(c.prompt)) for c in cells}
+    patches = {c: platform_patches(c.platform) if c.platform else None for c in cells}
+    runs: dict[Cell, list[dict]] = {c: [] for c in cells}
+    sem = asyncio.Semaphore(workers)
+
+    async def _run_one(cell: Cell, paper_dir: Path, gold_path: Path) -> None:
+        async with sem:
+            # ContextVar 只在当前任务内生效，并行的其他单元不受影响
+            patch_override.set(patches[cell])
+            response_cache_dir.set(cache_dir)
+            ext = extractors[cell]
+            started = time.perf_counter()
+            result = await ext.extract(paper_dir)
+            seconds = time.perf_counter() - started
+
+        stats = ext.run_stats.get(paper_dir.name, {})
+        record = {
+            "cell": cell.name,
+            "paper": paper_dir.name,
+            "status": stats.get("status", "ok"),
+            "seconds": round(seconds, 2),
+            **{key: stats.get(key, 0) for key in ("input_tokens", "cached_input_tokens", "output_tokens", "requests")},
+            "tool_calls": sum(p["calls"] for p in (stats.get("tools") or {}).values()),
+            "cached_responses": stats.get("cached_responses", 0),
+            **score_extraction(result, golds[gold_path], rel_tol, abs_tol),
+        }
+        OutputWriter(out_dir / cell.dirname, fmt="compact").write_paper(paper_dir.name, result)
+        writer.append_record(RUNS_FILE, record)
+        runs[cell].append(record)
+        typer.echo(f"  {cell.name} {paper_dir.name}: {record['exact']}/{record['gold_specimens']} exact, "
+                   f"{record['seconds']}s")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_run_one(c, d, g) for c in cells for d, g in pairs))
+    typer.echo(f"Benchmark finished in {time.perf_counter() - started:.1f}s wall time")
+
+    rows = [summarize_cell(c, runs[c]) for c in cells]
+    atomic_write_bytes(out_dir / TABLE_FILE, table_csv(rows))
+    return rows
@@ -3,16 +3,26 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Annotated
 
 import typer
 
 from cfst_extractor.agent.extractor import Extractor
 from cfst_extractor.agent.models import PaperExtraction
 
+if TYPE_CHECKING:
+    from cfst_extractor.output import OutputWriter
+
 app = typer.Typer(help="CFST Experimental Data Extractor (Agent-Based)")
 
+_PROGRESS_FILE = "batch_progress.jsonl"
+_FORMAT_HELP = "Per-paper JSON format: pretty (indented) | compact (uses orjson when installed)"
+_JSONL_HELP = "Also append every result to <output>/corpus.jsonl"
+_CONSENSUS_HELP = "Extra model to run concurrently; return once two results agree (repeatable)"
+_STREAM_HELP = "Stream the output: validate specimens as they arrive and append them to <output>/<paper>.partial.jsonl"
+
 
 def _count_groups(result: PaperExtraction) -> dict[str, int]:
     return {
@@ -22,11 +32,40 @@ def _count_groups(result: PaperExtraction) -> dict[str, int]:
     }
 
 
+def _output_writer(output: str, fmt: str, jsonl: bool = False) -> OutputWriter:
+    from cfst_extractor.output import FORMATS, OutputWriter
+
+    if fmt not in FORMATS:
+        typer.echo(f"Error: unknown format {fmt!r} (expected {' or '.join(FORMATS)})")
+        raise typer.Exit(1)
+    return OutputWriter(Path(output), fmt=fmt, corpus=jsonl)
+
+
+def _discover_papers(root: Path) -> list[Path]:
+    """列出 root 下所有 MinerU 解析目录。"""
+    parsed_dirs = sorted(
+        d for d in root.iterdir()
+        if d.is_dir() and (d / "auto").is_dir()
+    )
+
+    if not parsed_dirs:
+        # 兼容那些没有 auto 子目录而是直接把文件放里面的情况
+        parsed_dirs = sorted(
+            d for d in root.iterdir()
+            if d.is_dir() and list(d.glob("*.md"))
+        )
+    return parsed_dirs
+
+
 @app.command()
 def single(
     parsed_dir: str = typer.Argument(..., help="Path to MinerU parsed output directory"),
     output: str = typer.Option("output", "-o", help="Output directory"),
     model: str = typer.Option(None, "-m", help="LLM model to use (e.g. google-gla:gemini-2.5-pro)"),
+    fmt: str = typer.Option("pretty", "--format", help=_FORMAT_HELP),
+    jsonl: bool = typer.Option(False, "--jsonl", help=_JSONL_HELP),
+    consensus: Annotated[list[str] | None, typer.Option("--consensus", help=_CONSENSUS_HELP)] = None,
+    stream: bool = typer.Option(False, "--stream", help=_STREAM_HELP),
 ) -> None:
     """Extract CFST data from a single MinerU-parsed document using LLM Agent."""
     
@@ -35,32 +74,26 @@ def single(
         typer.echo(f"Error: Directory {parsed_dir} does not exist.")
         raise typer.Exit(1)
         
-    out_dir = Path(output)
-    out_dir.mkdir(parents=True, exist_ok=True)
+    writer = _output_writer(output, fmt, jsonl)
         
-    ext = Extractor(model=model)
+    ext = Extractor(model=model, consensus_models=consensus, stream=stream)
     from cfst_extractor.agent.agent import cfst_agent
     
     actual_model = ext.model or cfst_agent.model.model_name
     typer.echo(f"Starting extraction for {doc_dir.name} using {actual_model}...")
-    result: PaperExtraction = asyncio.run(ext.extract(doc_dir))
+    on_specimen = writer.partial_recorder(doc_dir.name) if stream else None
+    result: PaperExtraction = asyncio.run(ext.extract(doc_dir, on_specimen=on_specimen))
 
     valid = (len(result.Group_A) + len(result.Group_B) + len(result.Group_C)) > 0
     groups = _count_groups(result)
     total = sum(groups.values())
     
     # Save JSON result
-    out_file = out_dir / f"{doc_dir.name}.json"
-    with open(out_file, "w", encoding="utf-8") as f:
-        result_json = result.model_dump_json(indent=2)
-        f.write(result_json)
-        
-        # 统计数量
-        total = len(result.Group_A) + len(result.Group_B) + len(result.Group_C)
-        typer.secho(
-            f"\nExtraction complete! Found {total} specimens.", 
-            fg=typer.colors.GREEN
-        )
+    out_file = writer.write_paper(doc_dir.name, result)
+    typer.secho(
+        f"\nExtraction complete! Found {total} specimens.", 
+        fg=typer.colors.GREEN
+    )
     if valid:
         typer.echo(f"Valid paper. Extracted {total} specimens: {groups}")
         typer.echo(f"Saved result to {out_file}")
@@ -68,61 +101,525 @@ def single(
         typer.echo(f"No specimens extracted or extraction failed: {getattr(result, 'reason', 'Unknown reason')}")
 
 
+@app.command()
+def repair(
+    parsed_dir: str = typer.Argument(..., help="Path to MinerU parsed output directory"),
+    output: str = typer.Option("output", "-o", help="Output directory"),
+    source: str = typer.Option(
+        None, "--from", help="Existing extraction JSON (default: <output>/<paper>.json)"
+    ),
+    specimens: Annotated[
+        list[str] | None, typer.Option("--specimen", "-s", help="Specimen label to re-extract (repeatable)")
+    ] = None,
+    tables: Annotated[
+        list[int] | None,
+        typer.Option("--table", "-t", help="Table number (order in the markdown, from 1) to re-extract (repeatable)"),
+    ] = None,
+    model: str = typer.Option(None, "-m", help="LLM model to use"),
+    fmt: str = typer.Option("pretty", "--format", help=_FORMAT_HELP),
+) -> None:
+    """Re-extract only flagged specimens/tables and patch them into an existing result.
+
+    Without --specimen/--table, specimens failing the built-in plausibility checks are repaired.
+    """
+    from cfst_extractor.agent.repair import check_extraction
+
+    doc_dir = Path(parsed_dir)
+    if not doc_dir.is_dir():
+        typer.echo(f"Error: Directory {parsed_dir} does not exist.")
+        raise typer.Exit(1)
+    out_dir = Path(output)
+    src_file = Path(source) if source else out_dir / f"{doc_dir.name}.json"
+    if not src_file.exists():
+        typer.echo(f"Error: Extraction result {src_file} does not exist.")
+        raise typer.Exit(1)
+    extraction = PaperExtraction.model_validate_json(src_file.read_text(encoding="utf-8"))
+
+    if specimens or tables:
+        checks = check_extraction(extraction)
+        flagged = {label: checks.get(label, []) for label in specimens or []}
+    else:
+        flagged = check_extraction(extraction)
+        if not flagged:
+            typer.echo(f"All specimens in {src_file.name} pass the checks; nothing to repair.")
+            return
+    for label, reasons in flagged.items():
+        typer.echo(f"  FLAGGED {label}: {'; '.join(reasons) or 'manual'}")
+
+    ext = Extractor(model=model)
+    patched = asyncio.run(ext.repair(doc_dir, extraction, flagged, list(tables or [])))
+    stats = ext.run_stats.get(doc_dir.name, {})
+    if "status" in stats:
+        typer.echo(f"Repair failed ({stats['status']}): {stats.get('error')}")
+        raise typer.Exit(1)
+
+    out_file = _output_writer(output, fmt).write_paper(doc_dir.name, patched)
+    remaining = check_extraction(patched)
+    typer.secho(
+        f"Repaired {doc_dir.name} in {stats.get('requests', 0)} requests; "
+        f"{len(remaining)} specimens still fail checks. Saved to {out_file}",
+        fg=typer.colors.GREEN,
+    )
+
+
 @app.command()
 def batch(
     parsed_root: str = typer.Argument(..., help="Root directory containing MinerU outputs"),
     output: str = typer.Option("output", "-o", help="Output directory"),
     model: str = typer.Option(None, "-m", help="LLM model to use"),
     workers: int = typer.Option(3, "-w", help="Number of parallel async workers"),
+    mode: str = typer.Option(
+        "sync", "--mode", help="sync: interactive agent loops | async-api: provider /batches rounds"
+    ),
+    poll_interval: float = typer.Option(
+        30.0, "--poll-interval", help="Seconds between batch status polls (async-api mode)"
+    ),
+    schedule: str = typer.Option(
+        "longest-first", "--schedule", help="Dispatch order: longest-first | alphabetical"
+    ),
+    fmt: str = typer.Option("pretty", "--format", help=_FORMAT_HELP),
+    jsonl: bool = typer.Option(False, "--jsonl", help=_JSONL_HELP),
+    consensus: Annotated[
+        list[str] | None, typer.Option("--consensus", help=_CONSENSUS_HELP + " (sync mode)")
+    ] = None,
+    stream: bool = typer.Option(False, "--stream", help=_STREAM_HELP + " (sync mode)"),
+    trace: bool = typer.Option(
+        False, "--trace", help="Record a timeline to <output>/batch_trace.json (Chrome/Perfetto) and .csv (sync mode)"
+    ),
 ) -> None:
-    """Batch-extract CFST data from multiple MinerU-parsed documents."""
+    """Batch-extract CFST data from multiple MinerU-parsed documents.
 
-    root = Path(parsed_root)
-    parsed_dirs = sorted(
-        d for d in root.iterdir()
-        if d.is_dir() and (d / "auto").is_dir()
-    )
+    Each finished paper is appended (fsync'd) to <output>/batch_progress.jsonl;
+    batch_summary.json is written atomically at the end.
+    """
 
-    if not parsed_dirs:
-        # 兼容那些没有 auto 子目录而是直接把文件放里面的情况
-        parsed_dirs = sorted(
-            d for d in root.iterdir()
-            if d.is_dir() and list(d.glob("*.md"))
-        )
+    if mode not in ("sync", "async-api"):
+        typer.echo(f"Error: unknown mode {mode!r} (expected sync or async-api)")
+        raise typer.Exit(1)
+    if schedule not in ("longest-first", "alphabetical"):
+        typer.echo(f"Error: unknown schedule {schedule!r} (expected longest-first or alphabetical)")
+        raise typer.Exit(1)
+
+    parsed_dirs = _discover_papers(Path(parsed_root))
 
     if not parsed_dirs:
         typer.echo(f"No valid parsed directories found in {parsed_root}")
         raise typer.Exit(1)
 
     typer.echo(f"Found {len(parsed_dirs)} parsed documents")
-    out_dir = Path(output)
-    out_dir.mkdir(parents=True, exist_ok=True)
+    writer = _output_writer(output, fmt, jsonl)
+    from cfst_extractor.output import atomic_write_bytes
+
+    # 每次批处理重新开始进度文件
+    atomic_write_bytes(writer.out_dir / _PROGRESS_FILE, b"")
+
+    def _record_progress(name: str, res: PaperExtraction) -> None:
+        writer.append_record(_PROGRESS_FILE, {
+            "paper": name,
+            "specimens": len(res.Group_A) + len(res.Group_B) + len(res.Group_C),
+            "finished_at": time.time(),
+            **run_stats.get(name, {}),
+        })
     
-    ext = Extractor(model=model)
+    async def _process_async_api():
+        from cfst_extractor.agent.agent import _api_key, _base_url, _budgets
+        from cfst_extractor.agent.batch_api import BatchAPIClient, BatchRunner
+
+        client = BatchAPIClient(_base_url or "https://api.openai.com/v1", _api_key)
+        runner = BatchRunner(
+            client, model=model, poll_interval=poll_interval, max_turns=_budgets.get("max_turns") or 20
+        )
+        try:
+            results = await runner.run(parsed_dirs)
+        finally:
+            await client.aclose()
+        run_stats.update(runner.run_stats)
+        for name, res in results:
+            writer.write_paper(name, res)
+            _record_progress(name, res)
+        return results
+
+    run_stats: dict[str, dict] = {}
+    if mode == "async-api":
+        results_raw = asyncio.run(_process_async_api())
+        _write_summary(parsed_dirs, results_raw, writer, run_stats)
+        return
+
+    ext = Extractor(model=model, consensus_models=consensus, stream=stream)
+    run_stats = ext.run_stats
+
+    # 信号量按创建顺序唤醒等待者，因此列表顺序即派发顺序
+    predicted: dict[str, float] = {}
+    if schedule == "longest-first":
+        from cfst_extractor.scheduling import order_longest_first
+
+        costs = order_longest_first(parsed_dirs)
+        parsed_dirs = [c.paper_dir for c in costs]
+        predicted = {c.paper_dir.name: c.predicted_seconds for c in costs}
+
+    from cfst_extractor.tracing import span, start_tracing, stop_tracing, traced
 
     async def _process_batch():
         sem = asyncio.Semaphore(workers)
+        # 空闲 worker 槽位编号，用于在时间线中区分各 worker
+        idle_workers = list(range(workers))
         
         async def _process_one(d: Path):
-            async with sem:
-                typer.echo(f"Processing {d.name}...")
-                res = await ext.extract(d)
-                
-                out_file = out_dir / f"{d.name}.json"
-                with open(out_file, "w", encoding="utf-8") as f:
-                    f.write(res.model_dump_json(indent=2))
-                return d.name, res
+            with traced(paper=d.name), span(d.name, "wait"):
+                await sem.acquire()
+            worker_id = idle_workers.pop(0)
+            try:
+                with traced(worker_id, d.name), span(d.name, "paper"):
+                    typer.echo(f"Processing {d.name}...")
+                    started = time.perf_counter()
+                    res = await ext.extract(d, on_specimen=writer.partial_recorder(d.name) if stream else None)
+                    stats = run_stats.setdefault(d.name, {})
+                    stats["seconds"] = round(time.perf_counter() - started, 2)
+                    if d.name in predicted:
+                        stats["predicted_seconds"] = round(predicted[d.name], 2)
+                    
+                    writer.write_paper(d.name, res)
+                    _record_progress(d.name, res)
+                    return d.name, res
+            finally:
+                idle_workers.append(worker_id)
+                sem.release()
                 
         tasks = [_process_one(d) for d in parsed_dirs]
         return await asyncio.gather(*tasks, return_exceptions=True)
 
-    results_raw = asyncio.run(_process_batch())
-    
+    if trace:
+        start_tracing()
+    try:
+        results_raw = asyncio.run(_process_batch())
+    finally:
+        tracer = stop_tracing()
+    _write_summary(parsed_dirs, results_raw, writer, run_stats)
+    if tracer is not None:
+        json_path, csv_path = tracer.export(writer.out_dir)
+        typer.echo(f"Trace written to {json_path} and {csv_path} (summarize with `cfst-extract profile {json_path}`)")
+
+
+@app.command()
+def worker(
+    parsed_root: str = typer.Argument(..., help="Shared root directory containing MinerU outputs"),
+    output: str = typer.Option("output", "-o", help="Shared output directory"),
+    model: str = typer.Option(None, "-m", help="LLM model to use"),
+    workers: int = typer.Option(1, "-w", help="Number of papers processed concurrently by this worker"),
+    worker_id: str = typer.Option(None, "--id", help="Worker id recorded in leases (default: host-pid)"),
+    lease_ttl: float = typer.Option(600.0, "--lease-ttl", help="Seconds before an unrefreshed lease expires"),
+    heartbeat: float = typer.Option(60.0, "--heartbeat", help="Seconds between lease refreshes"),
+    attempts: int = typer.Option(2, "--attempts", help="Failed extractions of a paper before this worker skips it"),
+    fmt: str = typer.Option("pretty", "--format", help=_FORMAT_HELP),
+    jsonl: bool = typer.Option(False, "--jsonl", help=_JSONL_HELP),
+) -> None:
+    """Pull papers from a shared lease-based queue; run several of these on different hosts."""
+    from cfst_extractor.output import dump_model
+    from cfst_extractor.workqueue import LeaseQueue
+
+    writer = _output_writer(output, fmt, jsonl)
+
+    parsed_dirs = _discover_papers(Path(parsed_root))
+    if not parsed_dirs:
+        typer.echo(f"No valid parsed directories found in {parsed_root}")
+        raise typer.Exit(1)
+
+    from cfst_extractor.scheduling import order_longest_first
+
+    # 所有 worker 按相同的最长优先顺序认领，长论文先被领走
+    parsed_dirs = [c.paper_dir for c in order_longest_first(parsed_dirs)]
+    queue = LeaseQueue(parsed_dirs, Path(output), worker_id=worker_id, lease_ttl=lease_ttl)
+    ext = Extractor(model=model)
+    typer.echo(f"Worker {queue.worker_id}: {len(queue.pending())}/{len(parsed_dirs)} papers pending")
+
+    async def _keep_alive(lease, task: asyncio.Task, lost: asyncio.Event):
+        while True:
+            await asyncio.sleep(heartbeat)
+            if not queue.heartbeat(lease):
+                # 租约已被他人回收：继续提取只会浪费配额，立即取消
+                typer.echo(f"  LOST lease for {lease.paper_dir.name}")
+                lost.set()
+                task.cancel()
+                return
+
+    # 提取失败的论文释放租约留给后续重试；本 worker 失败 attempts 次后不再认领
+    failures: dict[Path, int] = {}
+    skipped: set[Path] = set()
+
+    async def _loop(slot: int) -> int:
+        done = 0
+        while True:
+            lease = queue.claim(exclude=skipped)
+            if lease is None:
+                if not [d for d in queue.pending() if d not in skipped]:
+                    return done
+                # 剩余论文均被他人持有：等待其完成或租约过期后回收
+                await asyncio.sleep(heartbeat)
+                continue
+
+            typer.echo(f"[{slot}] Claimed {lease.paper_dir.name}")
+            lost = asyncio.Event()
+            extract_task = asyncio.create_task(ext.extract(lease.paper_dir))
+            keep_alive = asyncio.create_task(_keep_alive(lease, extract_task, lost))
+            try:
+                res = await extract_task
+            except asyncio.CancelledError:
+                if not lost.is_set():
+                    queue.release(lease)
+                    raise
+                typer.echo(f"[{slot}] Abandoned {lease.paper_dir.name}: lease was lost")
+                continue
+            except BaseException:
+                queue.release(lease)
+                raise
+            finally:
+                keep_alive.cancel()
+
+            stats = ext.run_stats.get(lease.paper_dir.name, {})
+            if "status" in stats:
+                # 超时、请求出错等失败结果不作为最终结果发布
+                queue.release(lease)
+                failures[lease.paper_dir] = failures.get(lease.paper_dir, 0) + 1
+                if failures[lease.paper_dir] >= attempts:
+                    skipped.add(lease.paper_dir)
+                typer.echo(f"[{slot}] Released {lease.paper_dir.name} after failure ({stats['status']}): {res.reason}")
+                continue
+
+            if queue.publish(lease, dump_model(res, writer.fmt)):
+                done += 1
+                writer.append_corpus(lease.paper_dir.name, res)
+                typer.secho(f"[{slot}] Published {lease.paper_dir.name}", fg=typer.colors.GREEN)
+            else:
+                typer.echo(f"[{slot}] Discarded {lease.paper_dir.name}: lease was reclaimed")
+
+    async def _run():
+        return await asyncio.gather(*(_loop(i) for i in range(workers)))
+
+    done = sum(asyncio.run(_run()))
+    typer.echo(f"Worker {queue.worker_id} finished: published {done} papers")
+    if skipped:
+        typer.echo(f"  Gave up on {len(skipped)} papers after {attempts} failed attempts: "
+                   f"{', '.join(d.name for d in skipped)}")
+
+
+@app.command()
+def watch(
+    parsed_root: str = typer.Argument(..., help="Root directory that MinerU writes parsed papers into"),
+    output: str = typer.Option("output", "-o", help="Output directory"),
+    model: str = typer.Option(None, "-m", help="LLM model to use"),
+    workers: int = typer.Option(3, "-w", help="Number of persistent extraction workers"),
+    interval: float = typer.Option(5.0, "--interval", help="Seconds between directory polls"),
+    fmt: str = typer.Option("pretty", "--format", help=_FORMAT_HELP),
+    jsonl: bool = typer.Option(False, "--jsonl", help=_JSONL_HELP),
+) -> None:
+    """Long-running mode: extract each paper as soon as its markdown and content_list are complete."""
+    from cfst_extractor.watcher import PaperWatcher
+
+    root = Path(parsed_root)
+    if not root.is_dir():
+        typer.echo(f"Error: Directory {parsed_root} does not exist.")
+        raise typer.Exit(1)
+    writer = _output_writer(output, fmt, jsonl)
+
+    watcher = PaperWatcher(root, writer.out_dir)
+    ext = Extractor(model=model)
+
+    async def _worker(slot: int, queue: asyncio.Queue) -> None:
+        while True:
+            paper_dir, ready_at = await queue.get()
+            typer.echo(f"[{slot}] Processing {paper_dir.name}...")
+            started = time.perf_counter()
+            try:
+                res = await ext.extract(paper_dir)
+                writer.write_paper(paper_dir.name, res)
+            except Exception as e:
+                # 单篇失败不影响常驻进程；未写出结果的论文在下次启动时会被重新发现
+                typer.echo(f"[{slot}] ERROR {paper_dir.name}: {e}")
+                continue
+            finally:
+                queue.task_done()
+
+            count = len(res.Group_A) + len(res.Group_B) + len(res.Group_C)
+            entry = {
+                "paper": paper_dir.name,
+                "specimens": count,
+                "seconds": round(time.perf_counter() - started, 2),
+                # 从确认解析完成到写出结果的端到端延迟 (含排队时间)
+                "latency_seconds": round(time.perf_counter() - ready_at, 2),
+                **ext.run_stats.pop(paper_dir.name, {}),
+            }
+            writer.append_record("watch_log.jsonl", entry)
+            typer.secho(
+                f"[{slot}] Done {paper_dir.name}: {count} specimens in {entry['seconds']}s",
+                fg=typer.colors.GREEN,
+            )
+
+    async def _run() -> None:
+        queue: asyncio.Queue = asyncio.Queue()
+        pool = [asyncio.create_task(_worker(i, queue)) for i in range(workers)]
+        typer.echo(f"Watching {root} with {workers} workers (poll every {interval}s, Ctrl-C to stop)")
+        try:
+            while True:
+                for paper_dir in watcher.poll():
+                    typer.echo(f"  READY {paper_dir.name} (queue {queue.qsize() + 1})")
+                    queue.put_nowait((paper_dir, time.perf_counter()))
+                await asyncio.sleep(interval)
+        finally:
+            for task in pool:
+                task.cancel()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        typer.echo("Stopped watching.")
+
+
+@app.command()
+def serve(
+    parsed_root: str = typer.Argument(..., help="Root directory containing MinerU outputs that clients may submit"),
+    model: str = typer.Option(None, "-m", help="LLM model to use"),
+    host: str = typer.Option("127.0.0.1", "--host", help="Address to bind"),
+    port: int = typer.Option(8765, "--port", help="TCP port to bind"),
+    socket_path: str = typer.Option(None, "--socket", help="Serve on this Unix socket instead of TCP"),
+    workers: int = typer.Option(3, "-w", help="Total concurrent extractions"),
+    bulk_workers: int = typer.Option(None, "--bulk-workers", help="Max concurrent bulk jobs (default: workers - 1)"),
+    max_queue: int = typer.Option(100, "--max-queue", help="Queued jobs before new submissions get HTTP 429"),
+) -> None:
+    """Run a local extraction service (job queue over HTTP) around one warm Extractor."""
+    from cfst_extractor.service import ExtractionService
+
+    root = Path(parsed_root)
+    if not root.is_dir():
+        typer.echo(f"Error: Directory {parsed_root} does not exist.")
+        raise typer.Exit(1)
+
+    service = ExtractionService(
+        Extractor(model=model), root, workers=workers, bulk_workers=bulk_workers, max_queue=max_queue
+    )
+    where = socket_path or f"http://{host}:{port}"
+    typer.echo(f"Serving {root} on {where} ({service.workers} workers, {service.bulk_workers} for bulk jobs)")
+    try:
+        asyncio.run(service.serve(host=host, port=port, socket_path=socket_path))
+    except KeyboardInterrupt:
+        typer.echo("Service stopped.")
+
+
+@app.command()
+def benchmark(
+    parsed_root: str = typer.Argument(..., help="Root directory containing MinerU outputs of the gold papers"),
+    gold: str = typer.Option(None, "--gold", help="Directory of gold JSONs (default: testdata/jsondata)"),
+    output: str = typer.Option("output/benchmark", "-o", help="Output directory"),
+    models: Annotated[
+        list[str] | None, typer.Option("-m", "--model", help="Model to benchmark (repeatable; default: settings)")
+    ] = None,
+    platforms: Annotated[
+        list[str] | None,
+        typer.Option("--platform", help="Platform preset to benchmark (repeatable; default: settings)"),
+    ] = None,
+    prompts: Annotated[
+        list[str] | None,
+        typer.Option("--prompt", help="System prompt file to benchmark (repeatable; default: config/System_Prompt.md)"),
+    ] = None,
+    workers: int = typer.Option(4, "-w", help="Concurrent extractions across the whole grid"),
+    cache_dir: str = typer.Option(None, "--cache-dir", help="Response cache directory (default: <output>/.response_cache)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always call the model (measure real latency)"),
+    min_accuracy: float = typer.Option(0.9, "--min-accuracy", help="Accuracy bar for picking the fastest cell"),
+) -> None:
+    """Run the models x presets x prompts grid over the gold papers and tabulate accuracy, tokens, tool calls and time.
+
+    Per-paper records go to <output>/benchmark_runs.jsonl, the per-cell table to <output>/benchmark.csv.
+    """
+    from cfst_extractor.benchmark import (
+        GOLD_DIR,
+        best_cell,
+        build_grid,
+        match_gold,
+        run_benchmark,
+        table_markdown,
+    )
+
+    root, gold_dir = Path(parsed_root), Path(gold) if gold else GOLD_DIR
+    for path in (root, gold_dir):
+        if not path.is_dir():
+            typer.echo(f"Error: Directory {path} does not exist.")
+            raise typer.Exit(1)
+    prompt_paths = [Path(p) for p in prompts or []]
+    for p in prompt_paths:
+        if not p.is_file():
+            typer.echo(f"Error: Prompt file {p} does not exist.")
+            raise typer.Exit(1)
+
+    pairs = match_gold(gold_dir, _discover_papers(root))
+    if not pairs:
+        typer.echo(f"No parsed directories in {parsed_root} match the gold files in {gold_dir}")
+        raise typer.Exit(1)
+
+    cells = build_grid(models or [], platforms or [], prompt_paths)
+    out_dir = Path(output)
+    cache = None if no_cache else Path(cache_dir) if cache_dir else out_dir / ".response_cache"
+    typer.echo(f"Benchmarking {len(cells)} configurations x {len(pairs)} gold papers ({workers} workers)")
+    try:
+        rows = asyncio.run(run_benchmark(cells, pairs, out_dir, workers=workers, cache_dir=cache))
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+    typer.echo("\n" + table_markdown(rows))
+    best = best_cell(rows, min_accuracy)
+    if best:
+        typer.secho(f"\nFastest cell with accuracy >= {min_accuracy}: {best['cell']} "
+                    f"({best['total_paper_seconds']}s, accuracy {best['accuracy']})", fg=typer.colors.GREEN)
+    else:
+        typer.echo(f"\nNo cell reached accuracy {min_accuracy} without failures")
+
+
+@app.command()
+def profile(
+    trace: str = typer.Argument("output/batch_trace.json", help="Trace JSON written by `batch --trace`"),
+) -> None:
+    """Summarize a batch trace: busy/idle time per worker, where it went, and the critical path."""
+    import json
+
+    from cfst_extractor.tracing import summarize_trace
+
+    path = Path(trace)
+    if not path.is_file():
+        typer.echo(f"Error: Trace file {trace} does not exist.")
+        raise typer.Exit(1)
+
+    summary = summarize_trace(json.loads(path.read_text(encoding="utf-8")))
+    queue = summary["queue"]
+    typer.echo(f"Wall time {summary['wall_s']}s over {len(summary['workers'])} workers")
+    if queue:
+        typer.echo(f"Queue wait: {queue['total_wait_s']}s total over {queue['papers']} papers (max {queue['max_wait_s']}s)")
+
+    columns = ("papers", "busy_s", "idle_s", "model_s", "tool_s", "rewrite_s", "write_s", "other_s")
+    typer.echo("\n" + f"{'worker':>6} " + " ".join(f"{c:>10}" for c in columns))
+    for worker, w in summary["workers"].items():
+        typer.echo(f"{worker:>6} " + " ".join(f"{w[c]:>10}" for c in columns))
+
+    critical = summary["critical_path"]
+    if critical:
+        typer.echo(
+            f"\nCritical path: worker {critical['worker']} (ends at {critical['end_s']}s; "
+            f"model {critical['model_s']}s, tools {critical['tool_s']}s, rewrite {critical['rewrite_s']}s, "
+            f"writes {critical['write_s']}s, other {critical['other_s']}s, idle {critical['idle_s']}s)"
+        )
+        for p in critical["papers"]:
+            typer.echo(f"  {p['start_s']:>9.2f}s  +{p['dur_s']:<9.2f} {p['paper']}")
+
+
+def _write_summary(
+    parsed_dirs: list[Path], results_raw: list, writer: OutputWriter, run_stats: dict[str, dict]
+) -> None:
+    """汇总批处理结果 (含每篇论文的运行统计) 并写出 batch_summary.json。"""
     summary = {
         "total_papers": len(parsed_dirs),
         "valid_papers": 0,
         "invalid_papers": 0,
         "total_specimens": 0,
+        "over_budget_papers": 0,
+        "usage": {"input_tokens": 0, "cached_input_tokens": 0, "uncached_input_tokens": 0, "output_tokens": 0},
         "papers": {}
     }
 
@@ -138,9 +635,16 @@ def batch(
             summary["papers"][doc_name] = {
                 "status": "success" if count > 0 else "empty",
                 "specimens": count,
-                "notes": getattr(result, 'reason', None) if count == 0 else None
+                "notes": getattr(result, 'reason', None) if count == 0 else None,
+                **run_stats.get(doc_name, {}),
             }
             summary["total_specimens"] += count
+            if summary["papers"][doc_name]["status"] in (
+                "timeout", "turn_budget_exceeded", "tool_budget_exceeded"
+            ):
+                summary["over_budget_papers"] += 1
+            for key in summary["usage"]:
+                summary["usage"][key] += run_stats.get(doc_name, {}).get(key, 0)
             
             if count > 0:
                 summary["valid_papers"] += 1
@@ -151,10 +655,55 @@ def batch(
                 typer.echo(f"  INVALID {doc_name}: {getattr(result, 'reason', 'Unknown reason')}")
 
     typer.echo(f"\nBatch Summary: {summary['total_papers']} papers, {summary['valid_papers']} valid, {summary['total_specimens']} specimens")
+    if summary["over_budget_papers"]:
+        typer.echo(f"Timed out / over budget: {summary['over_budget_papers']} papers")
+
+    # 多模型提取未达成一致的论文，逐试件差异见 papers.<name>.consensus.comparisons
+    no_consensus = sorted(
+        name for name, p in summary["papers"].items() if "consensus" in p and p["consensus"]["agreed"] is None
+    )
+    if no_consensus:
+        summary["consensus_review"] = no_consensus
+        typer.echo(f"No model consensus (needs review): {', '.join(no_consensus)}")
+
+    tool_profiles = [p["tools"] for p in summary["papers"].values() if p.get("tools")]
+    if tool_profiles:
+        from cfst_extractor.agent.governor import merge_profiles
+
+        summary["tools"] = merge_profiles(tool_profiles)
+        for name, p in summary["tools"].items():
+            typer.echo(
+                f"  tool {name}: {p['calls']} calls, {p['duplicates']} duplicates, "
+                f"{p['bytes'] // 1024}KB returned, latency {p['histogram']}"
+            )
+    usage = summary["usage"]
+    typer.echo(
+        f"Input tokens: {usage['input_tokens']} "
+        f"(cached {usage['cached_input_tokens']}, uncached {usage['uncached_input_tokens']}), "
+        f"output tokens: {usage['output_tokens']}"
+    )
+
+    timed = [
+        (p["predicted_seconds"], p["seconds"])
+        for p in summary["papers"].values()
+        if "predicted_seconds" in p and "seconds" in p
+    ]
+    if timed:
+        from cfst_extractor.scheduling import calibration_scale
+
+        scale = calibration_scale(timed)
+        summary["schedule"] = {
+            "predicted_seconds": round(sum(p for p, _ in timed), 2),
+            "actual_seconds": round(sum(a for _, a in timed), 2),
+            "calibration_scale": round(scale, 3) if scale is not None else None,
+        }
+        typer.echo(
+            f"Cost model: predicted {summary['schedule']['predicted_seconds']}s vs actual "
+            f"{summary['schedule']['actual_seconds']}s "
+            f"(actual ≈ {summary['schedule']['calibration_scale']} × predicted)"
+        )
 
-    summary_path = out_dir / "batch_summary.json"
-    with open(summary_path, "w", encoding="utf-8") as f:
-        json.dump(summary, f, indent=2)
+    writer.write_json("batch_summary.json", summary)
 
 
 if __name__ == "__main__":
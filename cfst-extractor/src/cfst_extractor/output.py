@@ -0,0 +1,125 @@
+"""结果写出：原子替换、紧凑序列化、JSON Lines 语料文件与 fsync 追加。
+
+所有输出文件都先写入同目录临时文件、fsync 后 os.replace 为目标文件，崩溃或并发 worker 不会留下
+半截 JSON。追加型文件 (语料 JSONL、批处理进度) 每条记录以一次 O_APPEND write 写入并 fsync，
+读者只会看到完整的行。
+
+序列化格式：
+    pretty  → 缩进 2 的 JSON (默认，便于人工查看)
+    compact → 无缩进 JSON，文件更小、解析更快
+pretty 始终由 pydantic / 标准库 json 生成，输出与是否安装 orjson 无关；compact 在安装了 orjson
+(`pip install cfst-extractor[fast]`) 时用 orjson 序列化，否则回退到 pydantic / 标准库 json。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from cfst_extractor.tracing import span
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+FORMATS = ("pretty", "compact")
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """写入同目录临时文件、fsync 后原子替换目标文件。"""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with span(path.name, "write", bytes=len(data)), open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def append_line(path: Path, data: bytes) -> None:
+    """以一次 O_APPEND 写入追加一行并 fsync (data 不含换行符)。"""
+    with span(path.name, "write", bytes=len(data) + 1):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            line = data + b"\n"
+            written = 0
+            while written < len(line):
+                written += os.write(fd, line[written:])
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def dumps(obj: Any, fmt: str = "pretty") -> bytes:
+    """序列化 JSON 兼容对象。"""
+    if fmt == "pretty":
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dump_model(model: Any, fmt: str = "pretty") -> bytes:
+    """序列化 pydantic 模型 (如 PaperExtraction)。"""
+    if fmt == "pretty":
+        return model.model_dump_json(indent=2).encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(model.model_dump(mode="json"))
+    return model.model_dump_json().encode("utf-8")
+
+
+class OutputWriter:
+    """把每篇论文的结果写入 out_dir/<paper>.json，可选同时追加到语料文件 corpus.jsonl。"""
+
+    def __init__(self, out_dir: Path, fmt: str = "pretty", corpus: bool = False):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown output format {fmt!r} (expected one of {FORMATS})")
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.corpus_path = out_dir / "corpus.jsonl" if corpus else None
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+    def paper_path(self, name: str) -> Path:
+        return self.out_dir / f"{name}.json"
+
+    def partial_path(self, name: str) -> Path:
+        return self.out_dir / f"{name}.partial.jsonl"
+
+    def write_paper(self, name: str, result: Any) -> Path:
+        path = self.paper_path(name)
+        atomic_write_bytes(path, dump_model(result, self.fmt))
+        self.partial_path(name).unlink(missing_ok=True)
+        self.append_corpus(name, result)
+        return path
+
+    def partial_recorder(self, name: str) -> Callable[[str, Any], None]:
+        """流式提取的试件回调：每个通过校验的试件追加一行到 <paper>.partial.jsonl，最终结果写出后删除。"""
+        path = self.partial_path(name)
+        path.unlink(missing_ok=True)
+
+        def _record(group: str, specimen: Any) -> None:
+            append_line(path, dumps({"group": group, **specimen.model_dump(mode="json")}, "compact"))
+
+        return _record
+
+    def append_corpus(self, name: str, result: Any) -> None:
+        """启用语料文件时，把结果作为一行追加到 corpus.jsonl。"""
+        if self.corpus_path is not None:
+            append_line(self.corpus_path, dumps({"paper": name, **result.model_dump(mode="json")}, "compact"))
+
+    def append_record(self, filename: str, record: dict) -> None:
+        """向 out_dir 下的 JSON Lines 文件追加一条记录 (如批处理进度)。"""
+        append_line(self.out_dir / filename, dumps(record, "compact"))
+
+    def write_json(self, filename: str, obj: Any) -> Path:
+        path = self.out_dir / filename
+        atomic_write_bytes(path, dumps(obj, self.fmt))
+        return path
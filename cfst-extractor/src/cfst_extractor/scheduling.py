@@ -0,0 +1,71 @@
+"""批处理调度：在调用模型之前估计每篇论文的处理成本，按"最长优先"派发。
+
+按字母序派发时，一篇排在末尾的长篇论文 (如 200 页的学位论文) 会独自决定整批的完成时间，
+其余 worker 空闲等待。先派发最昂贵的论文可在相同 worker 数下缩短总耗时 (makespan)。
+
+成本模型只使用无需 LLM 调用即可获得的特征：Markdown 字符数、表格数与图片数。
+批处理结束后用实际耗时拟合一个比例系数，用于校准下方的经验权重。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from cfst_extractor.agent.tools import find_main_markdown
+
+_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp"}
+
+# 经验权重 (秒)：每篇固定开销 + 每千字符 + 每张表格 + 每张图片
+BASE_SECONDS = 30.0
+SECONDS_PER_KCHAR = 1.0
+SECONDS_PER_TABLE = 15.0
+SECONDS_PER_IMAGE = 0.5
+
+
+@dataclass
+class PaperCost:
+    """一篇论文在调用模型前可得的成本特征。"""
+
+    paper_dir: Path
+    md_chars: int
+    tables: int
+    images: int
+
+    @property
+    def predicted_seconds(self) -> float:
+        return (
+            BASE_SECONDS
+            + SECONDS_PER_KCHAR * self.md_chars / 1000
+            + SECONDS_PER_TABLE * self.tables
+            + SECONDS_PER_IMAGE * self.images
+        )
+
+
+def estimate_cost(paper_dir: Path) -> PaperCost:
+    """读取论文目录的 Markdown 与图片列表，估计处理成本。"""
+    main_md = find_main_markdown(paper_dir)
+    text = main_md.read_text(encoding="utf-8", errors="ignore") if main_md else ""
+    images = sum(
+        1 for f in paper_dir.rglob("*") if f.suffix.lower() in _IMAGE_SUFFIXES and f.is_file()
+    )
+    return PaperCost(
+        paper_dir=paper_dir,
+        md_chars=len(text),
+        tables=text.lower().count("<table"),
+        images=images,
+    )
+
+
+def order_longest_first(paper_dirs: list[Path]) -> list[PaperCost]:
+    """按预测成本从高到低排序 (成本相同时保持目录名顺序)。"""
+    costs = [estimate_cost(d) for d in sorted(paper_dirs)]
+    return sorted(costs, key=lambda c: c.predicted_seconds, reverse=True)
+
+
+def calibration_scale(pairs: list[tuple[float, float]]) -> float | None:
+    """对 (predicted, actual) 做过原点的最小二乘拟合，返回 actual ≈ k × predicted 中的 k。"""
+    denom = sum(p * p for p, _ in pairs)
+    if not pairs or denom == 0:
+        return None
+    return sum(p * a for p, a in pairs) / denom
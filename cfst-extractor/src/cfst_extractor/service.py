@@ -0,0 +1,320 @@
+"""本地提取服务：常驻进程持有一个预热的 Extractor，通过 HTTP (TCP 或 Unix socket) 接收提取任务。
+
+每次 `cfst-extract single` 都要重新导入并初始化 Agent；服务只初始化一次，所有客户端共享：
+- 同一个 Extractor (模型连接池、对冲延迟统计)；
+- 有界任务队列：队列满时直接返回 429，而不是无限堆积；
+- 两级优先级：interactive 任务总是先于 bulk 任务派发，且 bulk 任务最多占用
+  bulk_workers 个并发槽位，保证交互请求不会被批量任务堵住；
+- 请求合并与结果缓存：同一论文已在排队/运行时复用该任务；Markdown 未变化时直接返回缓存结果。
+
+接口 (JSON)：
+    POST /jobs               {"paper": "<parsed_root 下的目录>", "priority": "interactive|bulk", "wait": false}
+    GET  /jobs/<id>          任务状态与运行统计
+    GET  /jobs/<id>/result   结果 (未完成时返回 202)
+    GET  /health             队列深度与并发情况
+
+HTTP 实现只覆盖上述接口所需的最小子集 (每个连接一个请求)，不引入额外的 Web 框架依赖。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from cfst_extractor.agent.tools import find_main_markdown
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("interactive", "bulk")
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class QueueFull(RuntimeError):
+    """任务队列已满。"""
+
+
+@dataclass
+class Job:
+    """一个提取任务。"""
+
+    id: str
+    paper_dir: Path
+    priority: str
+    status: str = "queued"  # queued | running | done | failed
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: dict | None = None
+    error: str | None = None
+    stats: dict = field(default_factory=dict)
+    cached: bool = False
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def describe(self) -> dict:
+        return {
+            "id": self.id,
+            "paper": self.paper_dir.name,
+            "priority": self.priority,
+            "status": self.status,
+            "cached": self.cached,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "stats": self.stats,
+        }
+
+
+def _paper_signature(paper_dir: Path) -> tuple | None:
+    """结果缓存键：主 Markdown 的路径、大小与修改时间。"""
+    main_md = find_main_markdown(paper_dir)
+    if main_md is None:
+        return None
+    st = main_md.stat()
+    return str(main_md), st.st_size, st.st_mtime_ns
+
+
+class ExtractionService:
+    """共享一个 Extractor 的有界、分优先级任务队列。"""
+
+    def __init__(
+        self,
+        extractor: Any,
+        parsed_root: Path,
+        workers: int = 3,
+        bulk_workers: int | None = None,
+        max_queue: int = 100,
+        cache_size: int = 256,
+        keep_jobs: int = 1000,
+    ):
+        self.extractor = extractor
+        self.parsed_root = parsed_root.resolve()
+        self.workers = workers
+        # 默认为 interactive 预留一个槽位
+        self.bulk_workers = bulk_workers if bulk_workers is not None else max(workers - 1, 1)
+        self.max_queue = max_queue
+        self.cache_size = cache_size
+        self.keep_jobs = keep_jobs
+
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self._queues: dict[str, deque[Job]] = {p: deque() for p in PRIORITIES}
+        self._active: dict[str, Job] = {}  # 论文目录 → 排队/运行中的任务 (请求合并)
+        self._cache: OrderedDict[tuple, dict] = OrderedDict()
+        self._running = {p: 0 for p in PRIORITIES}
+        self._cond = asyncio.Condition()
+        self._tasks: list[asyncio.Task] = []
+
+    # -- 任务管理 -------------------------------------------------------------
+
+    def resolve_paper(self, paper: str) -> Path:
+        """把客户端给出的目录名解析为 parsed_root 下的论文目录，拒绝越界路径。"""
+        paper_dir = (self.parsed_root / paper).resolve()
+        if not paper_dir.is_relative_to(self.parsed_root) or paper_dir == self.parsed_root:
+            raise ValueError(f"paper must be a directory under {self.parsed_root}")
+        if not paper_dir.is_dir():
+            raise FileNotFoundError(f"paper directory {paper!r} does not exist")
+        return paper_dir
+
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    async def submit(self, paper_dir: Path, priority: str = "interactive") -> Job:
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}")
+
+        active = self._active.get(str(paper_dir))
+        if active is not None:
+            # 同一论文已在排队：interactive 请求把它提升到交互队列
+            if priority == "interactive" and active.priority == "bulk" and active.status == "queued":
+                self._queues["bulk"].remove(active)
+                active.priority = "interactive"
+                self._queues["interactive"].append(active)
+            return active
+
+        job = Job(id=uuid.uuid4().hex[:12], paper_dir=paper_dir, priority=priority)
+        signature = _paper_signature(paper_dir)
+        if signature is not None and signature in self._cache:
+            self._cache.move_to_end(signature)
+            job.status, job.result, job.cached = "done", self._cache[signature], True
+            job.finished_at = time.time()
+            job.done.set()
+            self._remember(job)
+            return job
+
+        if self.queued() >= self.max_queue:
+            raise QueueFull(f"job queue is full ({self.max_queue} queued)")
+        self._remember(job)
+        self._active[str(paper_dir)] = job
+        async with self._cond:
+            self._queues[priority].append(job)
+            self._cond.notify_all()
+        return job
+
+    def _remember(self, job: Job) -> None:
+        self.jobs[job.id] = job
+        # 只淘汰已结束的旧任务
+        while len(self.jobs) > self.keep_jobs:
+            oldest = next((j for j in self.jobs.values() if j.status in ("done", "failed")), None)
+            if oldest is None:
+                break
+            del self.jobs[oldest.id]
+
+    def _next_job(self) -> Job | None:
+        if self._queues["interactive"]:
+            return self._queues["interactive"].popleft()
+        if self._queues["bulk"] and self._running["bulk"] < self.bulk_workers:
+            return self._queues["bulk"].popleft()
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(self._peek_ready)
+                job = self._next_job()
+                self._running[job.priority] += 1
+            await self._run(job)
+            async with self._cond:
+                self._running[job.priority] -= 1
+                self._cond.notify_all()
+
+    def _peek_ready(self) -> bool:
+        return bool(self._queues["interactive"]) or (
+            bool(self._queues["bulk"]) and self._running["bulk"] < self.bulk_workers
+        )
+
+    async def _run(self, job: Job) -> None:
+        job.status, job.started_at = "running", time.time()
+        signature = _paper_signature(job.paper_dir)
+        try:
+            res = await self.extractor.extract(job.paper_dir)
+            job.result = res.model_dump(mode="json")
+            job.status = "done"
+            # 只缓存成功的结果：超时或失败的论文下次提交时重新提取
+            if signature is not None and res.is_valid:
+                self._cache[signature] = job.result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        except Exception as e:
+            # Extractor 已把可预期的失败 (超时、模型/网络错误) 转成失败结果；走到这里的是程序错误，
+            # 记录完整堆栈后标记任务失败，不让它带走 worker 协程
+            logger.exception("job %s (%s) crashed", job.id, job.paper_dir.name)
+            job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            job.finished_at = time.time()
+            job.stats = self.extractor.run_stats.pop(job.paper_dir.name, {})
+            self._active.pop(str(job.paper_dir), None)
+            job.done.set()
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def health(self) -> dict:
+        return {
+            "workers": self.workers,
+            "bulk_workers": self.bulk_workers,
+            "queued": {p: len(q) for p, q in self._queues.items()},
+            "running": dict(self._running),
+            "max_queue": self.max_queue,
+            "cached_results": len(self._cache),
+        }
+
+    # -- HTTP -----------------------------------------------------------------
+
+    async def handle(self, method: str, path: str, body: bytes) -> tuple[int, Any]:
+        """路由一个请求，返回 (状态码, JSON 可序列化的响应体)。"""
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+        if parts == ["health"] and method == "GET":
+            return 200, self.health()
+
+        if parts == ["jobs"]:
+            if method != "POST":
+                return 405, {"error": "use POST /jobs"}
+            try:
+                payload = json.loads(body or b"{}")
+                if not isinstance(payload, dict):
+                    return 400, {"error": "request body must be a JSON object"}
+                paper_dir = self.resolve_paper(str(payload["paper"]))
+                job = await self.submit(paper_dir, payload.get("priority", "interactive"))
+            except KeyError:
+                return 400, {"error": "missing field 'paper'"}
+            except (ValueError, FileNotFoundError) as e:
+                return (404 if isinstance(e, FileNotFoundError) else 400), {"error": str(e)}
+            except QueueFull as e:
+                return 429, {"error": str(e)}
+            if payload.get("wait"):
+                await job.done.wait()
+                return (200 if job.status == "done" else 500), {**job.describe(), "result": job.result}
+            return 202, job.describe()
+
+        if len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return 404, {"error": f"unknown job {parts[1]}"}
+            if len(parts) == 2:
+                return 200, job.describe()
+            if parts[2] == "result":
+                if job.status == "failed":
+                    return 500, {"error": job.error}
+                if job.status != "done":
+                    return 202, job.describe()
+                return 200, job.result
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers: dict[str, str] = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+            if len(request_line) < 2:
+                status, payload = 400, {"error": "malformed request line"}
+            else:
+                try:
+                    status, payload = await self.handle(request_line[0].upper(), request_line[1], body)
+                except Exception:
+                    logger.exception("unhandled error for %s %s", request_line[0], request_line[1])
+                    status, payload = 500, {"error": "internal server error"}
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + data
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, socket_path: str | None = None) -> None:
+        """启动 worker 并监听 TCP 端口 (或 Unix socket)，直到被取消。"""
+        self.start()
+        if socket_path:
+            server = await asyncio.start_unix_server(self._serve_connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(self._serve_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
@@ -0,0 +1,214 @@
+"""面向全库分析的列式试件表。
+
+PaperExtraction 中每个试件都是一个完整的 pydantic SpecimenBase 对象，fc_type、source_evidence
+等字符串逐行重复。数万个试件做全库校验或与设计规范对比时，逐对象遍历既慢又占内存。
+SpecimenTable 把数值字段存为 float64 NumPy 数组，把字符串字段做字典编码 (int32 编码 + 类别表)，
+过滤、分组与派生指标 (D/t、L/D、套箍系数 ξ) 均为向量化运算；to_pandas() 直接复用底层数组。
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from cfst_extractor.agent.models import GROUPS, NUMERIC_FIELDS
+from cfst_extractor.agent.repair import shape_areas
+
+CATEGORICAL_FIELDS = ("paper", "group", "specimen_label", "fc_type", "source_evidence")
+
+
+@dataclass
+class Categorical:
+    """字典编码的字符串列：codes[i] 为第 i 行在 categories 中的下标。"""
+
+    codes: np.ndarray
+    categories: list[str]
+
+    @classmethod
+    def encode(cls, values: list[str]) -> Categorical:
+        index: dict[str, int] = {}
+        codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int32, count=len(values))
+        return cls(codes, list(index))
+
+    def code_of(self, value: str) -> int:
+        """类别对应的编码，不存在时返回 -1 (不匹配任何行)。"""
+        try:
+            return self.categories.index(value)
+        except ValueError:
+            return -1
+
+    def decode(self) -> np.ndarray:
+        return np.asarray(self.categories, dtype=object)[self.codes]
+
+    def take(self, index: np.ndarray) -> Categorical:
+        # 类别表在子表之间共享，不复制
+        return Categorical(self.codes[index], self.categories)
+
+
+def section_areas(group: np.ndarray, b: np.ndarray, h: np.ndarray, t: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """向量化计算钢管与核心混凝土面积 (mm²)；group 为 "Group_A/B/C" 字符串数组，公式见 repair.shape_areas。"""
+    areas = shape_areas(b, h, t)
+    conds = [group == "Group_B", group == "Group_C"]
+    steel = np.select(conds, [areas["Group_B"][0], areas["Group_C"][0]], areas["Group_A"][0])
+    core = np.select(conds, [areas["Group_B"][1], areas["Group_C"][1]], areas["Group_A"][1])
+    return steel, core
+
+
+class SpecimenTable:
+    """列式试件表。numeric 为 字段名 → float64 数组，categorical 为 字段名 → Categorical。"""
+
+    def __init__(self, numeric: dict[str, np.ndarray], categorical: dict[str, Categorical]):
+        self.numeric = numeric
+        self.categorical = categorical
+
+    # -- 构建 -----------------------------------------------------------------
+
+    @classmethod
+    def from_records(cls, rows: Iterable[tuple[str, str, dict]]) -> SpecimenTable:
+        """由 (论文名, 分组, 试件字段 dict) 序列构建。"""
+        numeric: dict[str, list[float]] = {f: [] for f in NUMERIC_FIELDS}
+        strings: dict[str, list[str]] = {f: [] for f in CATEGORICAL_FIELDS}
+        for paper, group, spec in rows:
+            for f in NUMERIC_FIELDS:
+                value = spec.get(f)
+                numeric[f].append(np.nan if value is None else float(value))
+            strings["paper"].append(paper)
+            strings["group"].append(group)
+            for f in CATEGORICAL_FIELDS[2:]:
+                strings[f].append(str(spec.get(f) or ""))
+        return cls(
+            {f: np.asarray(v, dtype=np.float64) for f, v in numeric.items()},
+            {f: Categorical.encode(v) for f, v in strings.items()},
+        )
+
+    @classmethod
+    def from_dicts(cls, papers: Iterable[tuple[str, dict]]) -> SpecimenTable:
+        """由 (论文名, PaperExtraction 的 JSON dict) 序列构建。"""
+        return cls.from_records(
+            (paper, group, spec) for paper, data in papers for group in GROUPS for spec in data.get(group) or []
+        )
+
+    @classmethod
+    def from_extractions(cls, papers: Iterable[tuple[str, object]]) -> SpecimenTable:
+        """由 (论文名, PaperExtraction) 序列构建。"""
+        return cls.from_records(
+            (paper, group, spec.model_dump())
+            for paper, extraction in papers
+            for group in GROUPS
+            for spec in getattr(extraction, group)
+        )
+
+    @classmethod
+    def from_json_dir(cls, output_dir: Path) -> SpecimenTable:
+        """读取输出目录中的全部提取结果 JSON (跳过 batch_summary.json 等非提取结果文件)。
+
+        直接解析 JSON 而不经过 pydantic 校验，避免为每个试件构造模型对象。
+        """
+
+        def _papers():
+            for path in sorted(output_dir.glob("*.json")):
+                try:
+                    data = json.loads(path.read_text(encoding="utf-8"))
+                except (OSError, json.JSONDecodeError):
+                    continue
+                if isinstance(data, dict) and any(g in data for g in GROUPS):
+                    yield path.stem, data
+
+        return cls.from_dicts(_papers())
+
+    # -- 访问与过滤 -----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.numeric["n_exp"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """数值列返回底层数组，字符串列返回解码后的 object 数组。"""
+        if name in self.numeric:
+            return self.numeric[name]
+        if name in self.categorical:
+            return self.categorical[name].decode()
+        return getattr(self, name)
+
+    def eq(self, name: str, value: str) -> np.ndarray:
+        """字符串列等值比较的布尔掩码 (只比较整数编码)。"""
+        col = self.categorical[name]
+        return col.codes == col.code_of(value)
+
+    def isin(self, name: str, values: Iterable[str]) -> np.ndarray:
+        col = self.categorical[name]
+        return np.isin(col.codes, [col.code_of(v) for v in values])
+
+    def filter(self, mask: np.ndarray) -> SpecimenTable:
+        """按布尔掩码或行下标取子表。"""
+        mask = np.asarray(mask)
+        index = np.flatnonzero(mask) if mask.dtype == bool else mask
+        return SpecimenTable(
+            {f: a[index] for f, a in self.numeric.items()},
+            {f: c.take(index) for f, c in self.categorical.items()},
+        )
+
+    # -- 派生指标 -------------------------------------------------------------
+
+    @property
+    def d_t(self) -> np.ndarray:
+        """径厚比 / 宽厚比 D/t (D 取 b)。"""
+        return self.numeric["b"] / self.numeric["t"]
+
+    @property
+    def l_d(self) -> np.ndarray:
+        """长细比 L/D (D 取 b)。"""
+        return self.numeric["L"] / self.numeric["b"]
+
+    def areas(self) -> tuple[np.ndarray, np.ndarray]:
+        """(钢管面积 As, 核心混凝土面积 Ac)，单位 mm²。"""
+        return section_areas(self["group"], self.numeric["b"], self.numeric["h"], self.numeric["t"])
+
+    @property
+    def confinement_factor(self) -> np.ndarray:
+        """套箍系数 ξ = As·fy / (Ac·fc)。"""
+        steel, core = self.areas()
+        return steel * self.numeric["fy"] / (core * self.numeric["fc_value"])
+
+    @property
+    def nominal_capacity(self) -> np.ndarray:
+        """名义承载力 N0 = As·fy + Ac·fc (kN)。"""
+        steel, core = self.areas()
+        return (steel * self.numeric["fy"] + core * self.numeric["fc_value"]) / 1000
+
+    # -- 分组 -----------------------------------------------------------------
+
+    def group_by(self, name: str, values: np.ndarray | str) -> dict[str, dict[str, float]]:
+        """按字符串列分组，对数值列 (或派生数组) 计算 count/mean/min/max (忽略 NaN)。"""
+        col = self.categorical[name]
+        data = np.asarray(self[values] if isinstance(values, str) else values, dtype=np.float64)
+        valid = ~np.isnan(data)
+        codes, data = col.codes[valid], data[valid]
+        n = len(col.categories)
+        counts = np.bincount(codes, minlength=n)
+        sums = np.bincount(codes, weights=data, minlength=n)
+        mins = np.full(n, np.inf)
+        maxs = np.full(n, -np.inf)
+        np.minimum.at(mins, codes, data)
+        np.maximum.at(maxs, codes, data)
+        return {
+            cat: {"count": int(counts[i]), "mean": sums[i] / counts[i], "min": mins[i], "max": maxs[i]}
+            for i, cat in enumerate(col.categories)
+            if counts[i]
+        }
+
+    # -- 转换 -----------------------------------------------------------------
+
+    def to_pandas(self):
+        """转换为 pandas DataFrame：数值列不复制，字符串列转为共享编码的 pandas Categorical。"""
+        import pandas as pd
+
+        columns = {
+            f: pd.Categorical.from_codes(c.codes, categories=c.categories)
+            for f, c in self.categorical.items()
+        }
+        columns.update(self.numeric)
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,210 @@
+"""批处理时间线追踪：记录每篇论文、模型请求、工具调用、请求体改写与文件写出的时间区间 (span)。
+
+多个 worker 并发、工具调用与模型回合交错时，单看 batch_summary.json 无法判断墙钟时间花在哪里：
+排队等待信号量、提供商延迟、inspect_image 中的 Pillow 处理、_patched_send 中的 JSON 改写还是文件写出。
+启用追踪后 (batch --trace)，各处的 span(...) 连同当前 worker 与论文编号被记录下来，导出为：
+    <output>/batch_trace.json  → Chrome / Perfetto trace-event 格式 (chrome://tracing、ui.perfetto.dev)
+    <output>/batch_trace.csv   → 扁平表格，便于用 pandas / 表格软件分析
+`cfst-extract profile batch_trace.json` 汇总每个 worker 的忙碌/空闲时间与决定总耗时的关键路径。
+
+未启用追踪时 span() 返回共享的空上下文，开销可以忽略。
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+# span 类别：paper 为单篇论文的完整处理，其余类别嵌套在 paper 之内；wait 为排队等待 worker
+CATEGORIES = ("paper", "wait", "model", "tool", "rewrite", "write")
+TRACE_FILE = "batch_trace.json"
+TRACE_CSV = "batch_trace.csv"
+
+# 当前任务所属的 worker 与论文 (由 batch 在派发论文时设置)
+trace_context: ContextVar[dict | None] = ContextVar("trace_context", default=None)
+
+_NULL_SPAN = nullcontext()
+_tracer: Tracer | None = None
+
+
+@dataclass
+class Span:
+    name: str
+    cat: str
+    start_us: float
+    dur_us: float
+    worker: int | None
+    paper: str | None
+    args: dict[str, Any] = field(default_factory=dict)
+
+
+class Tracer:
+    """收集 span；时间戳为相对追踪开始的微秒数。"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: list[Span] = []
+
+    def now_us(self) -> float:
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def record(self, name: str, cat: str, start_us: float, end_us: float, args: dict[str, Any]) -> None:
+        ctx = trace_context.get() or {}
+        # list.append 在 GIL 下是原子的：工具线程与事件循环可以同时记录
+        self.spans.append(Span(name, cat, start_us, end_us - start_us, ctx.get("worker"), ctx.get("paper"), args))
+
+    def chrome_trace(self) -> dict:
+        """Chrome trace-event JSON：每个 worker 一条轨道 (pid 1)，排队等待按论文各占一条轨道 (pid 2)。"""
+        papers = sorted({s.paper for s in self.spans if s.worker is None and s.paper})
+        queue_tids = {paper: i + 1 for i, paper in enumerate(papers)}
+        events: list[dict] = [
+            {"ph": "M", "name": "process_name", "pid": 1, "tid": 0, "args": {"name": "workers"}},
+            {"ph": "M", "name": "process_name", "pid": 2, "tid": 0, "args": {"name": "queue"}},
+        ]
+        for worker in sorted({s.worker for s in self.spans if s.worker is not None}):
+            events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": worker + 1,
+                           "args": {"name": f"worker {worker}"}})
+        for paper, tid in queue_tids.items():
+            events.append({"ph": "M", "name": "thread_name", "pid": 2, "tid": tid, "args": {"name": paper}})
+
+        for s in self.spans:
+            pid, tid = (1, s.worker + 1) if s.worker is not None else (2, queue_tids.get(s.paper, 0))
+            events.append({
+                "name": s.name, "cat": s.cat, "ph": "X", "ts": round(s.start_us, 1), "dur": round(s.dur_us, 1),
+                "pid": pid, "tid": tid, "args": {"worker": s.worker, "paper": s.paper, **s.args},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def csv_bytes(self) -> bytes:
+        buf = io.StringIO()
+        w = csv.writer(buf, lineterminator="\n")
+        w.writerow(["name", "cat", "worker", "paper", "start_ms", "dur_ms", "args"])
+        for s in sorted(self.spans, key=lambda s: s.start_us):
+            w.writerow([
+                s.name, s.cat, "" if s.worker is None else s.worker, s.paper or "",
+                round(s.start_us / 1000, 3), round(s.dur_us / 1000, 3),
+                json.dumps(s.args, ensure_ascii=False, default=str) if s.args else "",
+            ])
+        return buf.getvalue().encode("utf-8")
+
+    def export(self, out_dir: Path) -> tuple[Path, Path]:
+        """写出 batch_trace.json 与 batch_trace.csv。"""
+        from cfst_extractor.output import atomic_write_bytes
+
+        json_path, csv_path = out_dir / TRACE_FILE, out_dir / TRACE_CSV
+        atomic_write_bytes(json_path, json.dumps(self.chrome_trace(), ensure_ascii=False, default=str).encode("utf-8"))
+        atomic_write_bytes(csv_path, self.csv_bytes())
+        return json_path, csv_path
+
+
+def start_tracing() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing() -> Tracer | None:
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+@contextmanager
+def traced(worker: int | None = None, paper: str | None = None):
+    """在当前任务 (及其创建的子任务、工具线程) 中标记所属的 worker 与论文。"""
+    token = trace_context.set({"worker": worker, "paper": paper})
+    try:
+        yield
+    finally:
+        trace_context.reset(token)
+
+
+@contextmanager
+def _span(tracer: Tracer, name: str, cat: str, args: dict[str, Any]):
+    start = tracer.now_us()
+    try:
+        yield
+    finally:
+        tracer.record(name, cat, start, tracer.now_us(), args)
+
+
+def span(name: str, cat: str, **args: Any):
+    """记录一段时间区间；未启用追踪时不做任何事。同步与异步代码中都可以用 with 包裹。"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _span(_tracer, name, cat, args)
+
+
+def _union(intervals: list[tuple[float, float]]) -> float:
+    """区间并集的总长度：重叠部分只计一次。"""
+    total, end = 0.0, float("-inf")
+    for lo, hi in sorted(intervals):
+        if hi > end:
+            total += hi - max(lo, end)
+            end = hi
+    return total
+
+
+def summarize_trace(trace: dict) -> dict:
+    """由 Chrome trace-event JSON 汇总每个 worker 的忙碌/空闲时间、各类别耗时与关键路径 (单位：秒)。
+
+    `<类别>_s` (model_s、tool_s …) 是该 worker 上至少有一个该类别 span 进行中的墙钟时间，即各 span
+    区间的并集，而不是各 span 时长之和：流式请求、对冲请求、consensus 多模型等并发的模型调用
+    重叠部分只计一次，因此不会超过 busy_s。other_s 为忙碌时间中不被任何类别覆盖的部分。
+    关键路径取最后结束的 worker：批处理总耗时由它上面依次处理的论文决定。
+    """
+    events = [e for e in trace.get("traceEvents", []) if e.get("ph") == "X"]
+    if not events:
+        return {"wall_s": 0.0, "workers": {}, "queue": {}, "critical_path": None}
+    start = min(e["ts"] for e in events)
+    wall = max(e["ts"] + e["dur"] for e in events) - start
+
+    def sec(us: float) -> float:
+        return round(us / 1e6, 3)
+
+    workers: dict[int, dict] = {}
+    waits: list[float] = []
+    for e in events:
+        worker = e.get("args", {}).get("worker")
+        if e["cat"] == "wait":
+            waits.append(e["dur"])
+        if worker is None:
+            continue
+        w = workers.setdefault(worker, {"papers": [], "busy": 0.0, "end": 0.0, **{c: [] for c in CATEGORIES[2:]}})
+        if e["cat"] == "paper":
+            w["papers"].append({"paper": e["name"], "start_s": sec(e["ts"] - start), "dur_s": sec(e["dur"])})
+            w["busy"] += e["dur"]
+            w["end"] = max(w["end"], e["ts"] + e["dur"] - start)
+        elif e["cat"] in w:
+            w[e["cat"]].append((e["ts"], e["ts"] + e["dur"]))
+
+    summary: dict[int, dict] = {}
+    for worker, w in sorted(workers.items()):
+        attributed = _union([iv for c in CATEGORIES[2:] for iv in w[c]])
+        summary[worker] = {
+            "papers": len(w["papers"]),
+            "busy_s": sec(w["busy"]),
+            "idle_s": sec(wall - w["busy"]),
+            "end_s": sec(w["end"]),
+            **{f"{c}_s": sec(_union(w[c])) for c in CATEGORIES[2:]},
+            "other_s": sec(max(w["busy"] - attributed, 0.0)),
+        }
+
+    critical = max(workers, key=lambda k: workers[k]["end"], default=None)
+    return {
+        "wall_s": sec(wall),
+        "workers": summary,
+        "queue": {"papers": len(waits), "total_wait_s": sec(sum(waits)), "max_wait_s": sec(max(waits, default=0.0))},
+        "critical_path": None if critical is None else {
+            "worker": critical,
+            "papers": sorted(workers[critical]["papers"], key=lambda p: p["start_s"]),
+            **{k: v for k, v in summary[critical].items() if k.endswith("_s")},
+        },
+    }
@@ -0,0 +1,70 @@
+"""watch 模式：监听 parsed_root，论文解析一完成就入队提取，使提取与 MinerU 解析并行进行。
+
+MinerU 按论文逐个写出解析目录，主 Markdown 与 content_list.json 在最后写出。PaperWatcher
+以轮询方式检查尚未处理的目录：两者都存在、且大小与修改时间在相邻两次轮询间保持不变，即认为
+该论文解析完成。已处理 (或已有输出 JSON) 的目录只记录名字，此后不再访问，每次轮询的开销只与
+"新出现 / 尚未完成"的目录数成正比。
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from cfst_extractor.agent.tools import find_main_markdown
+
+
+def _stat_signature(path: Path) -> tuple[int, int]:
+    st = path.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+class PaperWatcher:
+    """增量发现 root 下解析完成的论文目录。"""
+
+    def __init__(self, root: Path, output_dir: Path):
+        self.root = root
+        self.output_dir = output_dir
+        # 目录名 → 上一次轮询时的文件签名 (等待连续两次一致)
+        self._pending: dict[str, tuple] = {}
+        # 已入队或已有输出的目录名
+        self._seen: set[str] = set()
+
+    def _bundle_signature(self, paper_dir: Path) -> tuple | None:
+        """主 Markdown 与 content_list.json 的 (大小, mtime)；任一缺失时返回 None。"""
+        main_md = find_main_markdown(paper_dir)
+        content_list = next(paper_dir.rglob("*content_list.json"), None)
+        if main_md is None or content_list is None:
+            return None
+        try:
+            return _stat_signature(main_md), _stat_signature(content_list)
+        except FileNotFoundError:
+            # 解析程序正在替换文件
+            return None
+
+    def poll(self) -> list[Path]:
+        """扫描一次 root，返回本次新确认解析完成的论文目录。"""
+        ready: list[Path] = []
+        with os.scandir(self.root) as it:
+            entries = sorted((e for e in it if e.is_dir() and not e.name.startswith(".")), key=lambda e: e.name)
+        for entry in entries:
+            name = entry.name
+            if name in self._seen:
+                continue
+            if (self.output_dir / f"{name}.json").exists():
+                self._seen.add(name)
+                continue
+            signature = self._bundle_signature(Path(entry.path))
+            if signature is None:
+                continue
+            if self._pending.get(name) == signature:
+                del self._pending[name]
+                self._seen.add(name)
+                ready.append(Path(entry.path))
+            else:
+                self._pending[name] = signature
+        return ready
+
+    def pending(self) -> list[str]:
+        """已出现文件但尚未稳定的目录名。"""
+        return sorted(self._pending)
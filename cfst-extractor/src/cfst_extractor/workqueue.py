@@ -0,0 +1,191 @@
+"""基于共享文件系统租约 (lease) 的分布式工作队列。
+
+多个 `cfst-extract worker` 进程 (可位于不同主机) 共享同一个 parsed_root 与 output 目录：
+- 认领: 在 `<output>/.leases/` 下以 O_EXCL 方式创建 `<paper>.lease`，创建成功即拥有该论文；
+- 修改: 回收、心跳、释放与发布都在 `<paper>.lease.lock` (同样以 O_EXCL 创建的短时互斥锁) 内进行，
+  先读取租约核对 token / 过期时间再 os.replace 或删除，租约文件始终留在原处，其他 worker 不会
+  在中途看到"无租约"而重复认领；
+- 回收: 锁内重新读取，仍是判定过期时的那一份才用自己的租约原子替换；
+- 发布: 锁内核对仍持有租约后原子写出结果 (临时文件 + fsync + os.replace)，再删除租约。
+持有锁的进程崩溃时，超过 _LOCK_STALE 秒的锁文件视为失效并被清除。
+
+各主机时钟需大致同步 (过期判定使用租约内记录的墙钟时间)。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from cfst_extractor.output import atomic_write_bytes
+
+# 互斥锁只在读取-改写租约的片刻持有；超过 _LOCK_STALE 秒仍在的锁属于已崩溃的进程
+_LOCK_STALE = 30.0
+_LOCK_WAIT = _LOCK_STALE + 5.0
+
+
+@dataclass
+class Lease:
+    """一个已认领论文的租约句柄。"""
+
+    paper_dir: Path
+    path: Path
+    token: str
+    expires_at: float
+
+
+class LeaseQueue:
+    """在 output 目录上协调多个 worker 的论文认领、心跳与结果发布。"""
+
+    def __init__(
+        self,
+        paper_dirs: list[Path],
+        output_dir: Path,
+        worker_id: str | None = None,
+        lease_ttl: float = 600.0,
+    ):
+        self.paper_dirs = list(paper_dirs)
+        self.output_dir = output_dir
+        self.lease_dir = output_dir / ".leases"
+        self.lease_dir.mkdir(parents=True, exist_ok=True)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+
+    def output_path(self, paper_dir: Path) -> Path:
+        return self.output_dir / f"{paper_dir.name}.json"
+
+    def _lease_path(self, paper_dir: Path) -> Path:
+        return self.lease_dir / f"{paper_dir.name}.lease"
+
+    def pending(self) -> list[Path]:
+        """尚未发布结果的论文 (无论是否被他人持有)。"""
+        return [d for d in self.paper_dirs if not self.output_path(d).exists()]
+
+    def _lease_record(self, token: str) -> dict:
+        return {
+            "token": token,
+            "worker": self.worker_id,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "expires_at": time.time() + self.lease_ttl,
+        }
+
+    def _read(self, path: Path) -> dict | None:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError):
+            # 持有者正在创建租约、尚未写完内容 (或在此期间崩溃)：按文件 mtime 计算过期
+            try:
+                return {"expires_at": path.stat().st_mtime + self.lease_ttl}
+            except FileNotFoundError:
+                return None
+
+    @contextmanager
+    def _locked(self, path: Path, wait: float = _LOCK_WAIT):
+        """持有租约的互斥锁；wait 秒内拿不到锁时抛出 TimeoutError。"""
+        lock = path.with_name(f"{path.name}.lock")
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime > _LOCK_STALE:
+                        lock.unlink(missing_ok=True)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"lease lock {lock.name} is busy") from None
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            lock.unlink(missing_ok=True)
+
+    def _reclaim(self, paper_dir: Path, seen: dict | None) -> Lease | None:
+        """回收过期租约：锁内重新读取，仍是判定过期时读到的那一份才替换为自己的租约。"""
+        path = self._lease_path(paper_dir)
+        token = uuid.uuid4().hex
+        record = self._lease_record(token)
+        try:
+            with self._locked(path, wait=0.0):
+                current = self._read(path)
+                if current is None or current != seen or current.get("expires_at", 0) > time.time():
+                    return None
+                atomic_write_bytes(path, json.dumps(record).encode("utf-8"))
+        except TimeoutError:
+            # 他人正在回收或修改该租约
+            return None
+        return Lease(paper_dir=paper_dir, path=path, token=token, expires_at=record["expires_at"])
+
+    def _try_acquire(self, paper_dir: Path) -> Lease | None:
+        path = self._lease_path(paper_dir)
+        token = uuid.uuid4().hex
+        record = self._lease_record(token)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            current = self._read(path)
+            if current is None or current.get("expires_at", 0) > time.time():
+                return None
+            lease = self._reclaim(paper_dir, current)
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+                f.flush()
+                os.fsync(f.fileno())
+            lease = Lease(paper_dir=paper_dir, path=path, token=token, expires_at=record["expires_at"])
+
+        # 认领期间结果可能刚被其他 worker 发布
+        if lease is not None and self.output_path(paper_dir).exists():
+            self.release(lease)
+            return None
+        return lease
+
+    def claim(self, exclude: set[Path] | frozenset[Path] = frozenset()) -> Lease | None:
+        """认领下一篇可处理的论文 (跳过 exclude)；当前无可认领论文时返回 None。"""
+        for paper_dir in self.pending():
+            if paper_dir in exclude:
+                continue
+            lease = self._try_acquire(paper_dir)
+            if lease is not None:
+                return lease
+        return None
+
+    def owns(self, lease: Lease) -> bool:
+        current = self._read(lease.path)
+        return current is not None and current.get("token") == lease.token
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """刷新租约过期时间；若租约已被他人回收则返回 False。"""
+        record = self._lease_record(lease.token)
+        with self._locked(lease.path):
+            if not self.owns(lease):
+                return False
+            atomic_write_bytes(lease.path, json.dumps(record).encode("utf-8"))
+        lease.expires_at = record["expires_at"]
+        return True
+
+    def release(self, lease: Lease) -> None:
+        with self._locked(lease.path):
+            if self.owns(lease):
+                lease.path.unlink(missing_ok=True)
+
+    def publish(self, lease: Lease, data: bytes) -> bool:
+        """仍持有租约时原子地发布结果并释放租约；若租约已丢失则放弃发布并返回 False。"""
+        with self._locked(lease.path):
+            if not self.owns(lease):
+                return False
+            atomic_write_bytes(self.output_path(lease.paper_dir), data)
+            lease.path.unlink(missing_ok=True)
+        return True
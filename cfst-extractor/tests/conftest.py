@@ -3,14 +3,24 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 
 import pytest
 
+# 测试中不访问真实模型：agent.py 在导入时按 CFST_MODEL 构造 Agent
+os.environ.setdefault("CFST_MODEL", "test")
+
 TESTDATA_DIR = Path(__file__).parent.parent / "testdata"
 GOLD_DIR = TESTDATA_DIR / "jsondata"
 PDF_DIR = TESTDATA_DIR / "pdfs"
 
+# 一个合理的圆形截面试件 (Group_B)，各测试按需覆盖个别字段
+SPECIMEN_FIELDS = {
+    "specimen_label": "C1", "fc_value": 40.0, "fc_type": "Cylinder", "fy": 350.0, "b": 200.0, "h": 200.0,
+    "t": 5.0, "r0": 100.0, "L": 600.0, "e1": 0.0, "e2": 0.0, "n_exp": 2500.0, "source_evidence": "Table 1",
+}
+
 
 @pytest.fixture
 def gold_dir():
@@ -35,3 +45,35 @@ def load_gold():
         with open(candidates[0], encoding="utf-8") as f:
             return json.load(f)
     return _load
+
+
+@pytest.fixture
+def specimen_fields():
+    """Factory fixture: 试件字段 dict (流式输出的原始 JSON 形式)。"""
+    def _fields(label: str, **overrides) -> dict:
+        return {**SPECIMEN_FIELDS, "specimen_label": label, **overrides}
+    return _fields
+
+
+@pytest.fixture
+def make_specimen(specimen_fields):
+    """Factory fixture: SpecimenBase。"""
+    from cfst_extractor.agent.models import SpecimenBase
+
+    def _make(label: str, **overrides):
+        return SpecimenBase(**specimen_fields(label, **overrides))
+    return _make
+
+
+@pytest.fixture
+def make_extraction():
+    """Factory fixture: 有效的 PaperExtraction；位置参数放入 Group_B，关键字参数按分组名指定。"""
+    from cfst_extractor.agent.models import PaperExtraction, RefInfo
+
+    def _make(*specimens, **groups):
+        if specimens:
+            groups["Group_B"] = list(specimens)
+        return PaperExtraction(
+            is_valid=True, reason="", ref_info=RefInfo(title="", authors=[], journal="", year=2000), **groups
+        )
+    return _make
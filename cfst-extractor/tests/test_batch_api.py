@@ -0,0 +1,145 @@
+"""Tests for the /batches round-based extraction mode against a local stand-in server."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+
+from cfst_extractor.agent.batch_api import BatchAPIClient, BatchRunner
+
+FINAL = {
+    "is_valid": True,
+    "reason": "ok",
+    "ref_info": {"title": "T", "authors": ["A"], "journal": "J", "year": 2004},
+    "Group_B": [
+        {
+            "specimen_label": "C1", "fc_value": 30.0, "fc_type": "cylinder", "fy": 300.0,
+            "b": 100.0, "h": 100.0, "t": 3.0, "r0": 50.0, "L": 300.0,
+            "e1": 0.0, "e2": 0.0, "n_exp": 1000.0, "source_evidence": "Table 1",
+        }
+    ],
+}
+
+
+def _tool_call(call_id: str, name: str, args: dict) -> dict:
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+
+
+class StandInServer:
+    """按轮次脚本化回复的最小 /files + /batches 实现。"""
+
+    def __init__(self):
+        self.files: dict[str, str] = {}
+        self.batches: dict[str, dict] = {}
+        self.rounds: list[list[dict]] = []
+
+    def _reply(self, line: dict) -> dict:
+        messages = line["body"]["messages"]
+        if not any(m["role"] == "tool" for m in messages):
+            calls = [_tool_call("c1", "tool_read_markdown", {})]
+        else:
+            calls = [_tool_call("c2", "final_result", FINAL)]
+        message = {"role": "assistant", "content": None, "tool_calls": calls}
+        return {
+            "custom_id": line["custom_id"],
+            "response": {"status_code": 200, "body": {"choices": [{"message": message}]}},
+        }
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        path = request.url.path
+        if path.endswith("/files") and request.method == "POST":
+            body = request.content.decode("utf-8")
+            start = body.index("\r\n\r\n", body.index('filename="batch.jsonl"')) + 4
+            payload = body[start:body.index("\r\n--", start)]
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = payload
+            return httpx.Response(200, json={"id": file_id})
+        if path.endswith("/batches") and request.method == "POST":
+            lines = [json.loads(x) for x in self.files[json.loads(request.content)["input_file_id"]].splitlines()]
+            self.rounds.append(lines)
+            out_id = f"file-{len(self.files)}"
+            self.files[out_id] = "\n".join(json.dumps(self._reply(x)) for x in lines)
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {"id": batch_id, "status": "completed", "output_file_id": out_id}
+            return httpx.Response(200, json={"id": batch_id, "status": "validating"})
+        if "/batches/" in path:
+            return httpx.Response(200, json=self.batches[path.rsplit("/", 1)[-1]])
+        if path.endswith("/content"):
+            return httpx.Response(200, text=self.files[path.split("/")[-2]])
+        return httpx.Response(404)
+
+
+def test_batch_runner_advances_all_papers_in_rounds(tmp_path):
+    dirs = []
+    for name in ("P1", "P2"):
+        d = tmp_path / name
+        d.mkdir()
+        (d / f"{name}.md").write_text("# Paper\n| C1 | 1000 |", encoding="utf-8")
+        dirs.append(d)
+
+    server = StandInServer()
+    client = BatchAPIClient(
+        "http://stand-in/v1", client=httpx.AsyncClient(transport=httpx.MockTransport(server.handler))
+    )
+    runner = BatchRunner(client, model="openai:test-model", poll_interval=0)
+    results = asyncio.run(runner.run(dirs))
+
+    # 两篇论文在同两轮内一起推进：第一轮读取正文，第二轮提交结果
+    assert len(server.rounds) == 2
+    assert all(len(r) == 2 for r in server.rounds)
+    assert server.rounds[0][0]["body"]["model"] == "test-model"
+    tool_msg = server.rounds[1][0]["body"]["messages"][-1]
+    assert tool_msg["role"] == "tool" and "C1" in tool_msg["content"]
+
+    assert [name for name, _ in results] == ["P1", "P2"]
+    for _, res in results:
+        assert res.is_valid is True
+        assert res.Group_B[0].specimen_label == "C1"
+        assert res.extraction_model == "openai:test-model"
+
+
+class FlakyServer(StandInServer):
+    """paper-1 收到一条没有 choices 的响应；第二轮批次以 expired 结束但仍带有 paper-0 的输出。"""
+
+    def _reply(self, line: dict) -> dict:
+        if line["custom_id"] == "paper-1":
+            return {"custom_id": "paper-1", "response": {"status_code": 200, "body": {"error": "overloaded"}}}
+        return super()._reply(line)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        resp = super().handler(request)
+        if request.url.path.endswith("/batches") and len(self.rounds) == 2:
+            self.batches[resp.json()["id"]]["status"] = "expired"
+        return resp
+
+
+def test_bad_responses_and_unfinished_batches_only_fail_their_papers(tmp_path):
+    dirs = []
+    for name in ("P1", "P2"):
+        d = tmp_path / name
+        d.mkdir()
+        (d / f"{name}.md").write_text("# Paper\n| C1 | 1000 |", encoding="utf-8")
+        dirs.append(d)
+
+    server = FlakyServer()
+    client = BatchAPIClient(
+        "http://stand-in/v1", client=httpx.AsyncClient(transport=httpx.MockTransport(server.handler))
+    )
+    runner = BatchRunner(client, poll_interval=0)
+    results = dict(asyncio.run(runner.run(dirs)))
+
+    assert [len(r) for r in server.rounds] == [2, 1]
+    assert results["P1"].is_valid is True and results["P1"].Group_B[0].specimen_label == "C1"
+    assert results["P2"].is_valid is False and "overloaded" in results["P2"].reason
+    assert runner.run_stats["P2"]["status"] == "error" and "status" not in runner.run_stats["P1"]
+
+
+def test_attached_images_keep_their_media_type():
+    from cfst_extractor.agent.tools import image_media_type
+
+    assert image_media_type(b"\x89PNG\r\n\x1a\n...", "images/t1.png") == "image/png"
+    assert image_media_type(b"\xff\xd8\xff\xe0...", "images/t1.png") == "image/jpeg"  # 已压缩为 JPEG
+    assert image_media_type(b"????", "images/t1.webp") == "image/webp"
@@ -0,0 +1,66 @@
+"""Tests for gold matching, scoring and tabulation of the benchmark grid."""
+
+from pathlib import Path
+
+from cfst_extractor.benchmark import (
+    Cell,
+    best_cell,
+    build_grid,
+    load_gold,
+    match_gold,
+    score_extraction,
+    summarize_cell,
+    table_csv,
+)
+
+
+def test_match_gold_maps_bracketed_names(tmp_path):
+    gold_dir = tmp_path / "gold"
+    gold_dir.mkdir()
+    for name in ("A[1-1]", "A[1-12]", "A[1-2]"):
+        (gold_dir / f"{name}.json").write_text("{}", encoding="utf-8")
+    papers = [Path("[A1-12] TAN, Long columns"), Path("[A1-1] SAKINO K, Behavior"), Path("notes")]
+
+    pairs = match_gold(gold_dir, papers)
+    assert [(p.name, g.stem) for p, g in pairs] == [
+        ("[A1-12] TAN, Long columns", "A[1-12]"), ("[A1-1] SAKINO K, Behavior", "A[1-1]"),
+    ]
+
+
+def test_load_gold_tolerates_raw_newlines(tmp_path):
+    path = tmp_path / "A[1-1].json"
+    path.write_text(
+        '{"is_valid": true, "reason": "line one\nline two", '
+        '"ref_info": {"title": "", "authors": [], "journal": "", "year": 2004}, "Group_B": []}',
+        encoding="utf-8",
+    )
+    assert load_gold(path).reason == "line one\nline two"
+
+
+def test_score_counts_exact_missing_and_wrong_specimens(make_specimen, make_extraction):
+    gold = make_extraction(make_specimen("C1"), make_specimen("C2"), make_specimen("C3"))
+    result = make_extraction(make_specimen("c1"), make_specimen("C2", t=4.0, n_exp=2000.0), make_specimen("X9"))
+    score = score_extraction(result, gold)
+    assert score == {
+        "gold_specimens": 3, "extracted_specimens": 3, "matched": 2, "exact": 1,
+        "field_errors": 2, "is_valid_ok": True,
+    }
+
+
+def test_grid_summary_and_fastest_cell_meeting_bar():
+    cells = build_grid(["m1", "m2"], [], [Path("prompts/v2.md")])
+    assert [c.name for c in cells] == ["m1@settings@v2", "m2@settings@v2"]
+    assert Cell("openai:gpt-4o").dirname == "openai_gpt-4o@settings@System_Prompt"
+
+    run = {"status": "ok", "seconds": 10.0, "gold_specimens": 4, "extracted_specimens": 5, "matched": 4,
+           "exact": 3, "field_errors": 2, "input_tokens": 100, "tool_calls": 3}
+    slow = summarize_cell(cells[0], [run, {**run, "seconds": 30.0}])
+    fast = summarize_cell(cells[1], [{**run, "exact": 1}, {**run, "seconds": 5.0}])
+    assert slow["accuracy"] == 0.75 and slow["recall"] == 1.0 and slow["precision"] == 0.8
+    assert slow["total_paper_seconds"] == 40.0 and slow["max_seconds"] == 30.0 and slow["tool_calls"] == 6
+    assert fast["accuracy"] == 0.5
+
+    assert best_cell([slow, fast], 0.7) is slow
+    assert best_cell([slow, fast], 0.5) is fast
+    assert best_cell([slow, fast], 0.9) is None
+    assert table_csv([slow]).decode().splitlines()[0].startswith("cell,model,platform,prompt,papers")
@@ -0,0 +1,120 @@
+"""Tests for MinerU markdown compaction."""
+
+from cfst_extractor.agent.compaction import compact_markdown, html_table_to_grid
+
+SOURCE = """# Behavior of CFST columns
+
+J. Struct. Eng. 2004, 130(2): 180
+
+Steel strength $f _ { y } = 3 0 0 \\mathrm { N / m m ^ { 2 } }$.   
+
+
+
+<html><body><table><tr><td rowspan="2">Specimen</td><td colspan="2">Size</td></tr><tr><td>D</td><td>t</td></tr><tr><td>C1</td><td>100</td><td>3.0</td></tr></table></body></html>
+
+12
+
+J. Struct. Eng. 2004, 130(2): 181
+
+Results text line.
+
+J. Struct. Eng. 2004, 130(2): 182
+
+# References
+
+1. Foo bar.
+"""
+
+
+def test_html_table_spans_are_expanded():
+    grid = html_table_to_grid(
+        '<table><tr><td rowspan="2">Specimen</td><td colspan="2">Size</td></tr>'
+        "<tr><td>D</td><td>t</td></tr><tr><td>C1</td><td>100</td><td>3.0</td></tr></table>"
+    )
+    assert grid == [["Specimen", "Size", "Size"], ["Specimen", "D", "t"], ["C1", "100", "3.0"]]
+
+
+def test_compaction_drops_noise_and_shrinks_tokens():
+    c = compact_markdown(SOURCE)
+    assert "C1|100|3.0" in c.text
+    assert "<table" not in c.text
+    assert "f_y=300MPa" in c.text
+    assert "References" not in c.text and "Foo bar" not in c.text
+    # 重复页眉只保留第一次出现，纯页码行被删除
+    assert c.text.count("J. Struct. Eng.") == 1
+    assert "\n12\n" not in c.text
+    assert "\n\n\n" not in c.text
+    assert c.tokens_after < c.tokens_before
+
+
+def test_offsets_map_back_to_source():
+    c = compact_markdown(SOURCE)
+    start, end = c.locate("Results text")
+    assert SOURCE[start:end] == "Results text"
+    start, end = c.locate("C1|100|3.0")
+    assert SOURCE[start:end].startswith("<html><body><table>")
+    assert SOURCE[start:end].endswith("</table></body></html>")
+
+
+def test_only_whole_reference_headings_are_dropped():
+    source = (
+        "# 3 Reference specimens\n\nR1 is the reference column.\n\n"
+        "# Acknowledged limitations\n\nSmall scale only.\n\n"
+        "# 7.1 Acknowledgements\n\nThanks to the lab.\n\n"
+        "# 8. References\n\n"
+        "<table><tr><td>Specimen</td><td>N</td></tr><tr><td>C9</td><td>1200</td></tr></table>\n\n"
+        "# 9 References\n\n1. Foo bar.\n"
+    )
+    text = compact_markdown(source).text
+    assert "R1 is the reference column." in text
+    assert "Small scale only." in text
+    assert "Thanks to the lab." not in text
+    # 含表格的章节即使标题命中也保留
+    assert "C9|1200" in text
+    assert "Foo bar" not in text
+
+
+BODY = """Test results
+
+$$
+N_u = A_s f_y + A_c f_c
+$$
+
+where
+$N_u$ is the ultimate load.
+
+Series 1
+
+$$
+\\lambda = L / D
+$$
+
+where
+$L$ is the column length.
+
+Series 2
+
+$$
+\\xi = A_s f_y / (A_c f_c)
+$$
+
+where
+$\\xi$ is the confinement factor.
+
+Series 3
+"""
+
+
+def test_repeated_body_lines_and_math_delimiters_are_kept():
+    c = compact_markdown(BODY)
+    assert c.text.count("$$") == 6
+    assert c.text.count("where") == 3
+    assert all(f"Series {n}" in c.text for n in (1, 2, 3))
+
+
+def test_evidence_maps_back_through_table_rows():
+    c = compact_markdown(SOURCE)
+    offsets = c.evidence_offsets([("C1", "Table 1"), ("X9", "not quoted anywhere")])
+    start, end = offsets["C1"]
+    assert SOURCE[start:end].startswith("<html><body><table>")
+    assert "X9" not in offsets
@@ -0,0 +1,80 @@
+"""Tests for specimen-level comparison and multi-model early consensus."""
+
+import asyncio
+
+from cfst_extractor.agent.consensus import compare_extractions
+from cfst_extractor.agent.extractor import Extractor
+
+
+def test_compare_within_tolerance_agrees(make_specimen, make_extraction):
+    a = make_extraction(make_specimen("C1"), make_specimen("C2", n_exp=1000.0))
+    b = make_extraction(make_specimen("c1", n_exp=2510.0), make_specimen("C2", n_exp=1000.4))
+    assert compare_extractions(a, b) == []
+
+
+def test_compare_reports_field_and_missing_specimens(make_specimen, make_extraction):
+    a = make_extraction(make_specimen("C1"), make_specimen("C2"))
+    b = make_extraction(make_specimen("C1", t=4.0), make_specimen("C3"))
+    diffs = compare_extractions(a, b)
+    assert {"specimen": "C1", "field": "t", "a": 5.0, "b": 4.0} in diffs
+    assert {"specimen": "C2", "issue": "only_in_a"} in diffs
+    assert {"specimen": "C3", "issue": "only_in_b"} in diffs
+
+
+def test_compare_pairs_specimens_by_group_and_label(make_specimen, make_extraction):
+    s1_square, s1, c2 = make_specimen("S1", r0=0.0), make_specimen("S1"), make_specimen("C2")
+    a = make_extraction(Group_A=[s1_square], Group_B=[s1, c2])
+    b = make_extraction(Group_A=[s1_square, c2], Group_B=[s1])
+    # 两个 S1 各自与同组的 S1 比较；C2 被判到了另一组
+    assert compare_extractions(a, b) == [{"specimen": "C2", "field": "group", "a": "Group_B", "b": "Group_A"}]
+
+
+def _stub_runs(monkeypatch, plan: dict):
+    """plan: 模型名 → (延迟秒数, 结果)。"""
+    cancelled = []
+
+    async def _fake_once(self, deps, run_model, model):
+        delay, result = plan[model]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        deps.stats.update({"requests": 1, "input_tokens": 10, "output_tokens": 1})
+        return result.model_copy(deep=True)
+
+    monkeypatch.setattr(Extractor, "_extract_once", _fake_once)
+    return cancelled
+
+
+def test_returns_once_two_models_agree_and_cancels_stragglers(
+    tmp_path, monkeypatch, make_specimen, make_extraction
+):
+    good, bad = make_extraction(make_specimen("C1")), make_extraction(make_specimen("C1", b=190.0))
+    cancelled = _stub_runs(
+        monkeypatch, {"m1": (0.01, good), "m2": (0.02, bad), "m3": (0.03, good), "m4": (5, good)}
+    )
+    ext = Extractor(model="m1", consensus_models=["m2", "m3", "m4"])
+    result = asyncio.run(ext.extract(tmp_path))
+
+    stats = ext.run_stats[tmp_path.name]
+    assert stats["consensus"]["agreed"] == ["m1", "m3"]
+    assert stats["consensus"]["cancelled"] == ["m4"] and cancelled == ["m4"]
+    assert result.extraction_model == "consensus:m1,m3"
+    disagreement = stats["consensus"]["comparisons"][0]
+    assert disagreement["models"] == ["m1", "m2"] and disagreement["n_diffs"] >= 1
+    assert stats["input_tokens"] == 30
+
+
+def test_no_consensus_keeps_first_model_and_records_diffs(tmp_path, monkeypatch, make_specimen, make_extraction):
+    _stub_runs(monkeypatch, {
+        "m1": (0.02, make_extraction(make_specimen("C1"))),
+        "m2": (0.01, make_extraction(make_specimen("C1", n_exp=900.0))),
+    })
+    ext = Extractor(model="m1", consensus_models=["m2"])
+    result = asyncio.run(ext.extract(tmp_path))
+
+    stats = ext.run_stats[tmp_path.name]
+    assert stats["consensus"]["agreed"] is None
+    assert stats["consensus"]["comparisons"][0]["diffs"][0]["field"] == "n_exp"
+    assert result.Group_B[0].n_exp == 2500.0
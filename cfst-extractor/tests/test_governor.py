@@ -0,0 +1,64 @@
+"""Tests for tool-call budgets, duplicate memoization and per-tool profiling."""
+
+import pytest
+
+from cfst_extractor.agent.governor import ToolBudgetExceeded, ToolGovernor, merge_profiles
+
+
+def test_duplicate_calls_return_memoized_result():
+    gov = ToolGovernor()
+    executed = []
+
+    def _run():
+        executed.append(1)
+        return ["auto/a.md", "auto/images/1.jpg"]
+
+    first = gov.call("list_directory_files", {}, _run)
+    second = gov.call("list_directory_files", {}, _run)
+    assert first is second
+    assert len(executed) == 1
+    profile = gov.profile()["list_directory_files"]
+    assert profile["calls"] == 1
+    assert profile["duplicates"] == 1
+    assert sum(profile["histogram"].values()) == 1
+
+
+def test_per_tool_budget_stops_runaway_paper():
+    gov = ToolGovernor(budgets={"inspect_image": 2})
+    gov.call("inspect_image", {"image_path": "a.jpg"}, lambda: b"a")
+    gov.call("inspect_image", {"image_path": "b.jpg"}, lambda: b"b")
+    # 重复查看同一张图不计入单工具预算
+    gov.call("inspect_image", {"image_path": "a.jpg"}, lambda: b"a")
+    with pytest.raises(ToolBudgetExceeded):
+        gov.call("inspect_image", {"image_path": "c.jpg"}, lambda: b"c")
+
+
+def test_total_budget_counts_duplicates():
+    gov = ToolGovernor(budgets={"total": 3})
+    for _ in range(3):
+        gov.call("list_directory_files", {}, list)
+    with pytest.raises(ToolBudgetExceeded):
+        gov.call("list_directory_files", {}, list)
+
+
+def test_merge_profiles():
+    a, b = ToolGovernor(), ToolGovernor()
+    a.call("read_markdown", {}, lambda: "x" * 10)
+    b.call("read_markdown", {}, lambda: "y" * 5)
+    merged = merge_profiles([a.profile(), b.profile()])
+    assert merged["read_markdown"]["calls"] == 2
+    assert merged["read_markdown"]["bytes"] == 15
+
+
+def test_shared_cache_serves_concurrent_runs_of_one_paper():
+    shared: dict = {}
+    a = ToolGovernor(shared=shared)
+    b = ToolGovernor(budgets={"read_markdown": 1}, shared=shared)
+    executed = []
+    a.call("read_markdown", {}, lambda: executed.append(1) or "md")
+    assert b.call("read_markdown", {}, lambda: executed.append(1) or "md") == "md"
+    assert len(executed) == 1
+    assert b.profile()["read_markdown"]["shared_hits"] == 1
+    # 共享命中仍计入本运行的预算
+    with pytest.raises(ToolBudgetExceeded):
+        b.call("read_markdown", {"page": 2}, lambda: "md2")
@@ -0,0 +1,86 @@
+"""Tests for per-request timeouts and hedged model requests."""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from pydantic_ai.models.test import TestModel
+
+from cfst_extractor.agent.hedging import (
+    HedgedModel,
+    LatencyTracker,
+    RequestTimeout,
+    current_run_stats,
+)
+
+
+class _Delayed:
+    def __init__(self, delay: float, value: str):
+        self.delay = delay
+        self.value = value
+        self.cancelled = False
+
+    async def request(self, *args, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.value
+
+    @asynccontextmanager
+    async def request_stream(self, *args, **kwargs):
+        yield self.value
+
+
+def _model(primary, hedge_model=None, **kwargs) -> HedgedModel:
+    model = HedgedModel(TestModel(), **kwargs)
+    model.wrapped = primary
+    model.hedge_model = hedge_model or primary
+    return model
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker()
+    assert tracker.percentile(0.9, min_samples=3) is None
+    for s in (1.0, 2.0, 3.0, 4.0, 10.0):
+        tracker.record(s)
+    assert tracker.percentile(0.5, min_samples=3) == 3.0
+    assert tracker.percentile(0.99, min_samples=3) == 10.0
+
+
+def test_slow_request_is_hedged_and_first_answer_wins():
+    tracker = LatencyTracker()
+    for _ in range(5):
+        tracker.record(0.01)
+    slow, fast = _Delayed(5.0, "slow"), _Delayed(0.01, "fast")
+    model = _model(slow, fast, hedge=True, min_samples=5, tracker=tracker)
+
+    async def _run():
+        stats: dict = {}
+        current_run_stats.set(stats)
+        return await model.request(), stats
+
+    result, stats = asyncio.run(_run())
+    assert result == "fast"
+    assert stats["hedged_requests"] == 1
+    assert slow.cancelled
+
+
+def test_request_timeout():
+    model = _model(_Delayed(5.0, "slow"), request_timeout=0.05)
+    with pytest.raises(RequestTimeout):
+        asyncio.run(model.request())
+
+
+def test_request_timeout_covers_the_streamed_body():
+    model = _model(_Delayed(0.0, "chunks"), request_timeout=0.05)
+
+    async def _consume(delay: float):
+        async with model.request_stream() as stream:
+            await asyncio.sleep(delay)  # 调用方逐块读取流
+            return stream
+
+    assert asyncio.run(_consume(0.0)) == "chunks"
+    with pytest.raises(RequestTimeout):
+        asyncio.run(_consume(5.0))
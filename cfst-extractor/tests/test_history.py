@@ -0,0 +1,100 @@
+"""Tests for pruning consumed images and long tool outputs from the agent history."""
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import FunctionModel
+
+from cfst_extractor.agent.history import PRUNED_MARK, markdown_digest, prune_history
+
+PAPER = (
+    "# Introduction\n"
+    "Concrete-filled steel tubes have been studied for decades. Many design codes exist.\n"
+    "The steel tubes had a yield strength of 350 MPa. The cylinder strength was 40 MPa.\n"
+    "Table 1 Specimen details\n"
+    "<table><tr><td>Specimen</td><td>D (mm)</td></tr><tr><td>C1</td><td>200</td></tr></table>\n"
+    + "Further discussion without data. " * 200
+)
+
+
+def _turn(call_id: str, tool: str, args: dict, content) -> list:
+    return [
+        ModelResponse(parts=[ToolCallPart(tool, args, tool_call_id=call_id)]),
+        ModelRequest(parts=[ToolReturnPart(tool, content, tool_call_id=call_id)]),
+    ]
+
+
+def _history() -> list:
+    return [
+        ModelRequest(parts=[UserPromptPart("extract")]),
+        *_turn("c1", "tool_read_markdown", {}, PAPER),
+        *_turn("c2", "tool_join_specimen_tables", {"table_numbers": [1]}, [{"label": "C1"}] * 500),
+        *_turn("c3", "tool_inspect_image", {"image_path": "images/t1.jpg", "reason": "rows"}, b"\xff" * 4096),
+    ]
+
+
+def test_markdown_digest_keeps_tables_and_numeric_sentences():
+    digest = markdown_digest(PAPER)
+    assert digest.startswith(PRUNED_MARK)
+    assert "Specimen|D (mm)\nC1|200" in digest
+    assert "Table 1 Specimen details" in digest
+    assert "The steel tubes had a yield strength of 350 MPa." in digest
+    assert "Further discussion" not in digest and "design codes" not in digest
+
+
+def test_recent_turns_are_kept_and_older_ones_pruned():
+    stats = {}
+    history = _history()
+    assert prune_history(history, max_chars=1000, keep_turns=3, stats=stats) == history
+    assert stats["pruned_parts"] == 0
+
+    pruned = prune_history(history, max_chars=1000, keep_turns=0, stats=stats)
+    markdown, join, image = (pruned[i].parts[0].content for i in (2, 4, 6))
+    assert markdown == markdown_digest(PAPER)
+    assert join == [{"label": "C1"}] * 500
+    assert image.startswith(PRUNED_MARK) and "images/t1.jpg" in image and "4KB" in image
+    assert stats["pruned_parts"] == 2
+    assert pruned[0] is history[0]
+
+    # 最近一轮 (图片) 仍在窗口内
+    window = prune_history(history, max_chars=1000, keep_turns=1)
+    assert window[2].parts[0].content == markdown_digest(PAPER)
+    assert window[6] is history[6]
+
+
+def test_pruning_is_idempotent_and_leaves_input_untouched():
+    history = _history()
+    once = prune_history(history, max_chars=1000, keep_turns=0)
+    assert prune_history(once, max_chars=1000, keep_turns=0) == once
+    assert history[2].parts[0].content == PAPER
+
+
+def test_request_size_stays_bounded_over_many_turns():
+    turns, sizes = 12, []
+
+    def model(messages, info):
+        sizes.append(sum(len(str(p.content)) for m in messages if isinstance(m, ModelRequest) for p in m.parts))
+        if len(sizes) <= turns:
+            return ModelResponse(parts=[ToolCallPart("tool_dump", {}, tool_call_id=f"c{len(messages)}")])
+        return ModelResponse(parts=[TextPart("done")])
+
+    agent = Agent(
+        FunctionModel(model),
+        history_processors=[lambda messages: prune_history(messages, max_chars=1000, keep_turns=2)],
+    )
+
+    @agent.tool_plain
+    def tool_dump() -> str:
+        return "x" * 20_000
+
+    assert agent.run_sync("extract").output == "done"
+    assert len(sizes) == turns + 1
+    # 只有最近两轮是完整输出，更早的各轮截断到 max_chars (另加一行说明)；不裁剪时末轮约 12 × 20000
+    assert max(sizes) < 2 * 20_000 + turns * 1_200
+    assert sizes[-1] - sizes[-2] < 1_200
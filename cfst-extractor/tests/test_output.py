@@ -0,0 +1,82 @@
+"""Tests for atomic, compact result writing."""
+
+import json
+
+import pytest
+
+from cfst_extractor.output import OutputWriter, append_line, atomic_write_bytes, dumps
+
+
+class _Model:
+    def __init__(self, data):
+        self.data = data
+
+    def model_dump(self, mode="json"):
+        return dict(self.data)
+
+    def model_dump_json(self, indent=None):
+        return json.dumps(self.data, indent=indent, ensure_ascii=False)
+
+
+def test_atomic_write_leaves_no_temp_files(tmp_path):
+    target = tmp_path / "P.json"
+    atomic_write_bytes(target, b"old")
+    atomic_write_bytes(target, b"new")
+    assert target.read_bytes() == b"new"
+    assert [p.name for p in tmp_path.iterdir()] == ["P.json"]
+
+
+def test_compact_format_is_smaller_and_equivalent(tmp_path):
+    result = _Model({"is_valid": True, "Group_B": [{"specimen_label": "试件-1", "n_exp": 1000.0}]})
+    pretty = OutputWriter(tmp_path / "pretty").write_paper("P", result)
+    compact = OutputWriter(tmp_path / "compact", fmt="compact").write_paper("P", result)
+    assert compact.stat().st_size < pretty.stat().st_size
+    assert json.loads(compact.read_bytes()) == json.loads(pretty.read_bytes()) == result.data
+
+
+def test_pretty_output_does_not_depend_on_orjson(tmp_path, monkeypatch):
+    from cfst_extractor import output
+
+    class _FakeOrjson:
+        @staticmethod
+        def dumps(obj, option=0):
+            return b"orjson"
+
+    result = _Model({"Group_B": [{"specimen_label": "试件-1", "n_exp": 1000.0}]})
+    plain = output.dump_model(result), output.dumps(result.data)
+    monkeypatch.setattr(output, "orjson", _FakeOrjson)
+    assert (output.dump_model(result), output.dumps(result.data)) == plain
+    assert output.dump_model(result, "compact") == output.dumps(result.data, "compact") == b"orjson"
+
+
+def test_corpus_and_records_are_appended_as_whole_lines(tmp_path):
+    writer = OutputWriter(tmp_path, fmt="compact", corpus=True)
+    writer.write_paper("P1", _Model({"Group_A": []}))
+    writer.write_paper("P2", _Model({"Group_A": [{"specimen_label": "S1"}]}))
+    lines = (tmp_path / "corpus.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["paper"] for line in lines] == ["P1", "P2"]
+
+    writer.append_record("progress.jsonl", {"paper": "P1", "seconds": 1.5})
+    append_line(tmp_path / "progress.jsonl", dumps({"paper": "P2"}, "compact"))
+    records = [json.loads(line) for line in (tmp_path / "progress.jsonl").read_text().splitlines()]
+    assert records == [{"paper": "P1", "seconds": 1.5}, {"paper": "P2"}]
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        OutputWriter(tmp_path, fmt="yaml")
+
+
+def test_partial_specimens_are_appended_then_removed_by_final_write(tmp_path):
+    writer = OutputWriter(tmp_path, fmt="compact")
+    writer.partial_path("P").write_text("stale\n", encoding="utf-8")
+    record = writer.partial_recorder("P")
+    record("Group_B", _Model({"specimen_label": "C1"}))
+    record("Group_B", _Model({"specimen_label": "C2"}))
+    lines = writer.partial_path("P").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"group": "Group_B", "specimen_label": "C1"}, {"group": "Group_B", "specimen_label": "C2"},
+    ]
+
+    writer.write_paper("P", _Model({"Group_B": []}))
+    assert not writer.partial_path("P").exists()
@@ -0,0 +1,113 @@
+"""Tests for the cache-stable request prefix."""
+
+import json
+
+from cfst_extractor.agent import agent
+from cfst_extractor.agent.extractor import build_prompt
+
+
+def test_prompt_prefix_is_identical_across_papers():
+    a = build_prompt("[A1-1] Paper one")
+    b = build_prompt("[A1-2] Paper two")
+    assert a[0] == b[0] == agent.WORKFLOW_PROMPT
+    assert "[A1-1]" in a[1] and "[A1-1]" not in a[0]
+
+
+def _body():
+    return {
+        "model": "m",
+        "messages": [
+            {"role": "system", "content": "sys"},
+            {"role": "user", "content": [
+                {"type": "text", "text": agent.WORKFLOW_PROMPT},
+                {"type": "text", "text": "当前文献目录：X"},
+            ]},
+        ],
+        "tools": [{"type": "function", "function": {"name": "t", "parameters": {
+            "$defs": {"D": {"type": "object"}},
+            "properties": {"x": {"$ref": "#/$defs/D"}, "y": {"anyOf": [{"type": "number"}, {"type": "null"}]}},
+        }}}],
+    }
+
+
+def test_rewritten_tools_are_byte_identical_across_turns(monkeypatch):
+    monkeypatch.setitem(agent._patches, "flatten_defs", True)
+    monkeypatch.setitem(agent._patches, "fix_anyof", True)
+    monkeypatch.setattr(agent, "_rewritten_tools", {})
+    first, second = _body(), _body()
+    agent._rewrite_body(first)
+    agent._rewrite_body(second)
+    assert first["tools"][0]["function"]["parameters"]["properties"] == {
+        "x": {"type": "object"},
+        "y": {"type": "number"},
+    }
+    assert json.dumps(first["tools"]).encode() == json.dumps(second["tools"]).encode()
+
+
+def test_cache_control_marks_static_prefix(monkeypatch):
+    monkeypatch.setitem(agent._patches, "cache_control", True)
+    body = _body()
+    agent._rewrite_body(body)
+    system, user = body["messages"]
+    assert system["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert user["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in user["content"][1]
+
+
+
+def test_platform_override_does_not_reuse_other_presets_tools(monkeypatch):
+    monkeypatch.setattr(agent, "_rewritten_tools", {})
+    token = agent.patch_override.set(agent.platform_patches("dashscope"))
+    try:
+        flattened = _body()
+        agent._rewrite_body(flattened)
+    finally:
+        agent.patch_override.reset(token)
+    token = agent.patch_override.set(agent.platform_patches("openai"))
+    try:
+        untouched = _body()
+        agent._rewrite_body(untouched)
+    finally:
+        agent.patch_override.reset(token)
+    assert "$defs" not in flattened["tools"][0]["function"]["parameters"]
+    assert untouched["tools"] == _body()["tools"]
+
+
+def test_response_cache_replays_identical_requests(tmp_path, monkeypatch):
+    import asyncio
+
+    import httpx
+
+    sent = []
+
+    async def _fake_send(self, request, **kwargs):
+        sent.append(request)
+        return httpx.Response(200, json={"id": len(sent)}, request=request)
+
+    monkeypatch.setattr(agent, "original_send", _fake_send)
+
+    async def _send_twice():
+        agent.response_cache_dir.set(tmp_path)
+        stats = {}
+        agent.current_run_stats.set(stats)
+        async with httpx.AsyncClient() as client:
+            responses = [
+                await client.post("https://api.example.com/v1/chat/completions", json={"model": "m", "n": 1})
+                for _ in range(2)
+            ]
+        return [r.json() for r in responses], stats
+
+    bodies, stats = asyncio.run(_send_twice())
+    assert bodies == [{"id": 1}, {"id": 1}]
+    assert len(sent) == 1 and stats["cached_responses"] == 1
+    assert len(stats["request_bytes"]) == 2
+
+
+def test_requests_without_schema_patches_are_not_reencoded(monkeypatch):
+    monkeypatch.setattr(agent, "_rewritten_tools", {})
+    token = agent.patch_override.set(dict.fromkeys(agent._patches, False))
+    try:
+        assert [agent._rewrite_body(_body()) for _ in range(2)] == [False, False]
+    finally:
+        agent.patch_override.reset(token)
+    assert agent._rewritten_tools == {}
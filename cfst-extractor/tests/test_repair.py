@@ -0,0 +1,82 @@
+"""Tests for plausibility checks and targeted repair patching."""
+
+from cfst_extractor.agent.models import SpecimenRepair
+from cfst_extractor.agent.repair import (
+    apply_repair,
+    check_extraction,
+    check_specimen,
+    locate_tables,
+)
+
+
+def test_plausible_circular_specimen_passes(make_specimen):
+    assert check_specimen("Group_B", make_specimen("C1")) == []
+
+
+def test_checks_flag_geometry_and_capacity(make_specimen):
+    assert any("b (200.0) != h" in r for r in check_specimen("Group_B", make_specimen("C1", h=150.0, r0=75.0)))
+    # kN 误记为 N：与名义承载力相差三个数量级
+    assert any("n_exp" in r for r in check_specimen("Group_B", make_specimen("C1", n_exp=2_500_000.0)))
+    assert check_specimen("Group_A", make_specimen("S1", r0=0.0, n_exp=3000.0)) == []
+
+
+def test_check_extraction_collects_flagged_labels(make_specimen, make_extraction):
+    extraction = make_extraction(Group_B=[make_specimen("C1"), make_specimen("C2", h=190.0, r0=95.0)])
+    assert list(check_extraction(extraction)) == ["C2"]
+
+
+def test_apply_repair_patches_only_flagged_records(make_specimen, make_extraction):
+    extraction = make_extraction(
+        Group_B=[make_specimen("C1"), make_specimen("C2", h=190.0, r0=95.0), make_specimen("C3")],
+    )
+    repair = SpecimenRepair(Group_B=[make_specimen("C2", n_exp=2600.0)], notes="h 误读")
+    patched = apply_repair(extraction, repair, ["C2"])
+    assert [s.specimen_label for s in patched.Group_B] == ["C1", "C2", "C3"]
+    assert patched.Group_B[1].h == 200.0
+    # 原结果不被修改
+    assert extraction.Group_B[1].h == 190.0
+
+
+def test_apply_repair_moves_removes_and_keeps_unanswered(make_specimen, make_extraction):
+    extraction = make_extraction(
+        Group_A=[make_specimen("S1", r0=0.0)],
+        Group_B=[make_specimen("S2"), make_specimen("C9"), make_specimen("C5")],
+    )
+    repair = SpecimenRepair(Group_A=[make_specimen("S2", r0=0.0)], removed_labels=["C9"])
+    patched = apply_repair(extraction, repair, ["S2", "C9", "C5"])
+    assert [s.specimen_label for s in patched.Group_A] == ["S1", "S2"]
+    assert [s.specimen_label for s in patched.Group_B] == ["C5"]
+
+
+def test_apply_repair_ignores_unflagged_existing_records(make_specimen, make_extraction):
+    extraction = make_extraction(make_specimen("C1"), make_specimen("C2", h=190.0, r0=95.0), make_specimen("C3"))
+    repair = SpecimenRepair(
+        Group_A=[make_specimen("C1", r0=0.0)],
+        Group_B=[make_specimen("C2"), make_specimen("C3", n_exp=9999.0), make_specimen("C4")],
+        removed_labels=["C1"],
+    )
+    patched = apply_repair(extraction, repair, ["C2"])
+    assert patched.Group_A == []
+    assert [s.specimen_label for s in patched.Group_B] == ["C1", "C2", "C3", "C4"]
+    assert patched.Group_B[1].h == 200.0
+    assert patched.Group_B[2].n_exp == 2500.0
+
+
+def test_locate_tables_selects_tables_by_label_and_number(tmp_path):
+    auto = tmp_path / "auto"
+    auto.mkdir()
+    (auto / "paper.md").write_text(
+        "Table 1\n<table><tr><td>Specimen</td><td>D</td></tr><tr><td>C1</td><td>100</td></tr></table>\n"
+        "Table 2\n<table><tr><td>Specimen</td><td>Nu</td></tr><tr><td>C2</td><td>900</td></tr></table>\n"
+        "Table 3\n<table><tr><td>Steel</td><td>fy</td></tr><tr><td>Q345</td><td>350</td></tr></table>\n",
+        encoding="utf-8",
+    )
+    (auto / "paper_content_list.json").write_text(
+        '[{"type": "table", "img_path": "images/t1.jpg"}, {"type": "table", "img_path": "images/t2.jpg"},'
+        ' {"type": "text", "text": "x"}, {"type": "table", "img_path": "images/t3.jpg"}]',
+        encoding="utf-8",
+    )
+    tables = locate_tables(tmp_path, ["c1"], table_numbers=[3])
+    assert [t.number for t in tables] == [1, 3]
+    assert tables[0].image_path == "auto/images/t1.jpg"
+    assert tables[0].labels() == ["C1"]
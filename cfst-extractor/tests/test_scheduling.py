@@ -0,0 +1,33 @@
+"""Tests for longest-first cost-aware batch scheduling."""
+
+from cfst_extractor.scheduling import calibration_scale, estimate_cost, order_longest_first
+
+
+def _paper(root, name, chars, tables=0, images=0):
+    d = root / name / "auto"
+    (d / "images").mkdir(parents=True)
+    (d / f"{name}.md").write_text("x" * chars + "<table></table>" * tables, encoding="utf-8")
+    for i in range(images):
+        (d / "images" / f"{i}.jpg").write_bytes(b"")
+    return root / name
+
+
+def test_estimate_cost_counts_features(tmp_path):
+    d = _paper(tmp_path, "P", 2000, tables=2, images=3)
+    cost = estimate_cost(d)
+    assert cost.tables == 2
+    assert cost.images == 3
+    assert cost.md_chars == 2000 + 2 * len("<table></table>")
+
+
+def test_longest_first_puts_expensive_papers_first(tmp_path):
+    short = _paper(tmp_path, "A_short", 1000)
+    thesis = _paper(tmp_path, "Z_thesis", 200_000, tables=20, images=100)
+    medium = _paper(tmp_path, "M_medium", 20_000, tables=3)
+    order = [c.paper_dir for c in order_longest_first([short, medium, thesis])]
+    assert order == [thesis, medium, short]
+
+
+def test_calibration_scale():
+    assert calibration_scale([(10.0, 20.0), (30.0, 60.0)]) == 2.0
+    assert calibration_scale([]) is None
@@ -0,0 +1,138 @@
+"""Tests for the local extraction service: priorities, coalescing, caching and HTTP routing."""
+
+import asyncio
+import json
+
+import pytest
+
+from cfst_extractor.service import ExtractionService, QueueFull
+
+
+class _Result:
+    def __init__(self, name: str):
+        self.name = name
+        self.is_valid = True
+
+    def model_dump(self, mode="json"):
+        return {"paper": self.name}
+
+
+class _FakeExtractor:
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.order: list[str] = []
+        self.run_stats: dict[str, dict] = {}
+
+    async def extract(self, paper_dir):
+        self.order.append(paper_dir.name)
+        self.run_stats[paper_dir.name] = {"requests": 1}
+        await asyncio.sleep(self.delay)
+        return _Result(paper_dir.name)
+
+
+def _root(tmp_path, *names):
+    for name in names:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / f"{name}.md").write_text("# paper", encoding="utf-8")
+    return tmp_path
+
+
+def test_interactive_jobs_overtake_bulk_backlog(tmp_path):
+    async def scenario():
+        ext = _FakeExtractor()
+        service = ExtractionService(ext, _root(tmp_path, "B1", "B2", "B3", "I1"), workers=1)
+        for name in ("B1", "B2", "B3"):
+            await service.submit(tmp_path / name, "bulk")
+        interactive = await service.submit(tmp_path / "I1", "interactive")
+        service.start()
+        await interactive.done.wait()
+        await service.stop()
+        return ext.order, interactive
+
+    order, job = asyncio.run(scenario())
+    assert order[0] == "I1"
+    assert job.result == {"paper": "I1"} and job.stats == {"requests": 1}
+
+
+def test_bulk_jobs_leave_a_slot_for_interactive(tmp_path):
+    async def scenario():
+        service = ExtractionService(_FakeExtractor(delay=0.05), _root(tmp_path, "B1", "B2"), workers=2)
+        service.start()
+        await service.submit(tmp_path / "B1", "bulk")
+        await service.submit(tmp_path / "B2", "bulk")
+        await asyncio.sleep(0.01)
+        running = dict(service._running)
+        await service.stop()
+        return running
+
+    assert asyncio.run(scenario()) == {"interactive": 0, "bulk": 1}
+
+
+def test_duplicate_submissions_coalesce_and_results_are_cached(tmp_path):
+    async def scenario():
+        ext = _FakeExtractor()
+        service = ExtractionService(ext, _root(tmp_path, "P"), workers=1)
+        first = await service.submit(tmp_path / "P", "bulk")
+        second = await service.submit(tmp_path / "P", "interactive")
+        assert second is first and first.priority == "interactive"
+        service.start()
+        await first.done.wait()
+        third = await service.submit(tmp_path / "P")
+        await service.stop()
+        return ext.order, third
+
+    order, third = asyncio.run(scenario())
+    assert order == ["P"]
+    assert third.cached and third.result == {"paper": "P"}
+
+
+def test_queue_is_bounded(tmp_path):
+    async def scenario():
+        service = ExtractionService(_FakeExtractor(), _root(tmp_path, "A", "B"), max_queue=1)
+        await service.submit(tmp_path / "A")
+        with pytest.raises(QueueFull):
+            await service.submit(tmp_path / "B")
+
+    asyncio.run(scenario())
+
+
+def test_http_routes(tmp_path):
+    async def scenario():
+        service = ExtractionService(_FakeExtractor(), _root(tmp_path, "P"), workers=1)
+        service.start()
+        body = json.dumps({"paper": "P", "wait": True}).encode()
+        done = await service.handle("POST", "/jobs", body)
+        result = await service.handle("GET", f"/jobs/{done[1]['id']}/result", b"")
+        escape = await service.handle("POST", "/jobs", json.dumps({"paper": "../etc"}).encode())
+        missing = await service.handle("GET", "/jobs/nope", b"")
+        await service.stop()
+        return done, result, escape, missing
+
+    done, result, escape, missing = asyncio.run(scenario())
+    assert done[0] == 200 and done[1]["result"] == {"paper": "P"}
+    assert result == (200, {"paper": "P"})
+    assert escape[0] == 400
+    assert missing[0] == 404
+
+
+def test_crashed_job_is_logged_and_worker_survives(tmp_path, caplog):
+    class _Crashing(_FakeExtractor):
+        async def extract(self, paper_dir):
+            if paper_dir.name == "A":
+                raise RuntimeError("boom")
+            return await super().extract(paper_dir)
+
+    async def scenario():
+        service = ExtractionService(_Crashing(), _root(tmp_path, "A", "B"), workers=1)
+        service.start()
+        crashed = await service.handle("POST", "/jobs", json.dumps({"paper": "A", "wait": True}).encode())
+        ok = await service.handle("POST", "/jobs", json.dumps({"paper": "B", "wait": True}).encode())
+        bad = await service.handle("POST", "/jobs", b"[]")
+        await service.stop()
+        return crashed, ok, bad
+
+    crashed, ok, bad = asyncio.run(scenario())
+    assert crashed[0] == 500 and crashed[1]["status"] == "failed"
+    assert ok[0] == 200
+    assert bad[0] == 400
+    assert "boom" in caplog.text
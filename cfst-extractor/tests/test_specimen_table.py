@@ -0,0 +1,76 @@
+"""Tests for the columnar specimen table."""
+
+import json
+import math
+
+import numpy as np
+
+from cfst_extractor.agent.repair import _areas
+from cfst_extractor.specimen_table import SpecimenTable, section_areas
+
+
+def _spec(label, b, h, t, n_exp, fc_type="Cylinder 150x300"):
+    return {
+        "specimen_label": label, "fc_value": 40.0, "fc_type": fc_type, "fy": 350.0,
+        "b": b, "h": h, "t": t, "r0": 0.0, "L": 3 * b, "e1": 0.0, "e2": 0.0,
+        "n_exp": n_exp, "source_evidence": "Table 1",
+    }
+
+
+def _write_outputs(out):
+    out.mkdir()
+    (out / "P1.json").write_text(json.dumps({
+        "Group_A": [_spec("S1", 200, 200, 5, 3000)],
+        "Group_B": [_spec("C1", 200, 200, 5, 2500), _spec("C2", 100, 100, 4, 900)],
+        "Group_C": [],
+    }), encoding="utf-8")
+    (out / "P2.json").write_text(json.dumps({"Group_B": [_spec("C1", 300, 300, 6, 5000, "Cube 150")]}),
+                                 encoding="utf-8")
+    (out / "batch_summary.json").write_text(json.dumps({"total_papers": 2}), encoding="utf-8")
+
+
+def test_build_from_json_dir_dictionary_encodes_strings(tmp_path):
+    _write_outputs(tmp_path / "out")
+    table = SpecimenTable.from_json_dir(tmp_path / "out")
+    assert len(table) == 4
+    assert table.categorical["paper"].categories == ["P1", "P2"]
+    assert table.categorical["fc_type"].categories == ["Cylinder 150x300", "Cube 150"]
+    assert table.categorical["fc_type"].codes.dtype == np.int32
+    assert list(table["specimen_label"]) == ["S1", "C1", "C2", "C1"]
+
+
+def test_filters_and_derived_ratios(tmp_path):
+    _write_outputs(tmp_path / "out")
+    table = SpecimenTable.from_json_dir(tmp_path / "out")
+    circular = table.filter(table.eq("group", "Group_B") & (table["n_exp"] > 1000))
+    assert list(circular["specimen_label"]) == ["C1", "C1"]
+    assert np.allclose(circular.d_t, [40.0, 50.0])
+    assert np.allclose(circular.l_d, 3.0)
+
+    steel = math.pi / 4 * (200**2 - 190**2)
+    core = math.pi / 4 * 190**2
+    assert math.isclose(circular.confinement_factor[0], steel * 350 / (core * 40))
+    assert table.filter(table.eq("group", "Group_D")).__len__() == 0
+
+
+def test_group_by_and_pandas(tmp_path):
+    _write_outputs(tmp_path / "out")
+    table = SpecimenTable.from_json_dir(tmp_path / "out")
+    stats = table.group_by("group", "n_exp")
+    assert stats["Group_B"]["count"] == 3
+    assert stats["Group_B"]["max"] == 5000
+    assert stats["Group_A"]["mean"] == 3000
+    assert table.group_by("paper", "d_t")["P2"]["mean"] == 50.0
+
+    df = table.to_pandas()
+    assert len(df) == 4
+    assert str(df["group"].dtype) == "category"
+    assert np.shares_memory(df["n_exp"].to_numpy(), table["n_exp"])
+
+
+def test_vectorised_areas_match_the_repair_checks():
+    groups = np.array(["Group_A", "Group_B", "Group_C"], dtype=object)
+    b, h, t = np.array([200.0, 219.0, 300.0]), np.array([150.0, 219.0, 150.0]), np.array([5.0, 6.0, 4.0])
+    steel, core = section_areas(groups, b, h, t)
+    for i, group in enumerate(groups):
+        assert (steel[i], core[i]) == _areas(group, b[i], h[i], t[i])
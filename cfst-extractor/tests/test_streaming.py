@@ -0,0 +1,70 @@
+"""Tests for incremental validation of streamed specimens."""
+
+import json
+
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+
+from cfst_extractor.agent.streaming import SpecimenStream, output_args
+
+HEADER = {"is_valid": True, "reason": "", "ref_info": {"title": "T", "authors": [], "journal": "J", "year": 2004}}
+
+
+def test_output_args_parses_partial_json(specimen_fields):
+    text = json.dumps({**HEADER, "Group_B": [specimen_fields("C1"), specimen_fields("C2")]})
+    response = ModelResponse(parts=[ToolCallPart("final_result", text[:-40], tool_call_id="c1")])
+    data = output_args(response)
+    assert data["Group_B"][0]["specimen_label"] == "C1" and len(data["Group_B"]) == 2
+    assert output_args(ModelResponse(parts=[ToolCallPart("tool_read_markdown", "{}", tool_call_id="c2")])) is None
+
+
+def test_specimens_are_validated_once_complete(specimen_fields):
+    seen = []
+    stream = SpecimenStream(lambda group, s: seen.append((group, s.specimen_label)))
+    group_a, c1 = [specimen_fields("S1")], specimen_fields("C1")
+    stream.feed({**HEADER, "Group_A": group_a, "Group_B": [c1, {"specimen_label": "C2"}]})
+    # Group_B 的最后一个对象可能仍在生成，不校验
+    assert seen == [("Group_A", "S1"), ("Group_B", "C1")] and stream.invalid == []
+
+    stream.feed({**HEADER, "Group_A": group_a, "Group_B": [c1, specimen_fields("C2", n_exp="n/a")]}, final=True)
+    assert seen == [("Group_A", "S1"), ("Group_B", "C1")]
+    assert stream.invalid[0]["label"] == "C2" and stream.invalid[0]["errors"][0].startswith("n_exp")
+    assert stream.first_specimen_s is not None
+
+
+def test_partial_result_and_tail_prompt_list_received_and_invalid(specimen_fields):
+    stream = SpecimenStream()
+    stream.feed({**HEADER, "Group_B": [specimen_fields("C1"), specimen_fields("C2", t=None)]}, final=True)
+    partial = stream.assemble()
+    assert [s.specimen_label for s in partial.Group_B] == ["C1"] and partial.ref_info.year == 2004
+
+    prompt = stream.tail_prompt()
+    assert "Group_B (1): C1" in prompt and "- C2 (Group_B): t:" in prompt
+    assert stream.stats()["invalid"] == [{"group": "Group_B", "index": 1, "label": "C2"}]
+
+
+def test_invalid_header_is_reported_not_blanked(specimen_fields):
+    stream = SpecimenStream()
+    stream.feed({**HEADER, "ref_info": {"title": "T"}, "Group_B": [specimen_fields("C1")]}, final=True)
+    partial = stream.assemble()
+    assert [s.specimen_label for s in partial.Group_B] == ["C1"]
+    assert "ref_info" in partial.reason
+    assert stream.stats()["header_errors"] and stream.header_errors[0].startswith("authors")
+
+
+def test_in_progress_group_follows_json_key_order(specimen_fields):
+    stream = SpecimenStream()
+    # 模型先输出 Group_C 再输出 Group_A：仍在生成的是 Group_A 的末尾对象
+    group_a = [specimen_fields("S1"), {"specimen_label": "S2"}]
+    stream.feed({**HEADER, "Group_C": [specimen_fields("E1")], "Group_A": group_a})
+    assert [s.specimen_label for s in stream.valid["Group_C"]] == ["E1"]
+    assert [s.specimen_label for s in stream.valid["Group_A"]] == ["S1"] and stream.invalid == []
+
+
+def test_rejected_specimen_is_revalidated_when_it_changes(specimen_fields):
+    stream = SpecimenStream()
+    c2 = specimen_fields("C2")
+    stream.feed({**HEADER, "Group_B": [specimen_fields("C1", t="n/a"), c2, {}]})
+    assert stream.invalid[0]["label"] == "C1"
+    stream.feed({**HEADER, "Group_B": [specimen_fields("C1"), c2]}, final=True)
+    assert stream.invalid == []
+    assert [s.specimen_label for s in stream.valid["Group_B"]] == ["C1", "C2"]
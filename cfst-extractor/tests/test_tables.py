@@ -0,0 +1,50 @@
+"""Tests for the specimen-label hash join across tables."""
+
+from cfst_extractor.agent.tables import join_tables, label_keys, normalize_label
+
+GEOMETRY = [
+    ["Specimen", "D (mm)", "t (mm)"],
+    ["C1", "100", "3.0"],
+    ["C1a", "101", "3.1"],
+    ["C1b", "102", "3.2"],
+    ["SC-l", "200", "4.0"],
+    ["C7(a)", "70", "2.0"],
+    ["S5 R1", "1 2", "3 4"],
+]
+STRENGTH = [
+    ["No.", "Nu (kN)"],
+    ["C1", "1000"],
+    ["C1A", "1100"],
+    ["c1b", "1200"],
+    ["SC–1*", "2000"],
+    ["C7", "700"],
+    ["C9", "900"],
+]
+
+
+def test_normalize_label_handles_ocr_confusions():
+    assert normalize_label("SC–l*") == "SC-1"
+    assert normalize_label("c 1O") == "C10"
+    assert normalize_label("C1a") == "C1A"
+    assert label_keys("C7(a)") == ["C7(A)", "C7"]
+
+
+def test_join_merges_rows_by_label():
+    records = {r["key"]: r for r in join_tables([GEOMETRY, STRENGTH])}
+    assert records["C1"]["fields"] == {"T1.D (mm)": "100", "T1.t (mm)": "3.0", "T2.Nu (kN)": "1000"}
+    assert records["SC-1"]["tables"] == ["T1", "T2"]
+    assert records["SC-1"]["fields"]["T2.Nu (kN)"] == "2000"
+    assert records["C7(A)"]["fields"]["T2.Nu (kN)"] == "700"
+
+
+def test_join_keeps_suffixed_specimens_distinct():
+    records = {r["key"]: r for r in join_tables([GEOMETRY, STRENGTH])}
+    assert records["C1A"]["fields"]["T2.Nu (kN)"] == "1100"
+    assert records["C1B"]["fields"]["T2.Nu (kN)"] == "1200"
+    assert records["C9"]["tables"] == ["T2"]
+
+
+def test_join_flags_merged_label_cells():
+    records = {r["key"]: r for r in join_tables([GEOMETRY, STRENGTH], names=["Table1", "Table2"])}
+    assert records["S5R1"]["merged_label"] is True
+    assert "Table1.D (mm)" in records["S5R1"]["fields"]
@@ -0,0 +1,142 @@
+"""Tests for batch timeline tracing and the profile summary."""
+
+import asyncio
+import csv
+import io
+import json
+
+from cfst_extractor.tracing import (
+    Span,
+    Tracer,
+    span,
+    start_tracing,
+    stop_tracing,
+    summarize_trace,
+    traced,
+)
+
+
+def test_spans_are_noops_until_tracing_starts():
+    assert stop_tracing() is None
+    with span("x", "tool"):
+        pass
+    tracer = start_tracing()
+    try:
+        with span("read_markdown", "tool", bytes=10):
+            pass
+    finally:
+        assert stop_tracing() is tracer
+    assert [(s.name, s.cat, s.worker, s.args) for s in tracer.spans] == [("read_markdown", "tool", None, {"bytes": 10})]
+
+
+def test_worker_and_paper_follow_tasks_and_threads():
+    def _tool():
+        with span("inspect_image", "tool"):
+            pass
+
+    async def _paper(worker: int, name: str):
+        with traced(worker, name), span(name, "paper"):
+            await asyncio.to_thread(_tool)
+            with span("chat/completions", "model"):
+                await asyncio.sleep(0)
+
+    async def _batch():
+        await asyncio.gather(_paper(0, "P1"), _paper(1, "P2"))
+
+    tracer = start_tracing()
+    try:
+        asyncio.run(_batch())
+    finally:
+        stop_tracing()
+    by_cat = {(s.cat, s.paper): s.worker for s in tracer.spans}
+    assert by_cat == {
+        ("tool", "P1"): 0, ("model", "P1"): 0, ("paper", "P1"): 0,
+        ("tool", "P2"): 1, ("model", "P2"): 1, ("paper", "P2"): 1,
+    }
+
+
+def test_chrome_trace_and_csv_export(tmp_path):
+    tracer = Tracer()
+    tracer.spans = [
+        Span("P1", "wait", 0, 500, None, "P1"),
+        Span("P1", "paper", 500, 2000, 0, "P1"),
+        Span("inspect_image", "tool", 600, 300, 0, "P1", {"bytes": 4096}),
+    ]
+    json_path, csv_path = tracer.export(tmp_path)
+    trace = json.loads(json_path.read_text(encoding="utf-8"))
+    complete = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert [(e["name"], e["pid"], e["tid"]) for e in complete] == [("P1", 2, 1), ("P1", 1, 1), ("inspect_image", 1, 1)]
+    assert {"ph": "M", "name": "thread_name", "pid": 1, "tid": 1, "args": {"name": "worker 0"}} in trace["traceEvents"]
+
+    rows = list(csv.DictReader(io.StringIO(csv_path.read_text(encoding="utf-8"))))
+    assert rows[2]["name"] == "inspect_image" and rows[2]["dur_ms"] == "0.3" and rows[1]["worker"] == "0"
+
+
+def test_summary_reports_idle_time_and_critical_path():
+    tracer = Tracer()
+    s = 1_000_000  # 1 秒 (微秒)
+    tracer.spans = [
+        Span("P1", "wait", 0, 0, None, "P1"),
+        Span("P2", "wait", 0, 0, None, "P2"),
+        Span("P3", "wait", 0, 4 * s, None, "P3"),
+        Span("P1", "paper", 0, 4 * s, 0, "P1"),
+        Span("chat/completions", "model", 0, 3 * s, 0, "P1"),
+        Span("P2", "paper", 0, 2 * s, 1, "P2"),
+        Span("P3", "paper", 4 * s, 6 * s, 0, "P3"),
+        Span("inspect_image", "tool", 5 * s, 1 * s, 0, "P3"),
+        Span("P3.json", "write", 9 * s, s // 2, 0, "P3"),
+    ]
+    summary = summarize_trace(tracer.chrome_trace())
+    assert summary["wall_s"] == 10.0
+    assert summary["workers"][1] == {
+        "papers": 1, "busy_s": 2.0, "idle_s": 8.0, "end_s": 2.0,
+        "model_s": 0.0, "tool_s": 0.0, "rewrite_s": 0.0, "write_s": 0.0, "other_s": 2.0,
+    }
+    assert summary["queue"] == {"papers": 3, "total_wait_s": 4.0, "max_wait_s": 4.0}
+
+    critical = summary["critical_path"]
+    assert critical["worker"] == 0 and [p["paper"] for p in critical["papers"]] == ["P1", "P3"]
+    assert critical["model_s"] == 3.0 and critical["tool_s"] == 1.0 and critical["other_s"] == 5.5
+
+
+def test_concurrent_model_spans_are_counted_once():
+    tracer = Tracer()
+    s = 1_000_000
+    tracer.spans = [
+        Span("P1", "paper", 0, 4 * s, 0, "P1"),
+        # 对冲请求与原请求重叠 1 秒；之后的工具调用与第二个模型请求并行
+        Span("chat/completions", "model", 0, 2 * s, 0, "P1"),
+        Span("chat/completions", "model", 1 * s, 2 * s, 0, "P1"),
+        Span("inspect_image", "tool", 2 * s, 1 * s, 0, "P1"),
+    ]
+    worker = summarize_trace(tracer.chrome_trace())["workers"][0]
+    assert worker["model_s"] == 3.0 and worker["tool_s"] == 1.0
+    assert worker["model_s"] <= worker["busy_s"] and worker["other_s"] == 1.0
+
+
+
+def test_streamed_model_span_lasts_until_the_body_is_closed(monkeypatch):
+    import httpx
+
+    from cfst_extractor.agent import agent
+
+    async def _fake_send(self, request, **kwargs):
+        return httpx.Response(200, content=b"data: {}\n\n", request=request)
+
+    monkeypatch.setattr(agent, "original_send", _fake_send)
+
+    async def _stream():
+        async with httpx.AsyncClient() as client:
+            request = client.build_request("POST", "https://api.example.com/v1/chat/completions", json={"n": 1})
+            response = await client.send(request, stream=True)
+            await asyncio.sleep(0.05)  # 调用方逐块读取响应体
+            await response.aread()
+            await response.aclose()
+
+    tracer = start_tracing()
+    try:
+        asyncio.run(_stream())
+    finally:
+        stop_tracing()
+    (model,) = [s for s in tracer.spans if s.cat == "model"]
+    assert model.args["stream"] is True and model.dur_us >= 50_000
@@ -0,0 +1,54 @@
+"""Tests for incremental discovery of completed parsed papers (watch mode)."""
+
+import os
+
+from cfst_extractor.watcher import PaperWatcher
+
+
+def _write_bundle(root, name, md="# paper", content_list="[]"):
+    auto = root / name / "auto"
+    auto.mkdir(parents=True, exist_ok=True)
+    (auto / f"{name}.md").write_text(md, encoding="utf-8")
+    if content_list is not None:
+        (auto / f"{name}_content_list.json").write_text(content_list, encoding="utf-8")
+    return root / name
+
+
+def test_paper_is_ready_once_bundle_is_stable(tmp_path):
+    root, out = tmp_path / "parsed", tmp_path / "out"
+    root.mkdir()
+    watcher = PaperWatcher(root, out)
+    paper = _write_bundle(root, "P1")
+
+    assert watcher.poll() == []
+    assert watcher.pending() == ["P1"]
+    assert watcher.poll() == [paper]
+    # 已入队的论文不会再次出现
+    assert watcher.poll() == []
+
+
+def test_incomplete_or_changing_bundles_wait(tmp_path):
+    root, out = tmp_path / "parsed", tmp_path / "out"
+    root.mkdir()
+    watcher = PaperWatcher(root, out)
+    paper = _write_bundle(root, "P1", content_list=None)
+    assert watcher.poll() == [] and watcher.poll() == []
+
+    _write_bundle(root, "P1", md="# paper", content_list="[")
+    watcher.poll()
+    md = paper / "auto" / "P1.md"
+    md.write_text("# paper, still growing", encoding="utf-8")
+    os.utime(md, ns=(1, 1))
+    assert watcher.poll() == []
+    assert watcher.poll() == [paper]
+
+
+def test_papers_with_existing_output_are_skipped(tmp_path):
+    root, out = tmp_path / "parsed", tmp_path / "out"
+    root.mkdir()
+    out.mkdir()
+    _write_bundle(root, "Done")
+    (out / "Done.json").write_text("{}", encoding="utf-8")
+    watcher = PaperWatcher(root, out)
+    assert watcher.poll() == [] and watcher.poll() == []
+    assert watcher.pending() == []
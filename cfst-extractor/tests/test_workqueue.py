@@ -0,0 +1,90 @@
+"""Tests for the lease-based shared filesystem work queue."""
+
+import json
+import time
+
+from cfst_extractor.workqueue import LeaseQueue
+
+
+def _papers(tmp_path, *names):
+    root = tmp_path / "parsed"
+    dirs = []
+    for name in names:
+        d = root / name
+        d.mkdir(parents=True)
+        dirs.append(d)
+    return dirs
+
+
+def test_claim_is_exclusive_between_workers(tmp_path):
+    dirs = _papers(tmp_path, "P1", "P2")
+    out = tmp_path / "out"
+    a = LeaseQueue(dirs, out, worker_id="a")
+    b = LeaseQueue(dirs, out, worker_id="b")
+
+    la = a.claim()
+    lb = b.claim()
+    assert la.paper_dir.name == "P1"
+    assert lb.paper_dir.name == "P2"
+    assert a.claim() is None
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    dirs = _papers(tmp_path, "P1")
+    out = tmp_path / "out"
+    crashed = LeaseQueue(dirs, out, worker_id="crashed", lease_ttl=0.01)
+    stale = crashed.claim()
+    time.sleep(0.05)
+
+    survivor = LeaseQueue(dirs, out, worker_id="survivor")
+    lease = survivor.claim()
+    assert lease is not None
+    assert json.loads(lease.path.read_text())["worker"] == "survivor"
+    # 原持有者已失去租约，不能再发布或续约
+    assert crashed.heartbeat(stale) is False
+    assert crashed.publish(stale, b"{}") is False
+
+
+def test_publish_writes_output_and_releases(tmp_path):
+    dirs = _papers(tmp_path, "P1")
+    out = tmp_path / "out"
+    q = LeaseQueue(dirs, out)
+    lease = q.claim()
+    assert q.heartbeat(lease)
+    assert q.publish(lease, b'{"is_valid": true}')
+
+    assert json.loads((out / "P1.json").read_text()) == {"is_valid": True}
+    assert not lease.path.exists()
+    assert q.pending() == []
+    assert q.claim() is None
+    assert [p.name for p in out.iterdir() if p.name.endswith(".tmp")] == []
+
+
+def test_slow_reclaimer_cannot_replace_a_fresh_lease(tmp_path):
+    dirs = _papers(tmp_path, "P1")
+    out = tmp_path / "out"
+    LeaseQueue(dirs, out, worker_id="crashed", lease_ttl=0.01).claim()
+    time.sleep(0.05)
+
+    fast = LeaseQueue(dirs, out, worker_id="fast")
+    slow = LeaseQueue(dirs, out, worker_id="slow")
+    path = out / ".leases" / "P1.lease"
+    seen = slow._read(path)  # 慢的回收者先读到了过期租约……
+    lease = fast.claim()  # ……快的回收者抢先回收并替换了租约
+
+    assert slow._reclaim(dirs[0], seen) is None
+    assert fast.owns(lease) and fast.heartbeat(lease)
+    assert sorted(p.name for p in path.parent.iterdir()) == ["P1.lease"]
+
+
+def test_stale_lock_from_a_crashed_worker_is_cleared(tmp_path, monkeypatch):
+    from cfst_extractor import workqueue
+
+    dirs = _papers(tmp_path, "P1")
+    q = LeaseQueue(dirs, tmp_path / "out")
+    lease = q.claim()
+    lock = lease.path.with_name("P1.lease.lock")
+    lock.touch()
+    monkeypatch.setattr(workqueue, "_LOCK_STALE", 0.0)
+    time.sleep(0.01)
+    assert q.publish(lease, b"{}") and not lock.exists()